@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import Cart, CartItem
 
-# Register your models here.
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    raw_id_fields = ('product',)
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'total_qty', 'creado_en')
+    readonly_fields = ('total_qty', 'version')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user',)
+    inlines = [CartItemInline]
@@ -1,15 +1,37 @@
 from rest_framework import serializers
 
+from products.models import MAX_PK
+
+from cart.models import MAX_QTY
+
 class AddItemSerializer(serializers.Serializer):
-    product_id = serializers.IntegerField()
-    qty = serializers.IntegerField(min_value=1)
+    product_id = serializers.IntegerField(min_value=1, max_value=MAX_PK)
+    qty = serializers.IntegerField(min_value=1, max_value=MAX_QTY)
 
 class UpdateItemSerializer(serializers.Serializer):
-    product_id = serializers.IntegerField()
-    qty = serializers.IntegerField(min_value=0)
+    product_id = serializers.IntegerField(min_value=1, max_value=MAX_PK)
+    qty = serializers.IntegerField(min_value=0, max_value=MAX_QTY)
 
 class RemoveItemSerializer(serializers.Serializer):
-    product_id = serializers.IntegerField()
+    product_id = serializers.IntegerField(min_value=1, max_value=MAX_PK)
+
+class BatchOpSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=["add", "update", "remove"])
+    product_id = serializers.IntegerField(min_value=1, max_value=MAX_PK)
+    qty = serializers.IntegerField(min_value=0, max_value=MAX_QTY, required=False)
+
+    def validate(self, attrs):
+        qty = attrs.get('qty')
+        if attrs['op'] == 'add' and (qty or 0) < 1:
+            raise serializers.ValidationError({'qty': 'add necesita qty >= 1.'})
+        if attrs['op'] == 'update' and qty is None:
+            raise serializers.ValidationError({'qty': 'update necesita qty.'})
+        return attrs
+
+class BatchSerializer(serializers.Serializer):
+    MAX_OPS = 200
+
+    ops = BatchOpSerializer(many=True, allow_empty=False, max_length=MAX_OPS)
 
 class CartItemSerializer(serializers.Serializer):
     product_id = serializers.IntegerField()
@@ -18,8 +40,16 @@ class CartItemSerializer(serializers.Serializer):
     image = serializers.CharField(allow_null=True)
     qty = serializers.IntegerField()
     subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    price_changed = serializers.BooleanField()
+    previous_price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    stock = serializers.IntegerField()
+    out_of_stock = serializers.BooleanField()
 
 class CartSerializer(serializers.Serializer):
     items = CartItemSerializer(many=True)
     total_qty = serializers.IntegerField()
     total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+class CartSummarySerializer(serializers.Serializer):
+    total_qty = serializers.IntegerField()
+    version = serializers.IntegerField()
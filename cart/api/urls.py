@@ -1,14 +1,16 @@
 from django.urls import path
 from .views import (
-    CartDetailView, CartAddView, CartUpdateView,
-    CartRemoveView, CartClearView, CartCheckoutView
+    CartDetailView, CartSummaryView, CartAddView, CartUpdateView,
+    CartRemoveView, CartBatchView, CartClearView, CartCheckoutView
 )
 
 urlpatterns = [
     path('', CartDetailView.as_view(), name='cart-detail'),
+    path('summary/', CartSummaryView.as_view(), name='cart-summary'),
     path('add/', CartAddView.as_view(), name='cart-add'),
     path('update/', CartUpdateView.as_view(), name='cart-update'),
     path('remove/', CartRemoveView.as_view(), name='cart-remove'),
+    path('batch/', CartBatchView.as_view(), name='cart-batch'),
     path('clear/', CartClearView.as_view(), name='cart-clear'),
     path('checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
 ]
@@ -1,66 +1,87 @@
-from decimal import Decimal
+import hashlib
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, status
 from drf_spectacular.utils import extend_schema
 from products.models import Product
+from cart import pricing, storage
+from cart.money import to_amount
 from .serializers import (
     AddItemSerializer,
     UpdateItemSerializer,
     RemoveItemSerializer,
-    CartSerializer
+    BatchSerializer,
+    CartSerializer,
+    CartSummarySerializer
 )
 
-SESSION_KEY = 'cart'
-
-def _get_cart(session):
-    cart = session.get(SESSION_KEY) or {'items': {}}
-    return cart
-
-def _save_cart(session, cart):
-    session[SESSION_KEY] = cart
-    session.modified = True
-
-def _to_number(x):
-    try:
-        if isinstance(x, Decimal):
-            return float(x)
-        return float(Decimal(str(x)))
-    except Exception:
-        return 0.0
-
-def _serialize_cart(cart):
+def _serialize_cart(lines):
+    """
+    Una pasada: subtotales y total se suman en centavos enteros y cada monto se
+    pasa a pesos una sola vez (cart/money.py).
+    """
     items = []
-    total_qty = 0
-    total_price = Decimal('0')
-    for pid, data in cart['items'].items():
-        price = Decimal(str(data['price']))
-        qty = int(data['qty'])
-        subtotal = price * qty
+    total_qty = total_cents = 0
+    for line in lines:
+        qty = line['qty']
+        price_cents = line['price_cents']
+        subtotal_cents = price_cents * qty
+        previous = line.get('previous_price_cents')
         items.append({
-            'product_id': int(pid),
-            'name': data['name'],
-            'price': _to_number(price),
-            'image': data.get('image'),
+            'product_id': line['product_id'],
+            'name': line['name'],
+            'price': to_amount(price_cents),
+            'image': line.get('image'),
             'qty': qty,
-            'subtotal': _to_number(subtotal)
+            'subtotal': to_amount(subtotal_cents),
+            'price_changed': line.get('price_changed', False),
+            'previous_price': to_amount(previous) if previous is not None else None,
+            'stock': line.get('stock'),
+            'out_of_stock': line.get('out_of_stock', False),
         })
         total_qty += qty
-        total_price += subtotal
+        total_cents += subtotal_cents
     return {
         'items': items,
         'total_qty': total_qty,
-        'total_price': _to_number(total_price)
+        'total_price': to_amount(total_cents)
     }
 
+def _current_cart(request):
+    """El carrito guardado, con precio y stock vigentes (cart/pricing.py)."""
+    return _serialize_cart(pricing.reprice(storage.lines(request)))
+
 class CartDetailView(APIView):
     permission_classes = [permissions.AllowAny]
 
     @extend_schema(responses={200: CartSerializer})
     def get(self, request):
-        cart = _get_cart(request.session)
-        return Response(_serialize_cart(cart))
+        return Response(_current_cart(request))
+
+class CartSummaryView(APIView):
+    """
+    Sólo la cantidad total, para el badge del navbar: sale de ``Cart.total_qty``
+    (una fila, sin leer las líneas ni repreciar) y responde 304 mientras el
+    carrito no cambie (``Cart.version``).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(responses={200: CartSummarySerializer, 304: None})
+    def get(self, request):
+        cid, total_qty, version = storage.summary(request)
+        etag = quote_etag(hashlib.sha1(f"cart:{cid}:{version}".encode()).hexdigest())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is None:
+            response = Response({'total_qty': total_qty, 'version': version})
+            response['ETag'] = etag
+        else:
+            response = not_modified
+        # por usuario/sesión: que el navegador revalide siempre y nadie más lo guarde
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 class CartAddView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -71,19 +92,8 @@ class CartAddView(APIView):
         if not ser.is_valid():
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
         product = get_object_or_404(Product, pk=ser.validated_data['product_id'], activo=True)
-        qty = ser.validated_data['qty']
-        cart = _get_cart(request.session)
-        key = str(product.id)
-        prev = cart['items'].get(key, {'qty': 0})
-        image_url = product.imagen.url if product.imagen else None
-        cart['items'][key] = {
-            'name': product.nombre,
-            'price': _to_number(product.precio),
-            'image': image_url,
-            'qty': int(prev['qty']) + int(qty)
-        }
-        _save_cart(request.session, cart)
-        return Response(_serialize_cart(cart))
+        storage.add(request, product, ser.validated_data['qty'])
+        return Response(_current_cart(request))
 
 class CartUpdateView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -93,19 +103,9 @@ class CartUpdateView(APIView):
         ser = UpdateItemSerializer(data=request.data)
         if not ser.is_valid():
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
-        pid = str(ser.validated_data['product_id'])
-        qty = int(ser.validated_data['qty'])
-        cart = _get_cart(request.session)
-        if pid not in cart['items']:
+        if not storage.set_qty(request, ser.validated_data['product_id'], int(ser.validated_data['qty'])):
             return Response({'detail': 'Item no existe'}, status=status.HTTP_400_BAD_REQUEST)
-        if qty <= 0:
-            cart['items'].pop(pid, None)
-        else:
-            item = cart['items'][pid]
-            item['qty'] = qty
-            cart['items'][pid] = item
-        _save_cart(request.session, cart)
-        return Response(_serialize_cart(cart))
+        return Response(_current_cart(request))
 
 class CartRemoveView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -115,25 +115,49 @@ class CartRemoveView(APIView):
         ser = RemoveItemSerializer(data=request.data)
         if not ser.is_valid():
             return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
-        pid = str(ser.validated_data['product_id'])
-        cart = _get_cart(request.session)
-        cart['items'].pop(pid, None)
-        _save_cart(request.session, cart)
-        return Response(_serialize_cart(cart))
+        storage.remove(request, ser.validated_data['product_id'])
+        return Response(_current_cart(request))
+
+class CartBatchView(APIView):
+    """
+    Varias operaciones add/update/remove en orden, todo o nada, con un solo
+    carrito serializado de respuesta (para juntar los +/- de la página del carrito).
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(request=BatchSerializer, responses={200: CartSerializer, 400: dict})
+    def post(self, request):
+        ser = BatchSerializer(data=request.data)
+        if not ser.is_valid():
+            return Response(ser.errors, status=status.HTTP_400_BAD_REQUEST)
+        ops = [(o['op'], o['product_id'], o.get('qty') or 0) for o in ser.validated_data['ops']]
+
+        # una consulta para todos los productos que se agregan
+        add_ids = {pid for op, pid, _ in ops if op == 'add'}
+        products = Product.objects.filter(pk__in=add_ids, activo=True).only('id', 'nombre', 'precio', 'imagen')
+        products = {p.pk: p for p in products}
+        missing = add_ids - set(products)
+        if missing:
+            return Response({'detail': 'Producto no disponible', 'product_ids': sorted(missing)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            storage.apply_batch(request, ops, products)
+        except storage.MissingLine as e:
+            return Response({'detail': 'Item no existe', 'product_ids': [e.product_id]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(_current_cart(request))
 
 class CartClearView(APIView):
     permission_classes = [permissions.AllowAny]
 
     @extend_schema(request=None, responses={200: CartSerializer})
     def post(self, request):
-        cart = {'items': {}}
-        _save_cart(request.session, cart)
-        return Response(_serialize_cart(cart))
+        storage.clear(request)
+        return Response(_serialize_cart([]))
 
 class CartCheckoutView(APIView):
     permission_classes = [permissions.AllowAny]
 
     @extend_schema(request=None, responses={200: CartSerializer})
     def post(self, request):
-        cart = _get_cart(request.session)
-        return Response(_serialize_cart(cart))
+        return Response(_current_cart(request))
@@ -0,0 +1,33 @@
+# cart/context_processors.py
+from functools import wraps
+
+from django.utils.functional import SimpleLazyObject
+
+from . import storage
+
+# marca del request: la página se comparte o se revalida por ETag
+SHARED_PAGE_ATTR = "_cart_count_off"
+
+
+def without_cart_count(view):
+    """
+    Para vistas cuyo HTML se cachea para todos los anónimos o se sirve con
+    304: el badge no se pinta en el render (quedaría el carrito de otro, o uno
+    viejo) y lo pide el JS a /api/cart/summary/.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        setattr(request, SHARED_PAGE_ATTR, True)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def cart(request):
+    """
+    ``cart_total_qty`` para pintar el badge del navbar en el mismo render, sin
+    que la página pida /api/cart/summary/ al cargar. Es perezoso: sólo consulta
+    si el template lo usa. Las vistas con ``without_cart_count`` no lo reciben.
+    """
+    if getattr(request, SHARED_PAGE_ATTR, False):
+        return {}
+    return {"cart_total_qty": SimpleLazyObject(lambda: storage.summary(request)[1])}
@@ -0,0 +1,94 @@
+# cart/management/commands/bench_cart_totals.py
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.api.views import _serialize_cart
+
+
+def _to_number(x):
+    try:
+        if isinstance(x, Decimal):
+            return float(x)
+        return float(Decimal(str(x)))
+    except Exception:
+        return 0.0
+
+
+def _serialize_decimal(lines):
+    """El ``_serialize_cart`` de antes: precio float -> Decimal(str()) -> float por línea."""
+    items = []
+    total_qty = 0
+    total_price = Decimal('0')
+    for line in lines:
+        price = Decimal(str(line['price']))
+        qty = int(line['qty'])
+        subtotal = price * qty
+        items.append({
+            'product_id': int(line['product_id']),
+            'name': line['name'],
+            'price': _to_number(price),
+            'image': line.get('image'),
+            'qty': qty,
+            'subtotal': _to_number(subtotal)
+        })
+        total_qty += qty
+        total_price += subtotal
+    return {'items': items, 'total_qty': total_qty, 'total_price': _to_number(total_price)}
+
+
+def _lines(n: int):
+    cents = [99_999 + 37 * i for i in range(n)]
+    old = [{"product_id": i, "name": f"Producto {i}", "price": c / 100, "image": None, "qty": 1 + i % 3}
+           for i, c in enumerate(cents)]
+    new = [{"product_id": i, "name": f"Producto {i}", "price_cents": c, "image": None, "qty": 1 + i % 3,
+            "price_changed": False, "previous_price_cents": None, "stock": 10, "out_of_stock": False}
+           for i, c in enumerate(cents)]
+    return old, new
+
+
+def _time(fn, lines, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn(lines)
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best * 1e6
+
+
+def _peak(fn, lines) -> int:
+    tracemalloc.start()
+    fn(lines)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark de la serialización del carrito: totales en Decimal con ida y\n"
+        "vuelta por float (antes) vs. centavos enteros en una pasada (ahora). Mide\n"
+        "µs por carrito (mejor de 5) y el pico de memoria asignada. No toca la base.\n"
+        "Uso: python manage.py bench_cart_totals [--sizes 1,50,500] [--repeat 2000]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,50,500", help="Líneas por carrito, separadas por coma (default 1,50,500).")
+        parser.add_argument("--repeat", type=int, default=2000, help="Serializaciones por medición (default 2000).")
+
+    def handle(self, *args, **opts):
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        self.stdout.write(f"{'líneas':>7} {'Decimal µs':>11} {'centavos µs':>12} {'x':>6} {'Decimal KiB':>12} {'centavos KiB':>13}")
+        for n in sizes:
+            old, new = _lines(n)
+            if _serialize_decimal(old)["total_price"] != _serialize_cart(new)["total_price"]:
+                raise CommandError(f"Los totales no coinciden con {n} líneas.")
+            repeat = max(1, opts["repeat"] // n)
+            t_old, t_new = _time(_serialize_decimal, old, repeat), _time(_serialize_cart, new, repeat)
+            m_old, m_new = _peak(_serialize_decimal, old), _peak(_serialize_cart, new)
+            self.stdout.write(
+                f"{n:>7} {t_old:>11.1f} {t_new:>12.1f} {t_old / t_new:>6.1f} {m_old / 1024:>12.1f} {m_new / 1024:>13.1f}"
+            )
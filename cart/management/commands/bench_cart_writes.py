@@ -0,0 +1,67 @@
+# cart/management/commands/bench_cart_writes.py
+import time
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cart import storage
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara escrituras/segundo del carrito: el de antes (todo el dict en la sesión,\n"
+        "que se reescribe en cada cambio) vs. Cart/CartItem (una fila por cambio).\n"
+        "Cada operación carga la sesión como lo haría un request. Los datos se crean\n"
+        "dentro de una transacción que se revierte al final.\n"
+        "Uso: python manage.py bench_cart_writes [--ops 2000] [--lines 20]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ops", type=int, default=2000, help="Escrituras por variante (default 2000).")
+        parser.add_argument("--lines", type=int, default=20, help="Líneas distintas en el carrito (default 20).")
+
+    def handle(self, *args, **opts):
+        ops, n_lines = opts["ops"], opts["lines"]
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        with transaction.atomic():
+            products = Product.objects.bulk_create([
+                Product(nombre=f"bench Carrito {i}", precio=Decimal(1000 + i), stock=100) for i in range(n_lines)
+            ])
+
+            # antes: {'items': {pid: {name, price, image, qty}}} entero en la sesión
+            session = SessionStore()
+            session["cart"] = {"items": {}}
+            session.save()
+            key = session.session_key
+            t0 = time.perf_counter()
+            for i in range(ops):
+                s = SessionStore(session_key=key)
+                cart = s.get("cart")
+                p = products[i % n_lines]
+                item = cart["items"].setdefault(str(p.pk), {"name": p.nombre, "price": float(p.precio), "image": None, "qty": 0})
+                item["qty"] += 1
+                s["cart"] = cart
+                s.save()
+            session_rate = ops / (time.perf_counter() - t0)
+
+            # ahora: la sesión sólo tiene cart_id y no se vuelve a escribir
+            session = SessionStore()
+            storage.add(SimpleNamespace(session=session, user=AnonymousUser()), products[0], 1)
+            session.save()
+            key = session.session_key
+            t0 = time.perf_counter()
+            for i in range(ops):
+                request = SimpleNamespace(session=SessionStore(session_key=key), user=AnonymousUser())
+                request.session.get(storage.SESSION_KEY)  # cargar la sesión, como el middleware
+                storage.add(request, products[i % n_lines], 1)
+            model_rate = ops / (time.perf_counter() - t0)
+
+            self.stdout.write(f"{'Sesión (dict completo)':<28} {session_rate:10,.0f} escrituras/s")
+            self.stdout.write(f"{'Cart/CartItem (una fila)':<28} {model_rate:10,.0f} escrituras/s")
+            transaction.set_rollback(True)
@@ -0,0 +1,24 @@
+# cart/management/commands/clear_stale_carts.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra carritos anónimos abandonados (sin cambios en --days días). Los de\n"
+        "usuarios logueados no se tocan. Pensado para cron.\n"
+        "Uso: python manage.py clear_stale_carts [--days 30]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Días sin cambios (default 30).")
+
+    def handle(self, *args, **opts):
+        cutoff = timezone.now() - timedelta(days=opts["days"])
+        stale = Cart.objects.filter(user__isnull=True, creado_en__lt=cutoff).exclude(items__actualizado_en__gte=cutoff)
+        deleted, _ = Cart.objects.filter(pk__in=list(stale.values_list("id", flat=True))).delete()
+        self.stdout.write(self.style.SUCCESS(f"🧹 {deleted} registros borrados (carritos y sus líneas)."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:06
+
+from django.db import migrations, models
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def count_items(apps, schema_editor):
+    Cart = apps.get_model("cart", "Cart")
+    CartItem = apps.get_model("cart", "CartItem")
+    db = schema_editor.connection.alias
+    qty = CartItem.objects.using(db).filter(cart=OuterRef("pk")).order_by().values("cart").annotate(n=Sum("qty")).values("n")
+    Cart.objects.using(db).update(total_qty=Coalesce(Subquery(qty, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='total_qty',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_items, migrations.RunPython.noop),
+    ]
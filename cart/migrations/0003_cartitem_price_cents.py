@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:40
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+
+
+def to_cents(apps, schema_editor):
+    CartItem = apps.get_model("cart", "CartItem")
+    items = list(CartItem.objects.using(schema_editor.connection.alias).only("id", "price"))
+    for item in items:
+        item.price_cents = int(Decimal(item.price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) * 100)
+    CartItem.objects.using(schema_editor.connection.alias).bulk_update(items, ["price_cents"], batch_size=500)
+
+
+def to_price(apps, schema_editor):
+    CartItem = apps.get_model("cart", "CartItem")
+    items = list(CartItem.objects.using(schema_editor.connection.alias).only("id", "price_cents"))
+    for item in items:
+        item.price = Decimal(item.price_cents) / 100
+    CartItem.objects.using(schema_editor.connection.alias).bulk_update(items, ["price"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0002_cart_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='price_cents',
+            field=models.PositiveBigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(to_cents, to_price),
+        migrations.RemoveField(
+            model_name='cartitem',
+            name='price',
+        ),
+    ]
@@ -1,3 +1,53 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+from products.models import Product
+
+# tope de unidades por línea: lo valida la API y cart/storage.py lo respeta al
+# sumar (muy por debajo del rango de la columna, y de Cart.total_qty)
+MAX_QTY = 999
+
+
+class Cart(models.Model):
+    """
+    Carrito persistente (ver cart/storage.py). Los anónimos tienen uno con
+    ``user`` vacío cuyo id vive en la sesión; al loguearse se funde con el del
+    usuario, que sobrevive al logout y es el mismo en todos sus dispositivos.
+
+    ``total_qty`` y ``version`` los mantiene cart/storage.py en cada cambio de
+    líneas: el badge del navbar (/api/cart/summary/) los lee sin tocar CartItem.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="cart",
+    )
+    creado_en = models.DateTimeField(auto_now_add=True)
+    total_qty = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Carrito #{self.pk} ({self.user or 'anónimo'})"
+
+
+class CartItem(models.Model):
+    """
+    Una línea por producto. Nombre, precio e imagen se copian al agregar (el
+    contrato de /api/cart/ los devuelve tal cual se vieron en la tienda). El
+    precio va en centavos enteros (cart/money.py).
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    qty = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    price_cents = models.PositiveBigIntegerField()
+    image = models.CharField(max_length=500, blank=True, null=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["cart", "product"], name="cart_item_unique")]
+
+    def __str__(self):
+        return f"{self.qty} × {self.name} (carrito #{self.cart_id})"
@@ -0,0 +1,24 @@
+# cart/money.py
+"""
+Plata del carrito en centavos enteros.
+
+Las líneas guardan ``price_cents`` y los totales se suman como enteros; sólo al
+armar la respuesta (o el ítem de MercadoPago) se pasa a pesos. ``cents / 100``
+con enteros da el float más cercano al decimal exacto, así que 1000.50 sale
+1000.5 y no arrastra errores de sumar floats.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount) -> int:
+    """Decimal/str/int (o float viejo de la sesión) -> centavos, redondeando a medio centavo hacia arriba."""
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount or 0))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def to_amount(cents: int) -> float:
+    """Centavos -> pesos para JSON/MercadoPago."""
+    return cents / 100
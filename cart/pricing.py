@@ -0,0 +1,73 @@
+# cart/pricing.py
+"""
+Precio y stock vigentes de las líneas del carrito.
+
+Las líneas guardan el precio del momento en que se agregaron (``storage.snapshot``).
+Al leer el carrito se compara contra el producto actual:
+
+- ``price_cents`` pasa a ser el precio vigente y ``price_changed``/``previous_price_cents``
+  avisan si cambió desde que se agregó;
+- ``out_of_stock`` marca las líneas que no se pueden comprar (producto borrado,
+  inactivo o con menos stock que la cantidad pedida).
+
+Los datos vivos salen de una sola consulta ``id__in`` con sólo esas columnas y se
+memorizan por producto y versión del catálogo: cualquier cambio de Product
+(señales, o ``bump_catalog_version()`` en los caminos masivos y las reservas de
+stock) cambia la versión, así que no hace falta invalidar nada a mano y los
+polls del badge del navbar no vuelven a consultar mientras el catálogo no cambie.
+"""
+from django.core.cache import cache
+
+from products.cache import get_catalog_version, listing_timeout
+from products.models import Product
+
+from .money import to_cents
+
+# producto que ya no existe (se memoriza igual, para no reconsultarlo)
+GONE = (None, 0, False)
+
+
+def _key(version, product_id) -> str:
+    return f"cart:live-cents:{version}:{product_id}"
+
+
+def live(product_ids) -> dict:
+    """``{product_id: (precio en centavos, stock, activo)}`` vigentes; ``GONE`` si el producto no existe."""
+    ids = set(product_ids)
+    if not ids:
+        return {}
+    version = get_catalog_version()
+    keys = {_key(version, pid): pid for pid in ids}
+    found = {keys[k]: v for k, v in cache.get_many(keys).items()}
+    missing = ids - set(found)
+    if missing:
+        fresh = {
+            pid: (to_cents(precio), stock, activo)
+            for pid, precio, stock, activo in Product.objects.filter(id__in=missing).values_list(
+                "id", "precio", "stock", "activo"
+            )
+        }
+        fresh.update({pid: GONE for pid in missing - set(fresh)})
+        cache.set_many({_key(version, pid): v for pid, v in fresh.items()}, listing_timeout())
+        found.update(fresh)
+    return found
+
+
+def reprice(lines) -> list:
+    """
+    Líneas de ``storage.lines`` -> las mismas con precio vigente y avisos
+    (``price_changed``, ``previous_price_cents``, ``stock``, ``out_of_stock``).
+    """
+    lines = list(lines)
+    current = live(line["product_id"] for line in lines)
+    for line in lines:  # se completan en el lugar: son dicts recién leídos
+        precio, stock, activo = current.get(line["product_id"], GONE)
+        stored = line["price_cents"]
+        changed = precio is not None and precio != stored
+        available = stock if activo and precio is not None else 0
+        line["price_cents"] = precio if precio is not None else stored
+        line["price_changed"] = changed
+        line["previous_price_cents"] = stored if changed else None
+        line["stock"] = available
+        line["out_of_stock"] = available < line["qty"]
+    return lines
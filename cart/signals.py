@@ -0,0 +1,12 @@
+# cart/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from . import storage
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    # login() por API o allauth: siempre con request, salvo logins programáticos
+    if request is not None and hasattr(request, "session"):
+        storage.merge_into_user(request, user)
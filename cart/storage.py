@@ -0,0 +1,272 @@
+# cart/storage.py
+"""
+Carrito en la base (``Cart``/``CartItem``) en vez de en ``request.session``.
+
+- Anónimos: la sesión guarda sólo el id del carrito (``cart_id``), que se escribe
+  una vez al crearlo; agregar o cambiar cantidades ya no reescribe la sesión.
+- Logueados: el carrito es el del usuario (sobrevive al logout y se comparte
+  entre dispositivos). Al loguearse, el carrito anónimo se funde en ese.
+- Cada operación toca sólo su línea: ``UPDATE`` condicional y, si la línea no
+  existía, un ``INSERT`` (el índice único cart+product resuelve las carreras).
+- Cada línea tiene como mucho ``MAX_QTY`` unidades: lo que se suma de más se recorta.
+- Después de cada cambio se recalcula ``Cart.total_qty`` y se incrementa
+  ``Cart.version`` (un UPDATE): ``summary()`` y el badge del navbar leen eso.
+
+Las sesiones viejas con el carrito entero en ``session['cart']`` se migran
+solas en el primer acceso.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import MAX_QTY, Cart, CartItem
+from .money import to_cents
+
+SESSION_KEY = "cart_id"
+LEGACY_SESSION_KEY = "cart"
+LINE_FIELDS = ("product_id", "name", "price_cents", "image", "qty")
+
+
+def _user_id(request):
+    user = getattr(request, "user", None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def cart_id(request, create: bool = False):
+    """Id del carrito actual (``None`` si todavía no hay y no se pide crearlo)."""
+    uid = _user_id(request)
+    if uid is not None:
+        cid = Cart.objects.filter(user_id=uid).values_list("id", flat=True).first()
+        if cid is None and create:
+            cid = Cart.objects.get_or_create(user_id=uid)[0].pk
+        return cid
+    cid = request.session.get(SESSION_KEY)
+    if cid is None and create:
+        cid = Cart.objects.create().pk
+        request.session[SESSION_KEY] = cid
+    return cid
+
+
+def _items(request):
+    """Queryset de las líneas del carrito actual, sin buscar antes el carrito."""
+    _adopt_legacy(request)
+    uid = _user_id(request)
+    if uid is not None:
+        return CartItem.objects.filter(cart__user_id=uid)
+    cid = request.session.get(SESSION_KEY)
+    return CartItem.objects.filter(cart_id=cid) if cid is not None else CartItem.objects.none()
+
+
+def _carts(request):
+    """Queryset del carrito actual (0 o 1 fila)."""
+    uid = _user_id(request)
+    if uid is not None:
+        return Cart.objects.filter(user_id=uid)
+    cid = request.session.get(SESSION_KEY)
+    return Cart.objects.filter(pk=cid) if cid is not None else Cart.objects.none()
+
+
+def _touch(carts) -> None:
+    """Recalcula ``total_qty`` y sube ``version`` de ``carts`` (queryset de Cart)."""
+    qty = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart").annotate(n=Sum("qty")).values("n")
+    carts.update(total_qty=Coalesce(Subquery(qty, output_field=IntegerField()), Value(0)), version=F("version") + 1)
+
+
+def summary(request) -> tuple:
+    """``(cart_id, total_qty, version)`` sin leer las líneas; ``(None, 0, 0)`` si no hay carrito."""
+    _adopt_legacy(request)
+    return _carts(request).values_list("id", "total_qty", "version").first() or (None, 0, 0)
+
+
+def lines(request) -> list:
+    """Líneas del carrito como dicts (``LINE_FIELDS``), en el orden en que se agregaron."""
+    return list(_items(request).order_by("id").values(*LINE_FIELDS))
+
+
+def snapshot(product) -> dict:
+    """Lo que se copia del producto a la línea al agregarlo."""
+    return {
+        "name": product.nombre,
+        "price_cents": to_cents(product.precio),
+        "image": product.imagen.url if product.imagen else None,
+    }
+
+
+def _bump(cid, product_id, qty, data) -> bool:
+    """Suma ``qty`` a la línea existente (hasta ``MAX_QTY``) y refresca nombre/precio/imagen (un UPDATE)."""
+    qty = Least(F("qty") + qty, Value(MAX_QTY))
+    return CartItem.objects.filter(cart_id=cid, product_id=product_id).update(qty=qty, **data) > 0
+
+
+def _insert(cid, product_id, qty, data) -> None:
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(cart_id=cid, product_id=product_id, qty=min(qty, MAX_QTY), **data)
+    except IntegrityError:
+        # otra pestaña la insertó entre el UPDATE y el INSERT
+        _bump(cid, product_id, qty, data)
+
+
+def _upsert(cid, product_id, qty, data) -> None:
+    if not _bump(cid, product_id, qty, data):
+        _insert(cid, product_id, qty, data)
+
+
+def add(request, product, qty: int) -> None:
+    _adopt_legacy(request)
+    cid = cart_id(request, create=True)
+    qty, data = int(qty), snapshot(product)
+    if not _bump(cid, product.pk, qty, data):
+        if _user_id(request) is None and not Cart.objects.filter(pk=cid).exists():
+            # línea nueva en un carrito de sesión que ya se purgó (clear_stale_carts): uno nuevo
+            request.session.pop(SESSION_KEY, None)
+            cid = cart_id(request, create=True)
+        _insert(cid, product.pk, qty, data)
+    _touch(Cart.objects.filter(pk=cid))
+
+
+def set_qty(request, product_id: int, qty: int) -> bool:
+    """Cambia la cantidad (0 o menos la saca). False si la línea no existe."""
+    items = _items(request).filter(product_id=product_id)
+    changed = items.delete()[0] > 0 if qty <= 0 else items.update(qty=min(qty, MAX_QTY)) > 0
+    if changed:
+        _touch(_carts(request))
+    return changed
+
+
+def remove(request, product_id: int) -> None:
+    if _items(request).filter(product_id=product_id).delete()[0]:
+        _touch(_carts(request))
+
+
+def clear(request) -> None:
+    if _items(request).delete()[0]:
+        _touch(_carts(request))
+
+
+class MissingLine(Exception):
+    """Un ``update`` del lote apunta a una línea que no está en el carrito."""
+
+    def __init__(self, product_id: int):
+        self.product_id = product_id
+        super().__init__(f"Item no existe: {product_id}")
+
+
+def apply_batch(request, ops, products) -> None:
+    """
+    Aplica ``ops`` (``[(op, product_id, qty)]`` con op ``add``/``update``/``remove``,
+    en orden) de una vez y en una transacción: se lee la cantidad actual de las
+    líneas involucradas, se resuelve en memoria el estado final y se escribe
+    sólo eso (un DELETE, un UPDATE por lotes y un INSERT por lotes como mucho).
+
+    ``products`` es ``{product_id: Product}`` con los productos que se agregan
+    (ya validados). ``MissingLine`` si un ``update`` no tiene línea; no se escribe nada.
+    """
+    _adopt_legacy(request)
+    pids = {pid for _, pid, _ in ops}
+    with transaction.atomic():
+        existing = {item.product_id: item for item in _items(request).filter(product_id__in=pids)}
+        final = {pid: item.qty for pid, item in existing.items()}
+        added = set()
+        for op, pid, qty in ops:
+            if op == "add":
+                final[pid] = min(final.get(pid, 0) + qty, MAX_QTY)
+                added.add(pid)
+            elif op == "update":
+                if final.get(pid, 0) <= 0:
+                    raise MissingLine(pid)
+                final[pid] = min(qty, MAX_QTY)
+            else:
+                final[pid] = 0
+
+        gone = [pid for pid in existing if final[pid] <= 0]
+        if gone:
+            _items(request).filter(product_id__in=gone).delete()
+
+        changed, now = [], timezone.now()
+        for pid, item in existing.items():
+            if final[pid] <= 0 or (final[pid] == item.qty and pid not in added):
+                continue
+            item.qty, item.actualizado_en = final[pid], now
+            if pid in added:
+                for name, value in snapshot(products[pid]).items():
+                    setattr(item, name, value)
+            changed.append(item)
+        if changed:
+            CartItem.objects.bulk_update(changed, ["qty", "name", "price_cents", "image", "actualizado_en"])
+
+        new = [pid for pid, qty in final.items() if qty > 0 and pid not in existing]
+        if new:
+            _insert_many(request, new, final, products, fresh_cart=not existing)
+        if gone or changed or new:
+            _touch(_carts(request))
+
+
+def _insert_many(request, new, final, products, fresh_cart: bool) -> None:
+    """Las líneas nuevas de ``apply_batch``, en un solo INSERT."""
+    cid = cart_id(request, create=True)
+    if fresh_cart and _user_id(request) is None and not Cart.objects.filter(pk=cid).exists():
+        # carrito de sesión purgado (clear_stale_carts): uno nuevo
+        request.session.pop(SESSION_KEY, None)
+        cid = cart_id(request, create=True)
+    try:
+        with transaction.atomic():
+            CartItem.objects.bulk_create([
+                CartItem(cart_id=cid, product_id=pid, qty=final[pid], **snapshot(products[pid])) for pid in new
+            ])
+    except IntegrityError:
+        # otra pestaña agregó alguna de estas líneas mientras tanto
+        for pid in new:
+            _upsert(cid, pid, final[pid], snapshot(products[pid]))
+
+
+def _merge(source_id: int, target_id: int) -> None:
+    """Pasa las líneas de ``source`` a ``target`` sumando cantidades, y borra ``source``."""
+    target_products = CartItem.objects.filter(cart_id=target_id).values("product_id")
+    overlapping = CartItem.objects.filter(cart_id=source_id, product_id__in=target_products)
+    for product_id, qty in overlapping.values_list("product_id", "qty"):
+        CartItem.objects.filter(cart_id=target_id, product_id=product_id).update(qty=Least(F("qty") + qty, Value(MAX_QTY)))
+    overlapping.delete()
+    CartItem.objects.filter(cart_id=source_id).update(cart_id=target_id)
+    Cart.objects.filter(pk=source_id).delete()
+    _touch(Cart.objects.filter(pk=target_id))
+
+
+def merge_into_user(request, user) -> None:
+    """Al loguearse: el carrito anónimo de la sesión pasa a ser (o se suma a) el del usuario."""
+    _adopt_legacy(request)
+    anon_id = request.session.pop(SESSION_KEY, None)
+    if anon_id is None:
+        return
+    with transaction.atomic():
+        if not Cart.objects.filter(pk=anon_id, user__isnull=True).exists():
+            return
+        user_cart = Cart.objects.filter(user=user).values_list("id", flat=True).first()
+        if user_cart is None:
+            Cart.objects.filter(pk=anon_id).update(user=user)
+        else:
+            _merge(anon_id, user_cart)
+
+
+def _adopt_legacy(request) -> None:
+    """Sesiones de antes: ``session['cart'] = {'items': {pid: {...}}}`` -> filas."""
+    session = getattr(request, "session", None)
+    if session is None or LEGACY_SESSION_KEY not in session:
+        return
+    legacy = session.pop(LEGACY_SESSION_KEY) or {}
+    items = legacy.get("items") if isinstance(legacy, dict) else None
+    if not isinstance(items, dict) or not items:
+        return
+    alive = set(Product.objects.filter(pk__in=[int(pid) for pid in items]).values_list("id", flat=True))
+    cid = cart_id(request, create=True)
+    for pid, data in items.items():
+        if int(pid) in alive and int(data.get("qty") or 0) > 0:
+            _upsert(cid, int(pid), int(data["qty"]), {
+                "name": data.get("name", ""),
+                "price_cents": to_cents(data.get("price")),
+                "image": data.get("image"),
+            })
+    _touch(Cart.objects.filter(pk=cid))
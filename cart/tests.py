@@ -1,3 +1,218 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+
+from products.cache import bump_catalog_version
+from products.models import Product
+
+from . import storage
+from .models import MAX_QTY, Cart, CartItem
+
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.remera = Product.objects.create(nombre="Remera", precio=Decimal("1000.50"), stock=10)
+        self.short = Product.objects.create(nombre="Short", precio=Decimal("2000"), stock=10)
+
+    def _post(self, path, data=None):
+        return self.client.post(f"/api/cart/{path}/", data or {}, content_type="application/json")
+
+    def test_contract_is_preserved(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        r = self._post("add", {"product_id": self.short.pk, "qty": 1})
+        self.assertEqual(r.json(), {
+            "items": [
+                {"product_id": self.remera.pk, "name": "Remera", "price": 1000.5, "image": None, "qty": 2, "subtotal": 2001.0,
+                 "price_changed": False, "previous_price": None, "stock": 10, "out_of_stock": False},
+                {"product_id": self.short.pk, "name": "Short", "price": 2000.0, "image": None, "qty": 1, "subtotal": 2000.0,
+                 "price_changed": False, "previous_price": None, "stock": 10, "out_of_stock": False},
+            ],
+            "total_qty": 3,
+            "total_price": 4001.0,
+        })
+        self.assertEqual(self._post("add", {"product_id": self.remera.pk, "qty": 1}).json()["items"][0]["qty"], 3)
+        self.assertEqual(self._post("update", {"product_id": self.remera.pk, "qty": 5}).json()["total_qty"], 6)
+        self.assertEqual(self._post("update", {"product_id": 999, "qty": 5}).status_code, 400)
+        self.assertEqual(self._post("update", {"product_id": self.remera.pk, "qty": 0}).json()["total_qty"], 1)
+        self.assertEqual(self._post("remove", {"product_id": self.short.pk}).json()["items"], [])
+        self._post("add", {"product_id": self.short.pk, "qty": 1})
+        self.assertEqual(self._post("clear").json()["total_qty"], 0)
+        self.assertEqual(self.client.get("/api/cart/").json()["items"], [])
+
+    def test_writes_touch_one_row_not_the_session(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 1})
+        self.assertEqual(set(self.client.session.keys()) & {"cart", storage.SESSION_KEY}, {storage.SESSION_KEY})
+        with self.assertNumQueries(5):  # sesión + producto + UPDATE de la línea + contador del carrito + lectura
+            self._post("add", {"product_id": self.remera.pk, "qty": 1})
+        self.assertEqual(CartItem.objects.get().qty, 2)
+
+    def test_anonymous_cart_merges_on_login_and_survives_logout(self):
+        user = get_user_model().objects.create_user("ana", password="x")
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.create(cart=cart, product=self.remera, qty=1, name="Remera", price_cents=100050)
+
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        self._post("add", {"product_id": self.short.pk, "qty": 1})
+        self.client.login(username="ana", password="x")
+
+        items = {i["product_id"]: i["qty"] for i in self.client.get("/api/cart/").json()["items"]}
+        self.assertEqual(items, {self.remera.pk: 3, self.short.pk: 1})
+        self.assertEqual(Cart.objects.count(), 1)
+
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/cart/").json()["items"], [])
+        self.client.login(username="ana", password="x")
+        self.assertEqual(self.client.get("/api/cart/").json()["total_qty"], 4)
+
+    def test_legacy_session_cart_is_adopted(self):
+        session = self.client.session
+        session["cart"] = {"items": {str(self.short.pk): {"name": "Short", "price": 2000.0, "image": None, "qty": 2}}}
+        session.save()
+        r = self.client.get("/api/cart/")
+        self.assertEqual([(i["product_id"], i["qty"]) for i in r.json()["items"]], [(self.short.pk, 2)])
+        self.assertNotIn("cart", self.client.session)
+
+    def test_reprices_and_flags_stock_in_one_memoized_query(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        self._post("add", {"product_id": self.short.pk, "qty": 1})
+        self.remera.precio = Decimal("1200")
+        self.remera.save()
+        Product.objects.filter(pk=self.short.pk).update(stock=0)  # sin señales: como una reserva masiva
+        bump_catalog_version()
+
+        with self.assertNumQueries(3):  # sesión + líneas + precios/stock de todos los productos
+            data = self.client.get("/api/cart/").json()
+        remera, short = data["items"]
+        self.assertEqual((remera["price"], remera["previous_price"], remera["price_changed"]), (1200.0, 1000.5, True))
+        self.assertEqual(remera["subtotal"], 2400.0)
+        self.assertFalse(remera["out_of_stock"])
+        self.assertEqual((short["stock"], short["out_of_stock"], short["price_changed"]), (0, True, False))
+        self.assertEqual(data["total_price"], 4400.0)
+
+        with self.assertNumQueries(2):  # misma versión del catálogo: precios memorizados
+            self.client.get("/api/cart/")
+
+        self.remera.activo = False
+        self.remera.save()
+        self.assertTrue(self.client.get("/api/cart/").json()["items"][0]["out_of_stock"])
+
+    def test_batch_applies_ops_in_order_atomically(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        self._post("add", {"product_id": self.short.pk, "qty": 1})
+        gorra = Product.objects.create(nombre="Gorra", precio=Decimal("500"), stock=5)
+
+        r = self._post("batch", {"ops": [
+            {"op": "update", "product_id": self.remera.pk, "qty": 3},
+            {"op": "update", "product_id": self.remera.pk, "qty": 4},
+            {"op": "remove", "product_id": self.short.pk},
+            {"op": "add", "product_id": gorra.pk, "qty": 1},
+            {"op": "add", "product_id": gorra.pk, "qty": 1},
+        ]})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([(i["product_id"], i["qty"]) for i in r.json()["items"]], [(self.remera.pk, 4), (gorra.pk, 2)])
+
+        # todo o nada: el update de una línea que ya no está invalida el lote entero
+        r = self._post("batch", {"ops": [
+            {"op": "update", "product_id": self.remera.pk, "qty": 9},
+            {"op": "update", "product_id": self.short.pk, "qty": 1},
+        ]})
+        self.assertEqual((r.status_code, r.json()["product_ids"]), (400, [self.short.pk]))
+        inactive = Product.objects.create(nombre="Vieja", precio=Decimal("1"), stock=1, activo=False)
+        r = self._post("batch", {"ops": [{"op": "add", "product_id": inactive.pk, "qty": 1}]})
+        self.assertEqual((r.status_code, r.json()["product_ids"]), (400, [inactive.pk]))
+        self.assertEqual(self._post("batch", {"ops": [{"op": "add", "product_id": gorra.pk}]}).status_code, 400)
+        self.assertEqual(dict(CartItem.objects.values_list("product_id", "qty")), {self.remera.pk: 4, gorra.pk: 2})
+
+    def test_out_of_range_product_ids_are_a_400(self):
+        for pid in (10 ** 30, 0, -1):
+            with self.subTest(pid=pid):
+                r = self._post("batch", {"ops": [{"op": "add", "product_id": pid, "qty": 1}]})
+                self.assertEqual(r.status_code, 400)
+                self.assertEqual(self._post("add", {"product_id": pid, "qty": 1}).status_code, 400)
+                self.assertEqual(self._post("remove", {"product_id": pid}).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_qty_is_capped_per_line(self):
+        for path, data in (("add", {"qty": 2 ** 62}), ("update", {"qty": MAX_QTY + 1})):
+            with self.subTest(path=path):
+                self.assertEqual(self._post(path, {"product_id": self.remera.pk, **data}).status_code, 400)
+        r = self._post("batch", {"ops": [{"op": "add", "product_id": self.remera.pk, "qty": 2 ** 62}]})
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+
+        # lo que se suma de a poco se recorta en el tope, también al fundir carritos
+        self._post("add", {"product_id": self.remera.pk, "qty": MAX_QTY})
+        self._post("add", {"product_id": self.remera.pk, "qty": MAX_QTY})
+        self._post("batch", {"ops": [{"op": "add", "product_id": self.remera.pk, "qty": MAX_QTY}] * 3})
+        self.assertEqual(CartItem.objects.get().qty, MAX_QTY)
+        user = get_user_model().objects.create_user("tope", password="x")
+        Cart.objects.create(user=user).items.create(product=self.remera, qty=MAX_QTY, name="Remera", price_cents=100050)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/api/cart/summary/").json()["total_qty"], MAX_QTY)
+
+    def test_batch_query_count_does_not_grow_with_ops(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 1})
+        self.client.get("/api/cart/")  # precios en cache
+        ops = [{"op": "update", "product_id": self.remera.pk, "qty": n} for n in range(2, 30)]
+        ops.append({"op": "add", "product_id": self.remera.pk, "qty": 1})
+        # sesión + productos + líneas + UPDATE + contador + lectura (sin contar los savepoints)
+        with CaptureQueriesContext(connection) as ctx:
+            self._post("batch", {"ops": ops})
+        queries = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(queries), 6)
+        self.assertEqual(CartItem.objects.get().qty, 30)
+
+    def test_summary_reads_the_counter_and_honours_etag(self):
+        self.assertEqual(self.client.get("/api/cart/summary/").json(), {"total_qty": 0, "version": 0})
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        self._post("batch", {"ops": [{"op": "add", "product_id": self.short.pk, "qty": 3}]})
+
+        with self.assertNumQueries(2):  # sesión + la fila de Cart
+            r = self.client.get("/api/cart/summary/")
+        self.assertEqual(r.json()["total_qty"], 5)
+        self.assertEqual(self.client.get("/api/cart/summary/", HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 304)
+
+        self._post("update", {"product_id": self.short.pk, "qty": 1})
+        r2 = self.client.get("/api/cart/summary/", HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual((r2.status_code, r2.json()["total_qty"]), (200, 3))
+        self._post("remove", {"product_id": self.remera.pk})
+        self.assertEqual(self.client.get("/api/cart/summary/").json()["total_qty"], 1)
+
+    def test_context_processor_renders_the_badge(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 2})
+        self.assertContains(self.client.get("/cart/"), 'data-count="2"')
+
+    def test_shared_pages_leave_the_badge_to_the_summary(self):
+        self._post("add", {"product_id": self.remera.pk, "qty": 7})
+        for url in ("/products/", f"/products/{self.remera.pk}/"):
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), "data-count=")
+        # otro visitante recibe el listado cacheado: sin la cantidad del primero
+        self.assertNotContains(Client().get("/products/"), "data-count=")
+
+    def test_money_is_kept_in_integer_cents(self):
+        tres = Product.objects.create(nombre="Medias", precio=Decimal("0.10"), stock=100)
+        self._post("add", {"product_id": tres.pk, "qty": 3})
+        self._post("add", {"product_id": self.remera.pk, "qty": 3})
+        self.assertEqual(dict(CartItem.objects.values_list("product_id", "price_cents")), {tres.pk: 10, self.remera.pk: 100050})
+        data = self.client.get("/api/cart/").json()
+        # con floats: 0.1 * 3 = 0.30000000000000004
+        self.assertEqual([i["subtotal"] for i in data["items"]], [0.3, 3001.5])
+        self.assertEqual(data["total_price"], 3001.8)
+
+        session = self.client.session
+        session["cart"] = {"items": {str(self.short.pk): {"name": "Short", "price": 19.995, "qty": 1}}}
+        session.save()
+        self.client.get("/api/cart/")
+        self.assertEqual(CartItem.objects.get(product=self.short).price_cents, 2000)  # 19.995 -> 20.00
+
+    def test_most_expensive_product_fits_in_cents(self):
+        caro = Product.objects.create(nombre="Yate", precio=Decimal("99999999.99"), stock=1)
+        r = self._post("add", {"product_id": caro.pk, "qty": 1})
+        self.assertEqual(CartItem.objects.get().price_cents, 9_999_999_999)  # > 2**31 - 1
+        self.assertEqual(r.json()["total_price"], 99999999.99)
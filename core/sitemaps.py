@@ -1,7 +1,24 @@
 # core/sitemaps.py
+"""
+Sitemaps del sitio: páginas estáticas, productos activos y posts del foro.
+
+Se sirven con ``core.views.sitemap_index`` / ``sitemap_section`` en vez de la
+vista de ``django.contrib.sitemaps``: cada sección se parte en páginas de
+``limit`` URLs (50k, el máximo del protocolo), el XML se genera en streaming
+recorriendo ``values_list(...).iterator()`` (sin instanciar modelos) y queda
+cacheado por ``version()``: para productos, la versión del catálogo.
+"""
+import math
+
 from django.contrib.sitemaps import Sitemap
+from django.db.models import Count, Max
 from django.urls import reverse
 
+from foro.models import Post
+from products.cache import get_catalog_version
+from products.models import Product
+
+
 class StaticViewSitemap(Sitemap):
     priority = 0.5
     changefreq = "weekly"
@@ -11,3 +28,58 @@ class StaticViewSitemap(Sitemap):
 
     def location(self, item):
         return reverse(item)
+
+    def version(self):
+        return "static"
+
+
+class _RowsSitemap(Sitemap):
+    """Secciones grandes: ``items()`` devuelve filas ``(id, actualizado_en)`` ordenadas por id."""
+    limit = 50000
+
+    def num_pages(self) -> int:
+        return max(1, math.ceil(self.items().count() / self.limit))
+
+    def page_items(self, page: int, chunk_size: int = 2000):
+        start = (page - 1) * self.limit
+        return self.items()[start:start + self.limit].iterator(chunk_size=chunk_size)
+
+    def lastmod(self, item):
+        return item[1]
+
+
+class ProductSitemap(_RowsSitemap):
+    priority = 0.8
+    changefreq = "daily"
+
+    def items(self):
+        return Product.objects.filter(activo=True).order_by("id").values_list("id", "actualizado_en")
+
+    def location(self, item):
+        return reverse("product-detail", args=[item[0]])
+
+    def version(self):
+        return get_catalog_version()
+
+
+class PostSitemap(_RowsSitemap):
+    priority = 0.4
+    changefreq = "weekly"
+
+    def items(self):
+        return Post.objects.order_by("id").values_list("id", "actualizado_en")
+
+    def location(self, item):
+        return reverse("foro:post-detail", args=[item[0]])
+
+    def version(self):
+        # los posts no mueven la versión del catálogo: su "versión" es un agregado barato
+        agg = Post.objects.aggregate(n=Count("id"), last=Max("actualizado_en"))
+        return f"{agg['n']}-{agg['last'].timestamp() if agg['last'] else 0}"
+
+
+SITEMAPS = {
+    "static": StaticViewSitemap,
+    "products": ProductSitemap,
+    "posts": PostSitemap,
+}
@@ -1,3 +1,65 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from foro.models import Post
+from products.models import Product
+
+from .sitemaps import ProductSitemap
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("autor", password="x")
+        self.p1 = Product.objects.create(nombre="Taladro", precio=Decimal("1000"), descripcion="")
+        self.p2 = Product.objects.create(nombre="Martillo", precio=Decimal("500"), descripcion="")
+        self.off = Product.objects.create(nombre="Viejo", precio=Decimal("1"), descripcion="", activo=False)
+        self.post = Post.objects.create(titulo="Hola", contenido="...", autor=self.user)
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode() if response.streaming else response.content.decode()
+
+    def test_index_lists_every_section(self):
+        body = self.client.get(reverse("sitemap")).content.decode()
+        self.assertIn("<sitemapindex", body)
+        for name in ("static", "products", "posts"):
+            self.assertIn(reverse("sitemap-section", args=[name, 1]), body)
+
+    def test_products_section_has_active_products_with_lastmod(self):
+        body = self._content(self.client.get(reverse("sitemap-section", args=["products", 1])))
+        self.assertIn(reverse("product-detail", args=[self.p1.pk]), body)
+        self.assertIn(reverse("product-detail", args=[self.p2.pk]), body)
+        self.assertNotIn(reverse("product-detail", args=[self.off.pk]), body)
+        self.assertIn(f"<lastmod>{self.p1.actualizado_en.date().isoformat()}</lastmod>", body)
+
+    def test_posts_section(self):
+        body = self._content(self.client.get(reverse("sitemap-section", args=["posts", 1])))
+        self.assertIn(reverse("foro:post-detail", args=[self.post.pk]), body)
+
+    def test_splits_sections_in_pages(self):
+        with mock.patch.object(ProductSitemap, "limit", 1):
+            index = self.client.get(reverse("sitemap")).content.decode()
+            self.assertIn(reverse("sitemap-section", args=["products", 2]), index)
+            self.assertNotIn(reverse("sitemap-section", args=["products", 3]), index)
+            second = self._content(self.client.get(reverse("sitemap-section", args=["products", 2])))
+            self.assertIn(reverse("product-detail", args=[self.p2.pk]), second)
+            self.assertNotIn(reverse("product-detail", args=[self.p1.pk]), second)
+            self.assertEqual(self.client.get(reverse("sitemap-section", args=["products", 3])).status_code, 404)
+
+    def test_section_is_cached_per_catalog_version(self):
+        url = reverse("sitemap-section", args=["products", 1])
+        self._content(self.client.get(url))
+        with self.assertNumQueries(0):
+            self.assertIn(reverse("product-detail", args=[self.p1.pk]), self.client.get(url).content.decode())
+
+        # un cambio en el catálogo invalida la copia
+        nuevo = Product.objects.create(nombre="Sierra", precio=Decimal("700"), descripcion="")
+        self.assertIn(reverse("product-detail", args=[nuevo.pk]), self._content(self.client.get(url)))
 
-# Create your tests here.
+    def test_unknown_section(self):
+        self.assertEqual(self.client.get("/sitemap-nada-1.xml").status_code, 404)
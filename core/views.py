@@ -1,3 +1,103 @@
-from django.shortcuts import render
+# core/views.py
+"""
+Sitemap index + secciones paginadas (ver ``core.sitemaps``).
 
-# Create your views here.
+``/sitemap.xml`` es un índice que apunta a ``/sitemap-<sección>-<página>.xml``.
+Cada sección se genera en streaming y, al terminar, el XML completo queda en
+cache con la versión de la sección en la clave: mientras el catálogo no cambie
+se sirve desde ahí sin tocar la base.
+"""
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from .sitemaps import SITEMAPS
+
+SITEMAP_TIMEOUT = 24 * 60 * 60
+CONTENT_TYPE = "application/xml; charset=utf-8"
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = "</urlset>\n"
+
+
+def _base_url(request) -> str:
+    return request.build_absolute_uri("/").rstrip("/")
+
+
+def _num_pages(sm) -> int:
+    return sm.num_pages() if hasattr(sm, "num_pages") else 1
+
+
+def _page_items(sm, page: int):
+    return sm.page_items(page) if hasattr(sm, "page_items") else sm.items()
+
+
+def _url_entry(base: str, sm, item) -> str:
+    parts = [f"<url><loc>{escape(base + sm.location(item))}</loc>"]
+    lastmod = sm.lastmod(item) if hasattr(sm, "lastmod") else None
+    if lastmod:
+        parts.append(f"<lastmod>{lastmod.date().isoformat()}</lastmod>")
+    if sm.changefreq:
+        parts.append(f"<changefreq>{sm.changefreq}</changefreq>")
+    if sm.priority is not None:
+        parts.append(f"<priority>{sm.priority:.1f}</priority>")
+    parts.append("</url>\n")
+    return "".join(parts)
+
+
+def _stream_and_cache(key: str, parts):
+    """Devuelve cada parte al cliente y guarda el XML completo sólo si se llegó al final."""
+    done = []
+    for part in parts:
+        done.append(part)
+        yield part
+    cache.set(key, "".join(done), SITEMAP_TIMEOUT)
+
+
+@require_safe
+def sitemap_index(request):
+    sections = {name: cls() for name, cls in SITEMAPS.items()}
+    versions = ":".join(f"{name}={sm.version()}" for name, sm in sections.items())
+    key = f"sitemap:index:{_base_url(request)}:{versions}"
+    xml = cache.get(key)
+    if xml is None:
+        base = _base_url(request)
+        entries = [
+            f"<sitemap><loc>{escape(base + reverse('sitemap-section', args=[name, page]))}</loc></sitemap>\n"
+            for name, sm in sections.items()
+            for page in range(1, _num_pages(sm) + 1)
+        ]
+        xml = (
+            XML_HEAD
+            + '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "".join(entries)
+            + "</sitemapindex>\n"
+        )
+        cache.set(key, xml, SITEMAP_TIMEOUT)
+    return HttpResponse(xml, content_type=CONTENT_TYPE)
+
+
+@require_safe
+def sitemap_section(request, section: str, page: int):
+    cls = SITEMAPS.get(section)
+    if cls is None or page < 1:
+        raise Http404("Sitemap inexistente")
+    sm = cls()
+    base = _base_url(request)
+    key = f"sitemap:{section}:{page}:{base}:{sm.version()}"
+    xml = cache.get(key)
+    if xml is not None:
+        return HttpResponse(xml, content_type=CONTENT_TYPE)
+    if page > _num_pages(sm):
+        raise Http404("Página de sitemap inexistente")
+
+    def parts():
+        yield XML_HEAD + URLSET_OPEN
+        for item in _page_items(sm, page):
+            yield _url_entry(base, sm, item)
+        yield URLSET_CLOSE
+
+    return StreamingHttpResponse(_stream_and_cache(key, parts()), content_type=CONTENT_TYPE)
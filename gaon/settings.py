@@ -76,6 +76,9 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                # badge del carrito en el render (sacarlo vuelve a pedir /api/cart/summary/ al cargar;
+                # las páginas cacheadas/con ETag lo saltean, ver cart.context_processors.without_cart_count)
+                'cart.context_processors.cart',
             ],
         },
     },
@@ -116,6 +119,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # base de tests en archivo (no en memoria compartida) para que los tests
+        # de concurrencia usen varias conexiones de verdad
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -168,6 +174,37 @@ if USE_CLOUDINARY:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache (listados del catálogo, etc.). Por defecto en memoria del proceso; en
+# producción con varios workers conviene un backend compartido, p. ej.
+# CACHE_URL=redis://localhost:6379/1 o pymemcache://127.0.0.1:11211
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://gaon"),
+}
+# TTL (segundos) de las respuestas cacheadas del catálogo público
+CATALOG_CACHE_TIMEOUT = env.int("CATALOG_CACHE_TIMEOUT", default=300)
+# Presupuesto (ms) de la corrección de tipeo cuando una búsqueda no trae resultados
+SEARCH_FALLBACK_BUDGET_MS = env.int("SEARCH_FALLBACK_BUDGET_MS", default=50)
+# Derivados de Product.imagen (products/images.py): en un pool de threads fuera del
+# request; con False se generan en línea (tests, o si no se quieren threads)
+IMAGE_VARIANTS_ASYNC = env.bool("IMAGE_VARIANTS_ASYNC", default=True)
+IMAGE_VARIANTS_WORKERS = env.int("IMAGE_VARIANTS_WORKERS", default=2)
+# Segundos que dura una reserva de stock del checkout sin pago confirmado (products/inventory.py)
+STOCK_RESERVATION_TTL = env.int("STOCK_RESERVATION_TTL", default=15 * 60)
+# Tope de una reserva con pago pendiente si MP no informa vencimiento (payments/mp.py)
+STOCK_RESERVATION_PENDING_TTL = env.int("STOCK_RESERVATION_PENDING_TTL", default=3 * 24 * 60 * 60)
+# Proxy/cache local de Product.image_url (products/image_proxy.py), apagado por defecto
+IMAGE_PROXY_ENABLED = env.bool("IMAGE_PROXY_ENABLED", default=False)
+IMAGE_PROXY_WIDTH = env.int("IMAGE_PROXY_WIDTH", default=640)
+IMAGE_PROXY_MAX_BYTES = env.int("IMAGE_PROXY_MAX_BYTES", default=200 * 1024 * 1024)
+IMAGE_PROXY_MAX_FETCHES = env.int("IMAGE_PROXY_MAX_FETCHES", default=4)
+IMAGE_PROXY_TIMEOUT = env.float("IMAGE_PROXY_TIMEOUT", default=5)
+# timeouts por host, ej. IMAGE_PROXY_HOST_TIMEOUTS="picsum.photos=3,fastly.picsum.photos=3"
+IMAGE_PROXY_HOST_TIMEOUTS = {host: float(t) for host, t in env.dict("IMAGE_PROXY_HOST_TIMEOUTS", default={}).items()}
+# si se define, sólo se descargan estos hosts (y se permiten IPs privadas para ellos)
+IMAGE_PROXY_ALLOWED_HOSTS = env.list("IMAGE_PROXY_ALLOWED_HOSTS", default=[])
+# Panel del vendedor (products/dashboard.py): alerta "stock bajo" con stock <= este valor
+LOW_STOCK_THRESHOLD = env.int("LOW_STOCK_THRESHOLD", default=3)
+
 # Sesión automática: duración en segundos (30 minutos)
 SESSION_COOKIE_AGE = 30 * 60  # 1800 segundos
 
@@ -11,9 +11,8 @@ from django.urls import path, include
 # API docs
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-# Sitemap
-from django.contrib.sitemaps.views import sitemap
-from core.sitemaps import StaticViewSitemap
+# Sitemap (índice + secciones paginadas, ver core.sitemaps)
+from core.views import sitemap_index, sitemap_section
 
 # Auth views (HTML)
 from users.views import login_page, signup_page, social_bridge, session_from_token
@@ -21,14 +20,9 @@ from users.views import login_page, signup_page, social_bridge, session_from_tok
 # Web views extra
 from products.views import home, compare_prices_view  # home NO se importa, usamos TemplateView
 
-# --- Sitemaps registry ---
-sitemaps = {
-    "static": StaticViewSitemap,
-}
-
 # --- robots.txt ---
-def robots_txt(_request):
-    content = "User-agent: *\nAllow: /\nSitemap: /sitemap.xml\n"
+def robots_txt(request):
+    content = f"User-agent: *\nAllow: /\nSitemap: {request.build_absolute_uri('/sitemap.xml')}\n"
     return HttpResponse(content, content_type="text/plain")
 
 
@@ -89,6 +83,7 @@ urlpatterns = [
 
     # ---------- SEO ----------
     path("robots.txt", robots_txt, name="robots"),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="django.contrib.sitemaps.views.sitemap"),
+    path("sitemap.xml", sitemap_index, name="sitemap"),
+    path("sitemap-<slug:section>-<int:page>.xml", sitemap_section, name="sitemap-section"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
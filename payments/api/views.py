@@ -4,31 +4,34 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.conf import settings
-from django.utils import timezone
 from products.models import Product
+from products import inventory
+from cart import storage as cart_storage
+from cart.money import to_amount, to_cents
+from payments import mp
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 import mercadopago
 import json
 
+
+def _mp_item(p, qty: int) -> dict:
+    """Ítem de la preferencia de MP: el precio pasa por centavos enteros (cart/money.py)."""
+    return {
+        "id": str(p.id),
+        "title": p.nombre,
+        "currency_id": "ARS",
+        "quantity": qty,
+        "unit_price": to_amount(to_cents(p.precio)),
+    }
+
+
 def _session_cart_items(request):
     """
-    Lee ítems del carrito desde la sesión.
-    Soporta estructuras típicas:
-      - dict {product_id: qty}
-      - dict {'items': [{'product_id': id, 'qty': n}, ...]}
-      - list [{'product_id': id, 'qty': n}, ...]
+    Lee ítems del carrito actual (cart/storage.py: el de la sesión o el del usuario).
     Devuelve: [{'product': Product, 'qty': int}, ...]
     """
-    cart = request.session.get("cart") or request.session.get("CART") or {}
-    pairs = []
-
-    if isinstance(cart, dict) and "items" not in cart:
-        pairs = list(cart.items())
-    elif isinstance(cart, dict) and isinstance(cart.get("items"), list):
-        pairs = [(i.get("product_id"), i.get("qty")) for i in cart["items"]]
-    elif isinstance(cart, list):
-        pairs = [(i.get("product_id"), i.get("qty")) for i in cart]
+    pairs = [(line["product_id"], line["qty"]) for line in cart_storage.lines(request)]
 
     norm = []
     for pid, qty in pairs:
@@ -43,7 +46,7 @@ def _session_cart_items(request):
     if not norm:
         return []
 
-    qs = Product.objects.filter(id__in=[pid for pid, _ in norm])
+    qs = Product.objects.filter(id__in=[pid for pid, _ in norm]).only("id", "nombre", "precio")
     pmap = {p.id: p for p in qs}
 
     items = []
@@ -74,7 +77,7 @@ class CreatePreferenceView(APIView):
                 ids = [int(x.get("product_id")) for x in client_items if x.get("product_id") is not None]
             except Exception:
                 ids = []
-            qs = Product.objects.filter(id__in=ids)
+            qs = Product.objects.filter(id__in=ids).only("id", "nombre", "precio")
             pmap = {p.id: p for p in qs}
 
             for x in client_items:
@@ -85,35 +88,15 @@ class CreatePreferenceView(APIView):
                     continue
                 if qty <= 0 or pid not in pmap:
                     continue
-                p = pmap[pid]
-                title = getattr(p, "nombre", getattr(p, "name", "Producto"))
-                price = getattr(p, "precio", getattr(p, "price", 0))
-                unit_price = float(price)
-                items.append({
-                    "id": str(p.id),
-                    "title": title,
-                    "currency_id": "ARS",
-                    "quantity": qty,
-                    "unit_price": unit_price,
-                })
+                items.append(_mp_item(pmap[pid], qty))
                 total_qty += qty
 
         # --- 2) Si no vinieron ítems, caemos al carrito en sesión (fallback) ---
         if not items:
             cart_items = _session_cart_items(request)  # función que ya te dejé
             for it in cart_items:
-                p = it["product"]
                 qty = int(it["qty"])
-                title = getattr(p, "nombre", getattr(p, "name", "Producto"))
-                price = getattr(p, "precio", getattr(p, "price", 0))
-                unit_price = float(price)
-                items.append({
-                    "id": str(p.id),
-                    "title": title,
-                    "currency_id": "ARS",
-                    "quantity": qty,
-                    "unit_price": unit_price,
-                })
+                items.append(_mp_item(it["product"], qty))
                 total_qty += qty
 
         if not items:
@@ -129,9 +112,19 @@ class CreatePreferenceView(APIView):
         success_url = abs_uri("/payments/success/")
         failure_url = abs_uri("/payments/failure/")
         pending_url = abs_uri("/payments/pending/")
-        #notification_url = abs_uri("/api/payments/mp/webhook/")
-
-        ref = f"cart-{request.session.session_key or 'anon'}-{int(timezone.now().timestamp())}"
+        notification_url = abs_uri("/api/payments/mp/webhook/")
+
+        # --- 3) Reservamos stock antes de mandar a pagar (se libera si el pago falla o vence) ---
+        inventory.release_expired()
+        # un click repetido no suma otra reserva: lo del checkout anterior sin pagar vuelve al stock
+        mp.release_previous(request.session)
+        # token al azar que queda en la sesión (ver payments/mp.py), no la clave de sesión
+        ref = mp.reference_for(request.session)
+        try:
+            inventory.reserve(ref, [(int(it["id"]), it["quantity"]) for it in items])
+        except inventory.OutOfStock as e:
+            return Response({"error": "No hay stock suficiente para completar la compra.", "product_id": e.product_id},
+                            status=status.HTTP_409_CONFLICT)
 
         sdk = mercadopago.SDK(token)
         print("MP back_urls:", success_url, failure_url, pending_url)
@@ -143,14 +136,20 @@ class CreatePreferenceView(APIView):
                 "failure": failure_url,
                 "pending": pending_url,
             },
-            #"notification_url": notification_url,
+            # MP avisa acá los cambios de estado aunque el comprador no vuelva (pagos en efectivo, etc.)
+            "notification_url": notification_url,
             # "auto_return": "approved",  # ⬅️ comentar/quitar en desarrollo
             "external_reference": ref,
         }
 
 
-        pref = sdk.preference().create(pref_data)
+        try:
+            pref = sdk.preference().create(pref_data)
+        except Exception:
+            inventory.release(ref)
+            raise
         if pref.get("status") != 201:
+            inventory.release(ref)
             return Response({"error": "No se pudo crear la preferencia", "mp": pref},
                             status=status.HTTP_502_BAD_GATEWAY)
 
@@ -161,7 +160,11 @@ class CreatePreferenceView(APIView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class WebhookView(APIView):
-    """Webhook de MercadoPago (opcional)."""
+    """
+    Webhook/IPN de MercadoPago. Del aviso sólo se usa el id del pago: el estado
+    se consulta a MP con nuestro token (payments/mp.py), así que un aviso
+    inventado no puede confirmar ni liberar nada.
+    """
     authentication_classes = []
     permission_classes = [AllowAny]
 
@@ -170,6 +173,17 @@ class WebhookView(APIView):
             data = json.loads(request.body.decode("utf-8") or "{}")
         except Exception:
             data = {}
+        if not isinstance(data, dict):
+            data = {}
+        # webhooks: {"type": "payment", "data": {"id": ...}}; IPN: ?topic=payment&id=...
+        kind = data.get("type") or data.get("topic") or request.GET.get("type") or request.GET.get("topic")
+        body = data.get("data") if isinstance(data.get("data"), dict) else {}
+        payment_id = body.get("id") or request.GET.get("data.id") or request.GET.get("id")
+        if kind != "payment" or not payment_id:
+            return Response({"received": True}, status=status.HTTP_200_OK)
+        if mp.sync_payment(payment_id) is None:
+            # que MP reintente más tarde
+            return Response({"received": False}, status=status.HTTP_502_BAD_GATEWAY)
         return Response({"received": True}, status=status.HTTP_200_OK)
 
     def get(self, request):
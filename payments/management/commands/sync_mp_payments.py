@@ -0,0 +1,33 @@
+# payments/management/commands/sync_mp_payments.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments import mp
+from products import inventory
+from products.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulta en Mercado Pago los pagos de las reservas que siguen abiertas y a\n"
+        "punto de vencer (por si el webhook no llegó ni el comprador volvió), aplica su\n"
+        "estado y después libera las vencidas. Pensado para cron en lugar de\n"
+        "release_expired_reservations.\n"
+        "Uso: python manage.py sync_mp_payments [--window 300]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window", type=int, default=300,
+                            help="Segundos antes del vencimiento a partir de los que se consulta (default 300).")
+
+    def handle(self, *args, **opts):
+        soon = timezone.now() + timedelta(seconds=opts["window"])
+        refs = (
+            StockReservation.objects.filter(status=StockReservation.HELD, expires_at__lte=soon)
+            .order_by().values_list("reference", flat=True).distinct()
+        )
+        synced = sum(1 for ref in refs if mp.sync_reference(ref) is not None)
+        released = inventory.release_expired()
+        self.stdout.write(self.style.SUCCESS(f"💳 Pagos sincronizados: {synced} · 📦 reservas vencidas liberadas: {released}"))
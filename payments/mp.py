@@ -0,0 +1,127 @@
+# payments/mp.py
+"""
+Referencias de checkout y sincronización de pagos de Mercado Pago con las
+reservas de stock (products/inventory.py).
+
+- ``external_reference`` es un token al azar por checkout (no la clave de
+  sesión: viaja en la preferencia, en las back_urls y en los logs). La sesión
+  guarda los suyos y los retornos sólo actúan sobre una referencia propia.
+- Un checkout nuevo de la misma sesión libera lo que sus checkouts anteriores
+  dejaron reservado (``release_previous``), salvo que MP tenga un pago aprobado
+  o pendiente para esa referencia: repetir el click no acumula reservas.
+- El estado del pago nunca se toma de la URL de retorno: se consulta a MP
+  (``sync_payment``), desde el webhook, desde los retornos y desde el comando
+  ``sync_mp_payments`` para los que no volvieron ni notificaron.
+  * approved -> la reserva queda firme;
+  * pending/in_process/... -> se extiende hasta que venza el pago (efectivo);
+  * rejected/cancelled/... -> se libera.
+"""
+import logging
+import secrets
+from datetime import timedelta
+
+import mercadopago
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from products import inventory
+from products.models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+REFS_SESSION_KEY = "checkout_refs"
+MAX_REFS = 10  # checkouts recientes que la sesión puede resolver
+
+APPROVED = {"approved"}
+PENDING = {"pending", "in_process", "authorized", "in_mediation"}
+FAILED = {"rejected", "cancelled", "refunded", "charged_back"}
+
+
+def reference_for(session) -> str:
+    """Nueva external_reference para un checkout de esta sesión (y la recuerda en ella)."""
+    ref = f"cart-{secrets.token_urlsafe(18)}"
+    session[REFS_SESSION_KEY] = (session.get(REFS_SESSION_KEY) or [])[-(MAX_REFS - 1):] + [ref]
+    return ref
+
+
+def owns_reference(session, ref) -> bool:
+    return bool(ref) and ref in (session.get(REFS_SESSION_KEY) or [])
+
+
+def release_previous(session, sdk=None) -> int:
+    """
+    Libera las reservas todavía vigentes de los checkouts anteriores de la sesión
+    que no tienen un pago aprobado o pendiente en MP. Devuelve cuántas referencias liberó.
+    """
+    refs = session.get(REFS_SESSION_KEY) or []
+    held = set(
+        StockReservation.objects.filter(reference__in=refs, status=StockReservation.HELD)
+        .values_list("reference", flat=True)
+    )
+    released = 0
+    for ref in held:
+        # si ya pagó (o está pagando en efectivo) la reserva es suya: queda firme o extendida
+        if sync_reference(ref, sdk) in APPROVED | PENDING:
+            continue
+        released += bool(inventory.release(ref))
+    return released
+
+
+def pending_ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_PENDING_TTL", 3 * 24 * 60 * 60))
+
+
+def _sdk():
+    token = getattr(settings, "MP_ACCESS_TOKEN", "")
+    return mercadopago.SDK(token) if token else None
+
+
+def apply_payment(payment: dict) -> str:
+    """Lleva la reserva de ``payment['external_reference']`` al estado del pago. Devuelve el estado."""
+    ref = payment.get("external_reference") or ""
+    state = payment.get("status") or ""
+    if not ref:
+        return state
+    if state in APPROVED:
+        inventory.commit(ref)
+    elif state in PENDING:
+        until = parse_datetime(payment.get("date_of_expiration") or "") or timezone.now() + pending_ttl()
+        inventory.extend(ref, until)
+    elif state in FAILED:
+        inventory.release(ref)
+    return state
+
+
+def sync_payment(payment_id, sdk=None):
+    """Consulta el pago ``payment_id`` en MP y aplica su estado; ``None`` si no se pudo consultar."""
+    sdk = sdk or _sdk()
+    if sdk is None or not payment_id:
+        return None
+    try:
+        resp = sdk.payment().get(payment_id)
+    except Exception:
+        logger.exception("No se pudo consultar el pago %s en MP", payment_id)
+        return None
+    if resp.get("status") != 200 or not isinstance(resp.get("response"), dict):
+        logger.warning("MP respondió %s al consultar el pago %s", resp.get("status"), payment_id)
+        return None
+    return apply_payment(resp["response"])
+
+
+def sync_reference(ref, sdk=None):
+    """Busca en MP los pagos de ``ref`` y aplica el más reciente; ``None`` si no hay o falló."""
+    sdk = sdk or _sdk()
+    if sdk is None:
+        return None
+    try:
+        resp = sdk.payment().search(filters={"external_reference": ref, "sort": "date_created", "criteria": "desc"})
+    except Exception:
+        logger.exception("No se pudieron buscar los pagos de %s en MP", ref)
+        return None
+    results = ((resp.get("response") or {}).get("results") or []) if resp.get("status") == 200 else []
+    if not results:
+        return None
+    # si alguno se aprobó, ese manda (un rechazo previo no debe liberar lo ya pagado)
+    payment = next((p for p in results if p.get("status") in APPROVED), results[0])
+    return apply_payment(payment)
@@ -1,3 +1,135 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from products import inventory
+from products.models import Product, StockReservation
+
+
+@override_settings(MP_ACCESS_TOKEN="TEST-token")
+class CreatePreferenceStockTests(TestCase):
+    def setUp(self):
+        self.p = Product.objects.create(nombre="Campera", precio=Decimal("1000"), stock=2)
+        patcher = mock.patch("payments.api.views.mercadopago.SDK")
+        self.sdk = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.create = self.sdk.return_value.preference.return_value.create
+        self.create.return_value = {"status": 201, "response": {"init_point": "https://mp.test/pay"}}
+
+    def _checkout(self, qty):
+        return self.client.post(
+            "/api/payments/create/", {"items": [{"product_id": self.p.pk, "qty": qty}]}, content_type="application/json"
+        )
+
+    def _stock(self):
+        return Product.objects.values_list("stock", flat=True).get(pk=self.p.pk)
+
+    def test_items_are_priced_from_cents(self):
+        Product.objects.filter(pk=self.p.pk).update(precio=Decimal("1999.99"))
+        self._checkout(1)
+        item = self.create.call_args[0][0]["items"][0]
+        self.assertEqual((item["unit_price"], item["title"], item["quantity"]), (1999.99, "Campera", 1))
+
+    def test_reserves_stock_and_refuses_oversell(self):
+        resp = self._checkout(2)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._stock(), 0)
+        ref = resp.json()["external_reference"]
+        self.assertEqual(StockReservation.objects.get().reference, ref)
+
+        again = self.client_class().post(  # otro comprador
+            "/api/payments/create/", {"items": [{"product_id": self.p.pk, "qty": 1}]}, content_type="application/json"
+        )
+        self.assertEqual(again.status_code, 409)
+        self.assertEqual(again.json()["product_id"], self.p.pk)
+        self.assertEqual(self.create.call_count, 1)  # ni se llegó a Mercado Pago
+
+    def test_second_checkout_replaces_the_previous_reservation(self):
+        first = self._checkout(2).json()["external_reference"]
+        second = self._checkout(2)
+        self.assertEqual(second.status_code, 200)  # no se bloqueó contra sí mismo
+        self.assertEqual(self._stock(), 0)
+        held = StockReservation.objects.filter(status=StockReservation.HELD)
+        self.assertEqual(list(held.values_list("reference", "qty")), [(second.json()["external_reference"], 2)])
+        self.assertEqual(StockReservation.objects.get(reference=first).status, StockReservation.RELEASED)
+
+    def test_second_checkout_keeps_a_reservation_with_a_pending_payment(self):
+        first = self._checkout(1).json()["external_reference"]
+        self.sdk.return_value.payment.return_value.search.return_value = {
+            "status": 200, "response": {"results": [{"external_reference": first, "status": "pending"}]},
+        }
+        self.assertEqual(self._checkout(1).status_code, 200)
+        self.assertEqual(self._stock(), 0)  # el ticket en efectivo sigue reservado
+        self.assertEqual(StockReservation.objects.get(reference=first).status, StockReservation.HELD)
+
+    def test_releases_when_preference_fails(self):
+        self.create.return_value = {"status": 400, "response": {}}
+        self.assertEqual(self._checkout(2).status_code, 502)
+        self.assertEqual(self._stock(), 2)
+
+    def test_failure_return_releases_only_own_reference(self):
+        ref = self._checkout(2).json()["external_reference"]
+        self.client.get("/payments/failure/", {"external_reference": "cart-otra-sesion-1-abc"})
+        self.assertEqual(self._stock(), 0)
+        self.client.get("/payments/failure/", {"external_reference": ref})
+        self.assertEqual(self._stock(), 2)
+
+    def _mp_payment(self, ref, state, **extra):
+        self.sdk.return_value.payment.return_value.get.return_value = {
+            "status": 200, "response": {"id": 55, "external_reference": ref, "status": state, **extra},
+        }
+
+    def test_reference_is_a_random_token_not_the_session_key(self):
+        ref = self._checkout(1).json()["external_reference"]
+        key = self.client.session.session_key
+        self.assertNotIn(key, ref)
+        self.assertIn(ref, self.client.session["checkout_refs"])
+        notification_url = self.create.call_args[0][0]["notification_url"]
+        self.assertTrue(notification_url.endswith("/api/payments/mp/webhook/"))
+
+    def test_approved_return_commits_after_asking_mp(self):
+        ref = self._checkout(1).json()["external_reference"]
+        # el status de la URL no alcanza: MP dice que sigue pendiente
+        self._mp_payment(ref, "pending")
+        self.client.get("/payments/success/", {"external_reference": ref, "status": "approved", "payment_id": "55"})
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.HELD)
+
+        self._mp_payment(ref, "approved")
+        self.client.get("/payments/success/", {"external_reference": ref, "status": "approved", "payment_id": "55"})
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.COMMITTED)
+
+    def test_webhook_settles_reservations_without_the_buyer(self):
+        ref = self._checkout(1).json()["external_reference"]
+        self._mp_payment(ref, "pending", date_of_expiration="2099-01-01T00:00:00.000-03:00")
+        r = self.client.post("/api/payments/mp/webhook/", {"type": "payment", "data": {"id": "55"}},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(StockReservation.objects.get().expires_at.year, 2099)  # pago en efectivo: no vence
+        self.assertEqual(inventory.release_expired(), 0)
+
+        self._mp_payment(ref, "approved")
+        self.client.post("/api/payments/mp/webhook/?topic=payment&id=55")
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.COMMITTED)
+
+        self.sdk.return_value.payment.return_value.get.return_value = {"status": 404, "response": {}}
+        r = self.client.post("/api/payments/mp/webhook/", {"type": "payment", "data": {"id": "1"}},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 502)  # MP reintenta
+
+    def test_sync_command_looks_up_payments_before_releasing(self):
+        ref = self._checkout(1).json()["external_reference"]
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.sdk.return_value.payment.return_value.search.return_value = {
+            "status": 200, "response": {"results": [
+                {"external_reference": ref, "status": "rejected"},
+                {"external_reference": ref, "status": "approved"},
+            ]},
+        }
+        call_command("sync_mp_payments", stdout=StringIO())
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.COMMITTED)
+        self.assertEqual(self._stock(), 1)
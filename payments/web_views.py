@@ -1,25 +1,27 @@
 # payments/web_views.py
 from django.shortcuts import render
 
+from cart import storage as cart_storage
+from payments import mp
+from products import inventory
+
 def _clear_cart_session(request):
+    """Vacía el carrito actual (el de la sesión o el del usuario, ver cart/storage.py)."""
+    cart_storage.clear(request)
+
+def _own_reference(request):
     """
-    Limpia el carrito guardado en sesión sin depender de modelos.
-    Soporta estructuras típicas: dict {id: qty}, list de items o dict con 'items'.
+    external_reference del retorno, sólo si la generó esta sesión: los parámetros
+    vienen en la URL y cualquiera podría inventarlos para liberar stock ajeno.
     """
-    if "cart" in request.session:
-        request.session["cart"] = {}
-        request.session.modified = True
-        return
-    if "CART" in request.session:
-        request.session["CART"] = {}
-        request.session.modified = True
-        return
-    # fallback: por si lo guardaron como lista
-    request.session["cart"] = {}
-    request.session.modified = True
+    ref = request.GET.get("external_reference") or ""
+    return ref if mp.owns_reference(request.session, ref) else None
 
 def payment_success(request):
     _clear_cart_session(request)  # limpiar carrito en éxito (opcional)
+    if _own_reference(request):
+        # el estado se consulta a MP; el de la URL no alcanza para confirmar
+        mp.sync_payment(request.GET.get("payment_id"))
     ctx = {
         "payment_id": request.GET.get("payment_id"),
         "status": request.GET.get("status"),
@@ -30,6 +32,9 @@ def payment_success(request):
     return render(request, "payments/success.html", ctx)
 
 def payment_failure(request):
+    ref = _own_reference(request)
+    if ref:
+        inventory.release(ref)  # el stock reservado vuelve al catálogo
     ctx = {
         "payment_id": request.GET.get("payment_id"),
         "status": request.GET.get("status"),
@@ -40,6 +45,8 @@ def payment_failure(request):
     return render(request, "payments/failure.html", ctx)
 
 def payment_pending(request):
+    if _own_reference(request):
+        mp.sync_payment(request.GET.get("payment_id"))  # extiende la reserva mientras siga pendiente
     ctx = {
         "payment_id": request.GET.get("payment_id"),
         "status": request.GET.get("status"),
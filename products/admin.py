@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import Product
+from .models import Product, StockReservation
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('id','nombre','precio','stock','activo','user','creado_en')
     list_filter = ('activo','creado_en')
     search_fields = ('nombre','descripcion','user__username')
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('reference','product','qty','status','expires_at','creado_en')
+    list_filter = ('status',)
+    search_fields = ('reference',)
+    raw_id_fields = ('product',)
@@ -1,11 +1,124 @@
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
+from products import images
 from products.models import Product
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Acepta ``fields=[...]`` (sparse fieldset): los campos no pedidos se sacan antes
+    de serializar, así no se calculan por fila. Los de ``Meta.opt_in_fields`` sólo
+    se incluyen si se piden explícitamente.
+    """
     user = serializers.StringRelatedField(read_only=True)
     imagen = serializers.ImageField(required=False, allow_null=True)
+    imagen_url = serializers.SerializerMethodField()
+    imagen_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ['id','user','nombre','precio','descripcion','imagen','stock','activo','creado_en']
-        read_only_fields = ['id','user','creado_en']
+        fields = ['id','user','nombre','precio','descripcion','imagen','imagen_url','imagen_srcset','stock','activo','creado_en','actualizado_en']
+        read_only_fields = ['id','user','creado_en','actualizado_en']
+        opt_in_fields = ['imagen_url']
+
+    def __init__(self, *args, **kwargs):
+        only = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        keep = set(only) if only is not None else set(self.fields) - set(self.Meta.opt_in_fields)
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
+    def get_imagen_url(self, obj):
+        req = self.context.get("request")
+        if obj.imagen and hasattr(obj.imagen, "url"):
+            return req.build_absolute_uri(obj.imagen.url) if req else obj.imagen.url
+        return None
+
+    def get_imagen_srcset(self, obj):
+        """WebP y JPEG en todos los anchos generados; ``None`` mientras sólo exista el original."""
+        req = self.context.get("request")
+        storage = obj.imagen.storage
+        url = (lambda name: req.build_absolute_uri(storage.url(name))) if req else storage.url
+        return images.srcsets(obj.imagen_hash, obj.imagen_ancho, url)
+
+
+class ProductReadSerializer(serializers.BaseSerializer):
+    """
+    Camino de lectura para listados. Misma salida que ``ProductSerializer`` pero
+    trabaja sobre filas de ``values()`` (ver ``rows()``): sin instanciar modelos,
+    con un solo JOIN para el usuario y la URL base de media resuelta una vez por
+    request. El "plan" de extracción (clave -> función) se arma una sola vez por
+    instancia y después cada fila es un dict comprehension.
+    """
+    # campo de salida -> columnas de values() que necesita
+    COLUMNS = {
+        'id': ['id'],
+        'user': ['user__username'],
+        'nombre': ['nombre'],
+        'precio': ['precio'],
+        'descripcion': ['descripcion'],
+        'imagen': ['imagen'],
+        'imagen_url': ['imagen'],
+        'imagen_srcset': ['imagen_hash', 'imagen_ancho'],
+        'stock': ['stock'],
+        'activo': ['activo'],
+        'creado_en': ['creado_en'],
+        'actualizado_en': ['actualizado_en'],
+    }
+
+    _decimal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    _datetime = serializers.DateTimeField()
+
+    def __init__(self, *args, **kwargs):
+        self.only = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        self._plan = None
+
+    @classmethod
+    def output_fields(cls, fields=None):
+        if fields is not None:
+            return [f for f in ProductSerializer.Meta.fields if f in fields]
+        return [f for f in ProductSerializer.Meta.fields if f not in ProductSerializer.Meta.opt_in_fields]
+
+    @classmethod
+    def rows(cls, qs, fields=None):
+        """
+        ``qs.values(...)`` con sólo las columnas que piden los campos, más las de
+        orden y anotaciones (las necesita el cursor de la paginación keyset).
+        """
+        cols = [c for f in cls.output_fields(fields) for c in cls.COLUMNS[f]]
+        cols += [str(o).lstrip('-') for o in qs.query.order_by]
+        cols += list(qs.query.annotations)
+        missing = getattr(qs.model, 'MISSING_COLUMNS', ())  # ProductCard: se completan aparte
+        return qs.values(*dict.fromkeys(c for c in cols if c not in missing))
+
+    def _media_url(self):
+        storage = Product._meta.get_field('imagen').storage
+        request = self.context.get('request')
+        if isinstance(storage, FileSystemStorage):
+            base = request.build_absolute_uri(storage.base_url) if request else storage.base_url
+            return lambda name: base + filepath_to_uri(name).lstrip('/')
+        # S3/Cloudinary: la URL depende del backend, se la pedimos a él
+        if request:
+            return lambda name: request.build_absolute_uri(storage.url(name))
+        return storage.url
+
+    def _build_plan(self):
+        media = self._media_url()
+        decimal, dt = self._decimal.to_representation, self._datetime.to_representation
+        image = lambda row: media(row['imagen']) if row['imagen'] else None
+        extract = {
+            'user': lambda row: row['user__username'],
+            'precio': lambda row: decimal(row['precio']),
+            'imagen': image,
+            'imagen_url': image,
+            'imagen_srcset': lambda row: images.srcsets(row['imagen_hash'], row['imagen_ancho'], media),
+            'creado_en': lambda row: dt(row['creado_en']),
+            'actualizado_en': lambda row: dt(row['actualizado_en']),
+        }
+        return [(f, extract.get(f) or (lambda row, f=f: row[f])) for f in self.output_fields(self.only)]
+
+    def to_representation(self, row):
+        if self._plan is None:
+            self._plan = self._build_plan()
+        return {name: fn(row) for name, fn in self._plan}
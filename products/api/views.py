@@ -1,10 +1,60 @@
-from django.db import models
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
+from rest_framework.decorators import action
 from rest_framework.request import Request
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
-from products.models import Product
-from .serializers import ProductSerializer
+from products.models import MAX_PK, Product, ProductCard
+from products.filters import parse_filters, filter_products
+from .serializers import ProductSerializer, ProductReadSerializer
+from .renderers import CSVRenderer, NDJSONRenderer
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from products.pagination import InvalidCursor, keyset_page
+from products.cache import listing_cache_key, listing_timeout, listing_etag, product_etag
+from products.facets import catalog_facets, DEFAULT_BUCKETS, MAX_BUCKETS
+from products import autocomplete as product_autocomplete
+from products import cards as product_cards
+from products import bulk_edit
+from products import export as product_export
+from products.typo import did_you_mean
+from products.related import related_products, DEFAULT_TOP_K as RELATED_TOP_K
+from django.core.cache import cache
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from urllib.parse import urlencode
+
+BATCH_MAX_IDS = 500
+
+
+def _split_param(val):
+    """'1,2,3' o [1, 2, 3] -> ['1', '2', '3']"""
+    if val is None:
+        return []
+    if isinstance(val, (list, tuple)):
+        items = val
+    else:
+        items = str(val).split(',')
+    return [str(x).strip() for x in items if str(x).strip()]
+
+
+def _parse_pk(val) -> int:
+    """Un id de producto; ValueError si no es entero o no entra en un BigAutoField."""
+    pk = int(val)
+    if not -MAX_PK - 1 <= pk <= MAX_PK:
+        raise ValueError(val)
+    return pk
+
+
+def _pk_or_404(val) -> int:
+    """``_parse_pk`` para ids de la URL: lo que no es un id válido es un 404, no un 500."""
+    try:
+        return _parse_pk(val)
+    except (TypeError, ValueError, OverflowError):
+        raise NotFound()
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -13,9 +63,41 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.user_id == (request.user.id if request.user and request.user.is_authenticated else None)
 
 class SmallPagination(PageNumberPagination):
+    """
+    Paginación por número de página; con ``?cursor=`` (aunque venga vacío) pasa a
+    modo keyset: sin COUNT ni OFFSET, y la respuesta trae sólo ``next``/``results``.
+    """
     page_size = 12
     page_size_query_param = "page_size"
     max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.next_cursor = None
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        try:
+            items, self.next_cursor = keyset_page(
+                queryset, request.query_params.get(self.cursor_query_param), self.get_page_size(request)
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        return items
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.next_cursor:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({"next": self.get_next_link(), "results": data})
 
 
 @extend_schema(
@@ -24,7 +106,8 @@ class SmallPagination(PageNumberPagination):
         OpenApiParameter(name='min_price', description='Precio mínimo', required=False, type=OpenApiTypes.NUMBER),
         OpenApiParameter(name='max_price', description='Precio máximo', required=False, type=OpenApiTypes.NUMBER),
         OpenApiParameter(name='in_stock', description='true/false', required=False, type=OpenApiTypes.STR),
-        OpenApiParameter(name='order', description='price_asc | price_desc | name | newest | oldest', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='order', description='price_asc | price_desc | name | newest | oldest (con q y sin order: relevancia)', required=False, type=OpenApiTypes.STR),
+        OpenApiParameter(name='cursor', description='Paginación por cursor: vacío = primera página, luego el valor de "next"', required=False, type=OpenApiTypes.STR),
     ]
 )
 class ProductViewSet(viewsets.ModelViewSet):
@@ -38,44 +121,231 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         request = self.request
-        qs = Product.objects.filter(activo=True)
+        # listados sobre la tabla de cards (ver products/cards.py); el resto, y el
+        # ?search= de DRF (busca también en descripcion), sobre Product
+        use_cards = self.action == 'list' and not request.query_params.get(filters.SearchFilter.search_param)
+        qs = ProductCard.objects.all() if use_cards else Product.objects.filter(activo=True)
 
         # 👇 filtro “mis productos”
         if (request.query_params.get('mine') in ('1', 'true')) and request.user.is_authenticated:
             qs = qs.filter(user=request.user)
 
-        q = request.query_params.get('q') or ''
-        if q:
-            qs = qs.filter(models.Q(nombre__icontains=q) | models.Q(descripcion__icontains=q))
-
-        min_price = request.query_params.get('min_price')
-        max_price = request.query_params.get('max_price')
-        if min_price:
-            qs = qs.filter(precio__gte=min_price)
-        if max_price:
-            qs = qs.filter(precio__lte=max_price)
-
-        in_stock = (request.query_params.get('in_stock') or '').lower()
-        if in_stock == 'true':
-            qs = qs.filter(stock__gt=0)
-        elif in_stock == 'false':
-            qs = qs.filter(stock__lte=0)
-
-        order = (request.query_params.get('order') or '').lower()
-        if order == 'price_asc':
-            qs = qs.order_by('precio', '-creado_en')
-        elif order == 'price_desc':
-            qs = qs.order_by('-precio', '-creado_en')
-        elif order == 'name':
-            qs = qs.order_by('nombre', '-creado_en')
-        elif order == 'oldest':
-            qs = qs.order_by('creado_en')
-        else:
-            qs = qs.order_by('-creado_en')
-
+        qs = filter_products(qs, self.get_filters())
+        if self.action == 'list':
+            # listados: filas planas con un JOIN a user (ver ProductReadSerializer)
+            qs = ProductReadSerializer.rows(qs)
         return qs
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and queryset.model is ProductCard:
+            # la descripción no está en la card: una consulta por pk para la página
+            page = product_cards.complete_rows(page, using=queryset.db)
+        return page
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list' and kwargs.get('many'):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return ProductReadSerializer(*args, **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_filters(self):
+        f = parse_filters(self.request.query_params)
+        if getattr(self, 'corrected_q', None):
+            f['q'] = self.corrected_q
+        return f
 
+    def _list_with_fallback(self, request, *args, **kwargs):
+        """list() normal; si una búsqueda no trae nada, reintenta con la corrección de tipeo."""
+        response = super().list(request, *args, **kwargs)
+        q = self.get_filters()['q']
+        first_page = (request.query_params.get('page') or '1') == '1' and not request.query_params.get('cursor')
+        if q and first_page and response.status_code == 200 and not response.data.get('results'):
+            suggestion = did_you_mean(q)
+            if suggestion:
+                self.corrected_q = suggestion
+                response = super().list(request, *args, **kwargs)
+                response.data['did_you_mean'] = suggestion
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # ETag = versión del catálogo + URL (+ usuario si es "mis productos"):
+        # si el cliente ya lo tiene, 304 sin consultar ni serializar nada.
+        mine = request.query_params.get('mine') in ('1', 'true') and request.user.is_authenticated
+        etag = quote_etag(listing_etag(request.build_absolute_uri(), request.user.pk if mine else ''))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = self._cached_list(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = _pk_or_404(kwargs.get('pk'))
+        stamp = Product.objects.filter(pk=pk, activo=True).values_list('actualizado_en', flat=True).first()
+        if stamp is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 de siempre
+        etag = quote_etag(product_etag(pk, stamp))
+        last_modified = int(stamp.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def _cached_list(self, request, *args, **kwargs):
+        # El listado público es igual para todos los anónimos con la misma query:
+        # se cachea por filtros normalizados + versión del catálogo.
+        params = request.query_params
+        if request.user.is_authenticated or params.get('mine') in ('1', 'true'):
+            return self._list_with_fallback(request, *args, **kwargs)
+
+        filters_ = parse_filters(params)
+        # el resto de la query entra tal cual: ?search= y ?ordering= de DRF,
+        # page, cursor, format... (en orden estable para que no importe el orden)
+        rest = sorted(
+            (k, v.strip()) for k, values in params.lists() if k not in filters_ and k != 'page' for v in values
+        )
+        key = listing_cache_key(
+            "api",
+            filters_,
+            page=params.get('page') or '1',
+            rest=urlencode(rest),
+            host=request.build_absolute_uri('/'),
+        )
+        data = cache.get(key)
+        if data is None:
+            response = self._list_with_fallback(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, listing_timeout())
+            return response
+        return Response(data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='buckets', description=f'Cantidad de rangos del histograma (máx. {MAX_BUCKETS})', required=False, type=OpenApiTypes.INT),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def facets(self, request):
+        """Conteos con/sin stock, histograma y rango de precios para la búsqueda actual."""
+        f = parse_filters(request.query_params)
+        try:
+            buckets = int(request.query_params.get('buckets') or DEFAULT_BUCKETS)
+        except ValueError:
+            buckets = DEFAULT_BUCKETS
+        buckets = max(1, min(buckets, MAX_BUCKETS))
+
+        key = listing_cache_key("facets", f, buckets=buckets)
+        data = cache.get(key)
+        if data is None:
+            data = catalog_facets(Product.objects.filter(activo=True), f, buckets)
+            cache.set(key, data, listing_timeout())
+        return Response(data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='limit', description=f'Cantidad de sugerencias (máx. {product_autocomplete.MAX_LIMIT})', required=False, type=OpenApiTypes.INT),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def autocomplete(self, request):
+        """Sugerencias por prefijo del nombre; se resuelve en memoria, sin consultar la base."""
+        try:
+            limit = int(request.query_params.get('limit') or product_autocomplete.DEFAULT_LIMIT)
+        except ValueError:
+            limit = product_autocomplete.DEFAULT_LIMIT
+        limit = max(1, min(limit, product_autocomplete.MAX_LIMIT))
+        return Response(product_autocomplete.suggest(request.query_params.get('q') or '', limit))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='ids', description=f'IDs separados por coma (máx. {BATCH_MAX_IDS}); por POST también como lista JSON', required=True, type=OpenApiTypes.STR),
+            OpenApiParameter(name='fields', description='Campos a devolver separados por coma (imagen_url sólo si se pide)', required=False, type=OpenApiTypes.STR),
+        ],
+        request=OpenApiTypes.OBJECT,
+        responses={200: OpenApiTypes.OBJECT, 400: dict},
+    )
+    @action(detail=False, methods=['get', 'post'], pagination_class=None, permission_classes=[permissions.AllowAny])
+    def batch(self, request):
+        """Varios productos por ID en una sola consulta, en el orden pedido, informando los que faltan."""
+        data = request.data if request.method == 'POST' else request.query_params
+        try:
+            ids = list(dict.fromkeys(_parse_pk(x) for x in _split_param(data.get('ids'))))
+        except ValueError:
+            return Response({'detail': 'ids debe ser una lista de enteros.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'detail': 'Falta ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > BATCH_MAX_IDS:
+            return Response({'detail': f'Máximo {BATCH_MAX_IDS} ids por pedido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = _split_param(data.get('fields')) or None
+        if fields:
+            unknown = set(fields) - set(ProductSerializer.Meta.fields)
+            if unknown:
+                return Response({'detail': f"Campos desconocidos: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = ProductReadSerializer.rows(Product.objects.filter(activo=True, id__in=ids).order_by('id'), fields)
+        found = {row['id']: row for row in rows}
+        ordered = [found[i] for i in ids if i in found]
+        ser = ProductReadSerializer(ordered, many=True, fields=fields, context=self.get_serializer_context())
+        return Response({'results': ser.data, 'missing': [i for i in ids if i not in found]})
+
+    @extend_schema(
+        request=OpenApiTypes.OBJECT,
+        responses={200: OpenApiTypes.OBJECT, 400: dict, 403: dict},
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-update', pagination_class=None,
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_update(self, request):
+        """
+        Cambios masivos de precio/stock/activo: ``{"items": [{"id": 1, "precio_pct": 8.5}, ...]}``
+        (o la lista directa). Todo o nada, sólo sobre productos propios.
+        """
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        try:
+            patches = bulk_edit.clean_patches(items)
+            changed = bulk_edit.apply_patches(patches, request.user)
+        except DjangoValidationError as e:
+            errors = e.message_dict if hasattr(e, 'error_dict') else {'detail': e.messages}
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        except bulk_edit.NotAllowed as e:
+            code = status.HTTP_403_FORBIDDEN if e.forbidden else status.HTTP_400_BAD_REQUEST
+            return Response({'detail': 'Hay productos inexistentes o ajenos; no se modificó nada.',
+                             'missing': e.missing, 'forbidden': e.forbidden}, status=code)
+        decimal = ProductReadSerializer._decimal.to_representation
+        return Response({
+            'updated': len(changed),
+            'results': [{'id': p.pk, 'precio': decimal(p.precio), 'stock': p.stock, 'activo': p.activo} for p in changed],
+        })
+
+    @extend_schema(responses={200: ProductSerializer(many=True)})
+    @action(detail=True, methods=['get'], pagination_class=None, permission_classes=[permissions.AllowAny])
+    def related(self, request, pk=None):
+        """Relacionados precalculados (build_related_products), en orden; una consulta indexada."""
+        rows = ProductReadSerializer.rows(related_products(_pk_or_404(pk), RELATED_TOP_K))
+        return Response(ProductReadSerializer(rows, many=True, context=self.get_serializer_context()).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='format', description='csv | ndjson (también por Accept)', required=False, type=OpenApiTypes.STR),
+        ],
+        responses={(200, 'text/csv'): OpenApiTypes.STR, (200, 'application/x-ndjson'): OpenApiTypes.STR},
+    )
+    @action(detail=False, methods=['get'], pagination_class=None,
+            permission_classes=[permissions.IsAuthenticated], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Todo el resultado de los filtros del listado, en streaming (memoria constante)."""
+        fmt = request.accepted_renderer.format
+        stream = product_export.STREAMS[fmt](self.get_queryset())
+        response = StreamingHttpResponse(stream, content_type=product_export.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="productos.{fmt}"'
+        return response
@@ -0,0 +1,225 @@
+# products/autocomplete.py
+"""
+Autocompletado de nombres de producto sin tocar la base en cada tecla.
+
+Cada worker tiene en memoria un arreglo ordenado de claves (nombre sin acentos
+y en minúsculas, más cada sufijo que empieza en una palabra: "zapatilla urban
+negra", "urban negra", "negra") y busca el prefijo con ``bisect``.
+
+Entre workers de gunicorn se comparte por el cache:
+
+- una *base*: snapshot comprimido del arreglo hasta el delta ``base_seq``;
+- un *log de deltas*: cada cambio de un producto toma un número con ``incr``
+  y guarda su estado final (``(pid, nombre)``, o ``nombre=None`` si salió).
+  Publicar un cambio es O(1), no reescribir el catálogo entero, y dos workers
+  que guardan a la vez no se pisan: cada uno escribe su propio delta.
+
+En cada consulta el worker compara el último número (una lectura chica) con el
+suyo y aplica sólo los deltas que le faltan. Como cada delta es el estado final
+del producto, reaplicarlo es inofensivo. Cada ``COMPACT_EVERY`` deltas un
+worker (con un lock ``cache.add``) publica una base nueva y borra los viejos.
+Si falta un delta (desalojado del cache) se recarga la base o, en el peor
+caso, se reconstruye desde la base de datos.
+"""
+import json
+import re
+import time
+import zlib
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .search import fold
+
+BASE_KEY = "catalog:autocomplete:base"
+SEQ_KEY = "catalog:autocomplete:seq"
+LOCK_KEY = "catalog:autocomplete:compacting"
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+COMPACT_EVERY = 500
+# un delta que falta puede ser uno recién numerado que todavía no se escribió
+GAP_GRACE = 5.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# copia local del worker
+_local = {"seq": None, "base_seq": None, "keys": [], "ids": [], "names": {}, "gap": None}
+
+
+def _delta_key(n: int) -> str:
+    return f"catalog:autocomplete:delta:{n}"
+
+
+def _words(text: str) -> list:
+    return _WORD_RE.findall(fold(text))
+
+
+def _entries(pid: int, nombre: str):
+    words = _words(nombre)
+    return [(" ".join(words[i:]), pid) for i in range(len(words))]
+
+
+def _dump(keys, ids, names) -> bytes:
+    raw = json.dumps({"k": keys, "i": ids, "n": names}, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(raw.encode("utf-8"))
+
+
+def _load(blob: bytes):
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return data["k"], data["i"], {int(k): v for k, v in data["n"].items()}
+
+
+def _seq() -> int:
+    seq = cache.get(SEQ_KEY)
+    if seq is None:
+        # arranca en un valor basado en el reloj (como la versión del catálogo): si
+        # el cache se vacía, un worker no confunde los números nuevos con los suyos
+        cache.add(SEQ_KEY, time.time_ns() // 1000, None)
+        seq = cache.get(SEQ_KEY)
+    return seq
+
+
+def _publish_base(seq: int) -> None:
+    cache.set(BASE_KEY, (seq, _dump(_local["keys"], _local["ids"], _local["names"])), None)
+    _local["base_seq"] = seq
+
+
+def rebuild() -> int:
+    """Arma la base completa desde la base de datos (arranque en frío, cache vaciado, importes)."""
+    from .models import Product
+
+    # el número se toma antes de leer: los deltas que lleguen mientras tanto se reaplican
+    seq = _seq()
+    pairs, names = [], {}
+    for pid, nombre in Product.objects.filter(activo=True).values_list("id", "nombre").iterator(chunk_size=2000):
+        pairs.extend(_entries(pid, nombre))
+        names[pid] = nombre
+    pairs.sort()
+    _local.update(seq=seq, keys=[k for k, _ in pairs], ids=[i for _, i in pairs], names=names, gap=None)
+    _publish_base(seq)
+    return len(names)
+
+
+def _apply(pid: int, nombre) -> None:
+    """Aplica un delta a la copia local: saca las claves viejas de ``pid`` e inserta las nuevas."""
+    keys, ids, names = _local["keys"], _local["ids"], _local["names"]
+    old = names.pop(pid, None)
+    if old is not None:
+        for key, _ in _entries(pid, old):
+            i = bisect_left(keys, key)
+            while i < len(keys) and keys[i] == key:
+                if ids[i] == pid:
+                    del keys[i], ids[i]
+                    break
+                i += 1
+    if nombre is not None:
+        for key, _ in _entries(pid, nombre):
+            i = bisect_left(keys, key)
+            # mismo orden que sorted() sobre (clave, id)
+            while i < len(keys) and keys[i] == key and ids[i] < pid:
+                i += 1
+            keys.insert(i, key)
+            ids.insert(i, pid)
+        names[pid] = nombre
+
+
+def _catch_up(seq: int) -> bool:
+    """Aplica los deltas que faltan hasta ``seq``; False si alguno no está en el cache."""
+    start = _local["seq"] + 1
+    wanted = [_delta_key(n) for n in range(start, seq + 1)]
+    found = cache.get_many(wanted)
+    for n, key in enumerate(wanted, start):
+        if key not in found:
+            return False
+        _apply(*found[key])
+        _local["seq"] = n
+    return True
+
+
+def _load_base() -> None:
+    snap = cache.get(BASE_KEY)
+    if snap is None:
+        rebuild()
+        return
+    seq, blob = snap
+    keys, ids, names = _load(blob)
+    _local.update(seq=seq, base_seq=seq, keys=keys, ids=ids, names=names)
+
+
+def _compact() -> None:
+    """Publica la copia local como base nueva y borra los deltas que ya cubre (uno por vez)."""
+    if not cache.add(LOCK_KEY, 1, 60):
+        return
+    try:
+        old_base = _local["base_seq"] or 0
+        _publish_base(_local["seq"])
+        cache.delete_many([_delta_key(n) for n in range(old_base + 1, _local["seq"] + 1)])
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _current():
+    seq = cache.get(SEQ_KEY)
+    if seq is None:
+        # cache vaciado: no hay forma de saber qué cambió
+        rebuild()
+        return _local
+    if seq == _local["seq"]:
+        return _local
+    if _local["seq"] is None or not 0 < seq - _local["seq"] <= 2 * COMPACT_EVERY:
+        # recién arrancado, cache vaciado o muy atrasado: más barato leer la base
+        _load_base()
+    if not _catch_up(seq):
+        # un delta que falta: primero la base publicada (otro worker pudo haberla
+        # compactado y borrado ese delta), después la base de datos
+        _load_base()
+        if not _catch_up(seq):
+            missing = _local["seq"] + 1
+            gap = _local["gap"]
+            if gap is None or gap[0] != missing:
+                _local["gap"] = (missing, time.monotonic())
+            elif time.monotonic() - gap[1] > GAP_GRACE:
+                rebuild()
+            return _local
+    _local["gap"] = None
+    if _local["seq"] - (_local["base_seq"] or 0) >= COMPACT_EVERY:
+        _compact()
+    return _local
+
+
+def _forget_local() -> None:
+    """Como un worker recién arrancado (tests)."""
+    _local.update(seq=None, base_seq=None, keys=[], ids=[], names={}, gap=None)
+
+
+def update_product(pid: int, nombre: str, activo: bool = True) -> None:
+    """Publica el estado final de ``pid`` como delta (``activo=False`` lo saca)."""
+    _seq()  # que exista el contador
+    try:
+        n = cache.incr(SEQ_KEY)
+    except ValueError:
+        # desalojado entre medio: el próximo lector reconstruye desde la base de datos
+        return
+    cache.set(_delta_key(n), (pid, nombre if activo else None), None)
+
+
+def remove_product(pid: int) -> None:
+    update_product(pid, "", activo=False)
+
+
+def suggest(prefix: str, limit: int = DEFAULT_LIMIT) -> list:
+    """Top-``limit`` productos cuyo nombre (o alguna palabra) empieza con ``prefix``."""
+    p = " ".join(_words(prefix))
+    if not p:
+        return []
+    idx = _current()
+    keys, ids, names = idx["keys"], idx["ids"], idx["names"]
+    out, seen = [], set()
+    i = bisect_left(keys, p)
+    while i < len(keys) and keys[i].startswith(p) and len(out) < limit:
+        pid = ids[i]
+        if pid not in seen:
+            seen.add(pid)
+            out.append({"id": pid, "nombre": names[pid]})
+        i += 1
+    return out
@@ -0,0 +1,153 @@
+# products/bulk_edit.py
+"""
+Edición masiva de precio/stock/activo (``POST /api/products/bulk-update/``).
+
+Cada patch es ``{"id", "precio" | "precio_pct", "stock", "activo"}`` (todos
+opcionales salvo ``id``); ``precio_pct`` ajusta el precio actual en ese
+porcentaje (``10`` = +10 %, ``-5`` = -5 %), redondeado a centavos.
+
+Es todo o nada: se valida el lote entero, se verifica que todos los productos
+existan y sean del usuario con una sola consulta, y se escribe en una
+transacción con ``bulk_update`` por lotes. Las consultas dependen de la
+cantidad de lotes, no de filas. Lo que las señales harían por producto
+(cards, versión del catálogo, autocompletado, resumen del vendedor) se hace
+una vez para todo el pedido.
+"""
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import autocomplete, cards, dashboard
+from .cache import bump_catalog_version
+from .models import Product
+
+MAX_ITEMS = 5000
+BATCH_SIZE = 500
+EDITABLE = ("precio", "stock", "activo")
+CENT = Decimal("0.01")
+
+
+class NotAllowed(Exception):
+    """Ids inexistentes o de otro vendedor: no se toca nada."""
+
+    def __init__(self, missing, forbidden):
+        self.missing = sorted(missing)
+        self.forbidden = sorted(forbidden)
+        super().__init__(f"ids inexistentes: {self.missing}; sin permiso: {self.forbidden}")
+
+
+def _clean_item(raw) -> dict:
+    if not isinstance(raw, dict):
+        raise ValidationError("Se esperaba un objeto.")
+    unknown = set(raw) - {"id", "precio_pct", *EDITABLE}
+    if unknown:
+        raise ValidationError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    try:
+        patch = {"id": int(raw["id"])}
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError("id debe ser un entero.")
+
+    if "precio" in raw and "precio_pct" in raw:
+        raise ValidationError("Usá precio o precio_pct, no los dos.")
+    if "precio" in raw:
+        precio = Product._meta.get_field("precio").clean(raw["precio"], None)
+        if precio < 0:
+            raise ValidationError("precio no puede ser negativo.")
+        patch["precio"] = precio
+    if "precio_pct" in raw:
+        try:
+            pct = Decimal(str(raw["precio_pct"]))
+        except InvalidOperation:
+            raise ValidationError("precio_pct debe ser un número.")
+        if not pct.is_finite() or pct <= -100:
+            raise ValidationError("precio_pct debe ser mayor a -100.")
+        patch["precio_pct"] = pct
+    if "stock" in raw:
+        stock = Product._meta.get_field("stock").clean(raw["stock"], None)
+        if stock < 0:
+            raise ValidationError("stock no puede ser negativo.")
+        patch["stock"] = stock
+    if "activo" in raw:
+        if not isinstance(raw["activo"], bool):
+            raise ValidationError("activo debe ser true o false.")
+        patch["activo"] = raw["activo"]
+    if len(patch) == 1:
+        raise ValidationError("Nada que cambiar (precio, precio_pct, stock o activo).")
+    return patch
+
+
+def clean_patches(items) -> list:
+    """Valida el lote; ``ValidationError`` con ``{índice: errores}`` si algo no cierra."""
+    if not isinstance(items, list) or not items:
+        raise ValidationError("Se esperaba una lista de cambios.")
+    if len(items) > MAX_ITEMS:
+        raise ValidationError(f"Máximo {MAX_ITEMS} cambios por pedido.")
+    patches, errors, seen = [], {}, set()
+    for i, raw in enumerate(items):
+        try:
+            patch = _clean_item(raw)
+        except ValidationError as e:
+            errors[str(i)] = e.messages
+            continue
+        if patch["id"] in seen:
+            errors[str(i)] = [f"id {patch['id']} repetido."]
+            continue
+        seen.add(patch["id"])
+        patches.append(patch)
+    if errors:
+        raise ValidationError(errors)
+    return patches
+
+
+def _new_price(precio: Decimal, pct: Decimal) -> Decimal:
+    precio = (precio * (100 + pct) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+    # que no se pase de max_digits (un +900 % sobre un precio ya alto)
+    return Product._meta.get_field("precio").clean(precio, None)
+
+
+def apply_patches(patches, user, batch_size: int = None, using: str = "default") -> list:
+    """
+    Aplica ``patches`` (salida de ``clean_patches``) como ``user``; el staff puede
+    editar cualquier producto. Devuelve los productos modificados.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    ids = [p["id"] for p in patches]
+    staff = bool(user.is_staff or user.is_superuser)
+    with transaction.atomic(using=using):
+        # una consulta: existencia, dueño y valores actuales (para precio_pct)
+        current = {
+            p.pk: p
+            for p in Product.objects.using(using).filter(id__in=ids).only("id", "user_id", *EDITABLE)
+        }
+        missing = set(ids) - set(current)
+        forbidden = {pk for pk, p in current.items() if not staff and p.user_id != user.pk}
+        if missing or forbidden:
+            raise NotAllowed(missing, forbidden)
+
+        now = timezone.now()
+        changed, fields, toggled = [], {"actualizado_en"}, False
+        try:
+            for patch in patches:
+                product = current[patch["id"]]
+                if "precio_pct" in patch:
+                    patch = {**patch, "precio": _new_price(product.precio, patch["precio_pct"])}
+                for name in EDITABLE:
+                    if name in patch:
+                        toggled |= name == "activo" and patch[name] != product.activo
+                        setattr(product, name, patch[name])
+                        fields.add(name)
+                product.actualizado_en = now
+                changed.append(product)
+        except ValidationError as e:
+            raise ValidationError({str(patch["id"]): e.messages})
+
+        Product.objects.using(using).bulk_update(changed, sorted(fields), batch_size=batch_size)
+        cards.refresh(ids, using=using, chunk_size=batch_size)
+        owners = {p.user_id for p in changed}
+        transaction.on_commit(bump_catalog_version, using=using)
+        transaction.on_commit(lambda: dashboard.forget(owners), using=using)
+        if toggled:
+            transaction.on_commit(autocomplete.rebuild, using=using)
+    return changed
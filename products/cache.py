@@ -0,0 +1,64 @@
+# products/cache.py
+"""
+Cache de respuestas del catálogo público.
+
+Las claves (y los ETag) incluyen un "catalog version" que se incrementa ante cualquier cambio
+de Product (señales post_save/post_delete, o a mano tras operaciones masivas con
+``bump_catalog_version()``): en vez de borrar claves, las viejas quedan huérfanas
+y expiran solas por TTL.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = "catalog:version"
+
+
+def listing_timeout() -> int:
+    return int(getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+
+
+def get_catalog_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # arranca en un valor basado en el reloj: si la clave se desaloja no se
+        # reutiliza un número viejo (y con él respuestas de otro estado del catálogo)
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> int:
+    get_catalog_version()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        # desalojada entre el get y el incr
+        return get_catalog_version()
+
+
+def listing_cache_key(kind: str, filters: dict, **extra) -> str:
+    """
+    Clave para un listado: ``kind`` distingue HTML/API y ``filters`` es la salida
+    de ``parse_filters`` (ya normalizada); ``extra`` agrega page, cursor, etc.
+    """
+    payload = {k: (str(v) if v is not None else "") for k, v in {**filters, **extra}.items()}
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return f"catalog:{get_catalog_version()}:{kind}:{digest}"
+
+
+def _etag(*parts) -> str:
+    return hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def product_etag(pk, actualizado_en, *extra) -> str:
+    """ETag fuerte de un producto: su última modificación + versión del catálogo."""
+    return _etag("product", pk, actualizado_en.timestamp(), get_catalog_version(), *extra)
+
+
+def listing_etag(*parts) -> str:
+    """ETag fuerte de un listado: la versión del catálogo cubre cualquier cambio."""
+    return _etag("listing", get_catalog_version(), *parts)
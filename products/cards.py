@@ -0,0 +1,96 @@
+# products/cards.py
+"""
+Modelo de lectura del listado (``ProductCard``).
+
+El listado HTML y el de la API filtran, ordenan y paginan sobre esta tabla
+angosta en vez de sobre Product: sin ``descripcion`` (un TextField que en SQLite
+viaja dentro de la fila y hay que leer aunque no se use) ni columnas que la card
+no muestra, así cada página de índice trae más filas y se leen menos bytes.
+
+Sólo tiene los productos activos. Se mantiene con ``refresh(ids)``, que relee
+esos productos y hace upsert/borrado de sus cards:
+
+- señales post_save/post_delete de Product (products/signals.py);
+- el importador (``bulk_create`` no dispara señales);
+- los ``update()`` masivos: reservas de stock, derivados de imágenes.
+
+``rebuild()`` (comando ``rebuild_product_cards``) la regenera completa.
+"""
+from django.db import transaction
+
+from .models import Product, ProductCard
+
+# columnas copiadas de Product (además de id)
+CARD_FIELDS = [
+    "user", "nombre", "precio", "stock", "imagen", "image_url",
+    "imagen_hash", "imagen_ancho", "creado_en", "actualizado_en",
+]
+
+
+def card_values(row) -> dict:
+    """Fila ``values_list("id", *CARD_FIELDS)`` -> kwargs de ProductCard (sin id)."""
+    values = dict(zip(CARD_FIELDS, row[1:]))
+    values["user_id"] = values.pop("user")
+    return values
+
+
+def _cards(rows) -> list:
+    return [ProductCard(id=row[0], **card_values(row)) for row in rows]
+
+
+def refresh(ids, using: str = "default", chunk_size: int = 500) -> int:
+    """Sincroniza las cards de ``ids`` con Product (upsert de activos, borrado del resto)."""
+    ids = sorted(set(ids))
+    written = 0
+    with transaction.atomic(using=using):
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = Product.objects.using(using).filter(id__in=chunk, activo=True).values_list("id", *CARD_FIELDS)
+            cards = _cards(rows)
+            gone = set(chunk) - {c.id for c in cards}
+            if gone:
+                ProductCard.objects.using(using).filter(id__in=gone).delete()
+            if cards:
+                ProductCard.objects.using(using).bulk_create(
+                    cards, update_conflicts=True, unique_fields=["id"], update_fields=CARD_FIELDS
+                )
+            written += len(cards)
+    return written
+
+
+def remove(ids, using: str = "default") -> None:
+    ProductCard.objects.using(using).filter(id__in=list(ids)).delete()
+
+
+def rebuild(using: str = "default", chunk_size: int = 2000) -> int:
+    """Regenera la tabla completa desde Product."""
+    rows = Product.objects.using(using).filter(activo=True).order_by("id").values_list("id", *CARD_FIELDS)
+    written = 0
+    with transaction.atomic(using=using):
+        ProductCard.objects.using(using).all().delete()
+        batch = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                written += len(ProductCard.objects.using(using).bulk_create(_cards(batch)))
+                batch = []
+        written += len(ProductCard.objects.using(using).bulk_create(_cards(batch)))
+    return written
+
+
+def complete_rows(rows, using: str = "default") -> list:
+    """
+    Filas de ``values()`` de ProductCard -> filas con las columnas del listado de
+    la API que la card no guarda (``ProductCard.MISSING_COLUMNS``). Una sola
+    consulta por página, por clave primaria.
+    """
+    rows = list(rows)
+    if not rows:
+        return rows
+    descripciones = dict(
+        Product.objects.using(using).filter(id__in=[r["id"] for r in rows]).values_list("id", "descripcion")
+    )
+    for row in rows:
+        row["descripcion"] = descripciones.get(row["id"], "")
+        row["activo"] = True
+    return rows
@@ -0,0 +1,168 @@
+# products/dashboard.py
+"""
+Panel del vendedor (/products/manage/ y /products/manage/mine/).
+
+- ``annotate(qs)``: comentarios y posts del foro por producto y alerta de stock,
+  todo en la misma consulta de la página (subconsultas ``COUNT`` correlacionadas,
+  sin JOINs que multipliquen filas ni una consulta por card).
+- ``seller_summary(user_id)``: totales del vendedor (valor del stock, productos
+  con stock bajo/agotados, comentarios). Vive en el cache, un contador por
+  métrica, y se ajusta con ``incr`` a medida que cambian sus productos o
+  comentarios (señales en products/signals.py). Si falta alguna métrica (o
+  algo la invalidó con ``forget``) se recalcula entera con dos agregados.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from foro.models import Comentario, Post
+
+from .models import Product
+
+# alerta de stock (anotación "stock_alerta")
+OUT_OF_STOCK = "agotado"
+LOW_STOCK = "bajo"
+
+METRICS = ("productos", "stock_value_cents", "low_stock", "out_of_stock", "comentarios")
+SUMMARY_TIMEOUT = 60 * 60  # acota la deriva si algún camino masivo no avisa
+
+
+def low_stock_threshold() -> int:
+    return int(getattr(settings, "LOW_STOCK_THRESHOLD", 3))
+
+
+def _count_by_product(model):
+    rows = model.objects.filter(producto=OuterRef("pk")).order_by().values("producto").annotate(n=Count("id")).values("n")
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def annotate(qs):
+    """Agrega ``comentarios_count``, ``posts_count`` y ``stock_alerta`` ("agotado", "bajo" o "")."""
+    return qs.annotate(
+        comentarios_count=_count_by_product(Comentario),
+        posts_count=_count_by_product(Post),
+        stock_alerta=Case(
+            When(stock__lte=0, then=Value(OUT_OF_STOCK)),
+            When(stock__lte=low_stock_threshold(), then=Value(LOW_STOCK)),
+            default=Value(""),
+        ),
+    )
+
+
+# --- resumen por vendedor ---
+
+def _key(user_id, metric: str) -> str:
+    return f"seller:{user_id}:{metric}"
+
+
+def _compute(user_id) -> dict:
+    threshold = low_stock_threshold()
+    agg = Product.objects.filter(user_id=user_id, activo=True).aggregate(
+        productos=Count("id"),
+        stock_value=Sum(F("stock") * F("precio"), filter=Q(stock__gt=0)),
+        low_stock=Count("id", filter=Q(stock__gt=0, stock__lte=threshold)),
+        out_of_stock=Count("id", filter=Q(stock__lte=0)),
+    )
+    return {
+        "productos": agg["productos"],
+        "stock_value_cents": int(round(Decimal(agg["stock_value"] or 0) * 100)),
+        "low_stock": agg["low_stock"],
+        "out_of_stock": agg["out_of_stock"],
+        "comentarios": Comentario.objects.filter(producto__user_id=user_id).count(),
+    }
+
+
+def seller_summary(user_id) -> dict:
+    """Totales del vendedor (``stock_value`` en pesos, como Decimal)."""
+    keys = {m: _key(user_id, m) for m in METRICS}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        data = {m: cached[k] for m, k in keys.items()}
+    else:
+        data = _compute(user_id)
+        # add: si un incr llegó mientras calculábamos, no se pisa
+        for m, k in keys.items():
+            cache.add(k, data[m], SUMMARY_TIMEOUT)
+    return {**data, "stock_value": Decimal(data["stock_value_cents"]) / 100}
+
+
+SNAPSHOT_FIELDS = ("user_id", "activo", "stock", "precio")
+
+
+def snapshot(p):
+    """
+    Lo que hace falta de ``p`` para calcular su aporte, o ``None`` si algún campo
+    vino diferido (se lee ``__dict__`` para no disparar consultas).
+    """
+    values = p.__dict__
+    if any(f not in values for f in SNAPSHOT_FIELDS):
+        return None
+    return tuple(values[f] for f in SNAPSHOT_FIELDS)
+
+
+def contribution(snap) -> tuple:
+    """
+    Aporte de un producto (``snapshot``) a las métricas de su dueño:
+    ``(user_id, {métrica: valor})``, o ``None`` si no se conoce.
+    """
+    if snap is None:
+        return None
+    user_id, activo, stock, precio = snap
+    if not activo:
+        return user_id, {}
+    stock, precio = stock or 0, Decimal(precio or 0)
+    threshold = low_stock_threshold()
+    return user_id, {
+        "productos": 1,
+        "stock_value_cents": int(round(stock * precio * 100)) if stock > 0 else 0,
+        "low_stock": int(0 < stock <= threshold),
+        "out_of_stock": int(stock <= 0),
+    }
+
+
+def _apply(user_id, deltas: dict) -> None:
+    for metric, delta in deltas.items():
+        if not delta:
+            continue
+        try:
+            cache.incr(_key(user_id, metric), delta)
+        except ValueError:
+            # no estaba en cache: se calcula entero en la próxima lectura
+            forget([user_id])
+            return
+
+
+def apply_change(old, new, using: str = "default") -> None:
+    """Ajusta los resúmenes al confirmarse la transacción (``old``/``new`` de ``contribution``)."""
+    if old is None or new is None:
+        users = {c[0] for c in (old, new) if c is not None}
+        transaction.on_commit(lambda: forget(users), using=using)
+        return
+    if old[0] == new[0]:
+        deltas = {m: new[1].get(m, 0) - old[1].get(m, 0) for m in METRICS}
+        changes = [(new[0], deltas)]
+    else:
+        changes = [(old[0], {m: -v for m, v in old[1].items()}), (new[0], new[1])]
+    changes = [(uid, d) for uid, d in changes if uid is not None and any(d.values())]
+    if changes:
+        transaction.on_commit(lambda: [_apply(uid, d) for uid, d in changes], using=using)
+
+
+def comment_changed(product_id, delta: int, using: str = "default") -> None:
+    owner = Product.objects.using(using).filter(pk=product_id).values_list("user_id", flat=True).first()
+    if owner is not None:
+        transaction.on_commit(lambda: _apply(owner, {"comentarios": delta}), using=using)
+
+
+def forget(user_ids) -> None:
+    cache.delete_many([_key(uid, m) for uid in user_ids if uid is not None for m in METRICS])
+
+
+def forget_products(product_ids, using: str = "default") -> None:
+    """Para los ``update()``/``bulk_create`` sin señales: invalida a los dueños de esos productos."""
+    owners = set(Product.objects.using(using).filter(pk__in=list(product_ids)).values_list("user_id", flat=True))
+    transaction.on_commit(lambda: forget(owners), using=using)
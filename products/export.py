@@ -0,0 +1,80 @@
+# products/export.py
+"""
+Exportación del catálogo en CSV o NDJSON, pensada para respuestas en streaming.
+
+Se lee con ``values_list(...).iterator(chunk_size)`` (sin instanciar modelos ni
+cachear el queryset) y se emite un bloque de texto por cada ``chunk_size`` filas:
+memoria constante y el primer byte sale apenas llega el primer lote.
+
+Las columnas son las que entiende ``import_products`` (más dueño y fechas, que
+el importador ignora), así un export se puede volver a importar tal cual.
+"""
+import csv
+import io
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# (columna de salida, columna de values_list)
+COLUMNS = (
+    ("id", "id"),
+    ("nombre", "nombre"),
+    ("precio", "precio"),
+    ("descripcion", "descripcion"),
+    ("stock", "stock"),
+    ("image_url", "image_url"),
+    ("activo", "activo"),
+    ("user", "user__username"),
+    ("creado_en", "creado_en"),
+    ("actualizado_en", "actualizado_en"),
+)
+HEADER = [name for name, _ in COLUMNS]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def _rows(qs, chunk_size: int):
+    return qs.values_list(*(col for _, col in COLUMNS)).iterator(chunk_size=chunk_size)
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(qs, chunk_size: int = None):
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(HEADER)
+    for n, row in enumerate(_rows(qs, chunk_size), 1):
+        writer.writerow([_cell(v) for v in row])
+        if n % chunk_size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def stream_ndjson(qs, chunk_size: int = None):
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    lines = []
+    for row in _rows(qs, chunk_size):
+        lines.append(encoder.encode(dict(zip(HEADER, row))))
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+STREAMS = {"csv": stream_csv, "ndjson": stream_ndjson}
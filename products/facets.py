@@ -0,0 +1,78 @@
+# products/facets.py
+"""
+Facetas del catálogo: conteos con/sin stock, histograma de precios y rango
+de precios para la búsqueda actual, resueltos en UNA consulta agregada.
+
+Cada faceta ignora su propio filtro (los conteos de stock respetan el rango de
+precio pero no in_stock, y el histograma al revés), así la UI puede mostrar
+cuántos resultados daría cada opción antes de elegirla.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+
+from .cache import get_catalog_version
+from .filters import price_q, stock_q
+from .search import search_queryset
+
+DEFAULT_BUCKETS = 10
+MAX_BUCKETS = 50
+_CENT = Decimal("0.01")
+
+
+def catalog_price_bounds(qs):
+    """Rango de precios de todo el catálogo activo, cacheado por versión."""
+    key = f"catalog:{get_catalog_version()}:price_bounds"
+    bounds = cache.get(key)
+    if bounds is None:
+        agg = qs.aggregate(lo=Min("precio"), hi=Max("precio"))
+        bounds = (agg["lo"], agg["hi"])
+        cache.set(key, bounds, None)
+    return bounds
+
+
+def _edges(lo, hi, buckets: int):
+    if lo is None or hi is None:
+        return []
+    if hi <= lo:
+        return [lo, hi]
+    width = ((hi - lo) / buckets).quantize(_CENT)
+    edges = [lo + width * i for i in range(buckets)]
+    return edges + [hi]
+
+
+def catalog_facets(qs, f: dict, buckets: int = DEFAULT_BUCKETS) -> dict:
+    """
+    ``qs`` = productos activos (sin filtros), ``f`` = salida de ``parse_filters``.
+    Los bordes del histograma salen del rango de todo el catálogo (estables entre
+    búsquedas); los conteos, de una sola consulta con agregados condicionales.
+    """
+    edges = _edges(*catalog_price_bounds(qs), buckets)
+    if f["q"]:
+        qs = search_queryset(qs, f["q"])
+
+    by_price, by_stock = price_q(f), stock_q(f)
+    aggregates = {
+        "count": Count("id", filter=by_price & by_stock),
+        "in_stock": Count("id", filter=by_price & Q(stock__gt=0)),
+        "out_of_stock": Count("id", filter=by_price & Q(stock__lte=0)),
+        "min_price": Min("precio", filter=by_stock),
+        "max_price": Max("precio", filter=by_stock),
+    }
+    last = len(edges) - 2
+    for i in range(len(edges) - 1):
+        # el último bucket incluye el borde superior
+        upper = Q(precio__lte=edges[i + 1]) if i == last else Q(precio__lt=edges[i + 1])
+        aggregates[f"b{i}"] = Count("id", filter=by_stock & Q(precio__gte=edges[i]) & upper)
+    agg = qs.aggregate(**aggregates)
+
+    return {
+        "count": agg["count"],
+        "stock": {"in_stock": agg["in_stock"], "out_of_stock": agg["out_of_stock"]},
+        "price": {"min": agg["min_price"], "max": agg["max_price"]},
+        "histogram": [
+            {"from": edges[i], "to": edges[i + 1], "count": agg[f"b{i}"]}
+            for i in range(len(edges) - 1)
+        ],
+    }
@@ -0,0 +1,79 @@
+# products/filters.py
+"""
+Parseo y aplicación de los filtros del catálogo (q, min_price, max_price,
+in_stock, order). Lo comparten la API (ProductViewSet) y el listado HTML para
+que ambos generen exactamente la misma consulta (y usen los mismos índices).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .search import normalize_terms, search_queryset
+
+# order -> order_by(...) ; "" = por defecto (más nuevos, o relevancia si hay q).
+# Todos terminan en id para que el orden sea total (paginación por cursor).
+ORDERINGS = {
+    "newest": ("-creado_en", "-id"),
+    "oldest": ("creado_en", "id"),
+    "price_asc": ("precio", "-creado_en", "-id"),
+    "price_desc": ("-precio", "-creado_en", "-id"),
+    "name": ("nombre", "-creado_en", "-id"),
+}
+RELEVANCE_ORDERING = ("search_rank", "-creado_en", "-id")
+DEFAULT_ORDER = "newest"
+
+
+def _parse_price(val):
+    s = str(val or "").strip().replace(",", ".")
+    if not s:
+        return None
+    try:
+        d = Decimal(s)
+    except InvalidOperation:
+        return None
+    return d if d.is_finite() else None
+
+
+def parse_filters(params) -> dict:
+    """Normaliza los parámetros GET; valores inválidos se ignoran."""
+    in_stock = (params.get("in_stock") or "").strip().lower()
+    order = (params.get("order") or "").strip().lower()
+    return {
+        "q": (params.get("q") or "").strip(),
+        "min_price": _parse_price(params.get("min_price")),
+        "max_price": _parse_price(params.get("max_price")),
+        "in_stock": in_stock if in_stock in ("true", "false") else "",
+        "order": order if order in ORDERINGS else "",
+    }
+
+
+def price_q(f: dict) -> Q:
+    cond = Q()
+    if f["min_price"] is not None:
+        cond &= Q(precio__gte=f["min_price"])
+    if f["max_price"] is not None:
+        cond &= Q(precio__lte=f["max_price"])
+    return cond
+
+
+def stock_q(f: dict) -> Q:
+    if f["in_stock"] == "true":
+        return Q(stock__gt=0)
+    if f["in_stock"] == "false":
+        return Q(stock__lte=0)
+    return Q()
+
+
+def filter_products(qs, f: dict):
+    """Aplica los filtros ya normalizados (ver ``parse_filters``) sobre ``qs``."""
+    # "!!", "-", "?": sin términos para el índice es como no buscar
+    q = f["q"] if normalize_terms(f["q"]) else ""
+    if q:
+        # índice full-text; sin 'order' explícito se ordena por relevancia
+        qs = search_queryset(qs, q, rank=not f["order"])
+
+    qs = qs.filter(price_q(f), stock_q(f))
+
+    if q and not f["order"]:
+        return qs.order_by(*RELEVANCE_ORDERING)
+    return qs.order_by(*ORDERINGS[f["order"] or DEFAULT_ORDER])
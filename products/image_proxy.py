@@ -0,0 +1,196 @@
+# products/image_proxy.py
+"""
+Proxy de imágenes remotas (``Product.image_url``), opt-in con ``IMAGE_PROXY_ENABLED``.
+
+La primera vez que se pide la imagen de un producto se descarga, se achica a
+``IMAGE_PROXY_WIDTH`` y se guarda en el storage de media; de ahí en más se sirve
+la copia local con cache largo y ETag, sin depender del host de terceros.
+
+- Sólo se sirven URLs que ya están en la base (por id de producto): no es un
+  proxy abierto. Además se rechazan hosts que resuelven a IPs privadas/locales,
+  salvo que estén en ``IMAGE_PROXY_ALLOWED_HOSTS`` (que, si se define, es la
+  lista blanca completa). Lo mismo vale para cada redirección.
+- Las descargas simultáneas por proceso están acotadas (``IMAGE_PROXY_MAX_FETCHES``)
+  y cada host tiene su timeout (``IMAGE_PROXY_HOST_TIMEOUTS``, default
+  ``IMAGE_PROXY_TIMEOUT``). Si algo falla, la vista redirige a la URL original.
+- El espacio en disco está acotado (``IMAGE_PROXY_MAX_BYTES``): al pasarse se
+  borran las copias menos usadas recientemente (``RemoteImage.last_access``).
+"""
+import hashlib
+import ipaddress
+import socket
+import threading
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import images
+from .models import RemoteImage
+
+PROXY_DIR = "products/remote"
+MAX_REDIRECTS = 3
+# last_access se escribe como mucho una vez cada TOUCH_EVERY por imagen
+TOUCH_EVERY = timedelta(minutes=10)
+
+_fetch_slots = None
+_slots_guard = threading.Lock()
+# una descarga por imagen a la vez (por proceso), sin un dict de locks que crezca
+_stripes = [threading.Lock() for _ in range(64)]
+
+
+class ProxyError(Exception):
+    """No se pudo obtener la copia local; el llamador vuelve a la URL original."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled() -> bool:
+    return bool(_setting("IMAGE_PROXY_ENABLED", False))
+
+
+def normalize(url: str) -> str:
+    """Mismas reglas que los templates: "//host/x" e "host/x" pasan a https."""
+    url = (url or "").strip()
+    if url.startswith("//"):
+        return "https:" + url
+    if not url.startswith(("http://", "https://")):
+        return "https://" + url
+    return url
+
+
+def cache_key(url: str) -> str:
+    return hashlib.sha1(f"{url}|{_setting('IMAGE_PROXY_WIDTH', 640)}".encode()).hexdigest()
+
+
+def _check_host(host: str) -> None:
+    allowed = _setting("IMAGE_PROXY_ALLOWED_HOSTS", [])
+    if allowed:
+        if host not in allowed:
+            raise ProxyError(f"host no permitido: {host}")
+        return
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ProxyError(f"no se pudo resolver {host}: {e}")
+    for info in infos:
+        ip = ipaddress.ip_address(info[4][0])
+        if not ip.is_global:
+            raise ProxyError(f"{host} resuelve a una dirección no pública ({ip})")
+
+
+def _timeout(host: str) -> float:
+    return _setting("IMAGE_PROXY_HOST_TIMEOUTS", {}).get(host, _setting("IMAGE_PROXY_TIMEOUT", 5))
+
+
+def _slots():
+    global _fetch_slots
+    with _slots_guard:
+        if _fetch_slots is None:
+            _fetch_slots = threading.BoundedSemaphore(_setting("IMAGE_PROXY_MAX_FETCHES", 4))
+    return _fetch_slots
+
+
+def _download(url: str) -> bytes:
+    max_bytes = _setting("IMAGE_PROXY_MAX_SOURCE_BYTES", 10 * 1024 * 1024)
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ProxyError(f"URL no soportada: {url}")
+        _check_host(parts.hostname)
+        try:
+            with requests.get(url, stream=True, allow_redirects=False, timeout=_timeout(parts.hostname)) as resp:
+                if resp.is_redirect:
+                    url = urljoin(url, resp.headers["Location"])
+                    continue
+                if resp.status_code != 200:
+                    raise ProxyError(f"{url} respondió {resp.status_code}")
+                data = bytearray()
+                for chunk in resp.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) > max_bytes:
+                        raise ProxyError(f"{url} supera {max_bytes} bytes")
+                return bytes(data)
+        except requests.RequestException as e:
+            raise ProxyError(f"no se pudo descargar {url}: {e}")
+    raise ProxyError(f"demasiadas redirecciones: {url}")
+
+
+def _touch(entry) -> None:
+    now = timezone.now()
+    if now - entry.last_access > TOUCH_EVERY:
+        RemoteImage.objects.filter(pk=entry.pk).update(last_access=now)
+        entry.last_access = now
+
+
+def _evict(keep: str) -> None:
+    """Borra las copias menos usadas hasta volver a entrar en IMAGE_PROXY_MAX_BYTES."""
+    budget = _setting("IMAGE_PROXY_MAX_BYTES", 200 * 1024 * 1024)
+    total = RemoteImage.objects.aggregate(total=Sum("size"))["total"] or 0
+    if total <= budget:
+        return
+    for pk, name, size in RemoteImage.objects.exclude(key=keep).order_by("last_access").values_list("id", "name", "size"):
+        default_storage.delete(name)
+        RemoteImage.objects.filter(pk=pk).delete()
+        total -= size
+        if total <= budget:
+            break
+
+
+def _fetch(url: str, key: str) -> RemoteImage:
+    wait = _setting("IMAGE_PROXY_QUEUE_TIMEOUT", 2)
+    if not _slots().acquire(timeout=wait):
+        raise ProxyError("demasiadas descargas en curso")
+    try:
+        raw = _download(url)
+    finally:
+        _slots().release()
+    try:
+        img = images.resize(images.load(BytesIO(raw)), _setting("IMAGE_PROXY_WIDTH", 640))
+    except Exception as e:  # Pillow tira varios tipos según el formato
+        raise ProxyError(f"{url} no es una imagen válida: {e}")
+    data = images.encode(img, "jpeg")
+
+    name = default_storage.save(f"{PROXY_DIR}/{key[:2]}/{key}.jpg", ContentFile(data))
+    entry, _ = RemoteImage.objects.update_or_create(
+        key=key,
+        defaults={
+            "source_url": url,
+            "name": name,
+            "size": len(data),
+            "etag": hashlib.sha1(data).hexdigest(),
+            "last_access": timezone.now(),
+        },
+    )
+    _evict(keep=key)
+    return entry
+
+
+def get(url: str) -> RemoteImage:
+    """Copia local de ``url`` (descargándola si hace falta). Lanza ``ProxyError``."""
+    url = normalize(url)
+    key = cache_key(url)
+    entry = RemoteImage.objects.filter(key=key).first()
+    if entry is None:
+        with _stripes[int(key[:8], 16) % len(_stripes)]:
+            # otro thread pudo haberla traído mientras esperábamos
+            entry = RemoteImage.objects.filter(key=key).first() or _fetch(url, key)
+    _touch(entry)
+    return entry
+
+
+def open_copy(entry):
+    """Abre el archivo de la copia; si el storage la perdió, se olvida la entrada."""
+    try:
+        return default_storage.open(entry.name, "rb")
+    except (FileNotFoundError, OSError):
+        RemoteImage.objects.filter(pk=entry.pk).delete()
+        raise ProxyError(f"falta el archivo {entry.name}")
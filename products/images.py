@@ -0,0 +1,154 @@
+# products/images.py
+"""
+Derivados de ``Product.imagen``: tamaños para card y detalle, en WebP y JPEG.
+
+Al subir una imagen (señales de Product) se programa ``build_variants`` fuera
+del request, en un pool de threads chico. Los archivos se guardan por hash del
+contenido (``products/derived/ab/abcd.../640.webp``): dos productos con la misma
+foto comparten derivados y regenerar es idempotente.
+
+Mientras el producto no tenga ``imagen_hash`` (todavía no se generaron, o la
+imagen cambió) los templates y la API siguen usando el original.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = "products/derived"
+# anchos por uso (1x y 2x); nunca se agranda el original
+VARIANT_WIDTHS = {
+    "card": (320, 640),
+    "detail": (800, 1600),
+}
+# extensión -> (formato de Pillow, opciones de guardado)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_executor = None
+
+
+def content_hash(fileobj) -> str:
+    digest = hashlib.sha256()
+    for chunk in fileobj.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def variant_name(digest: str, width: int, ext: str) -> str:
+    return f"{DERIVED_DIR}/{digest[:2]}/{digest}/{width}.{ext}"
+
+
+def widths_for(original_width: int, kind: str = None) -> list:
+    """Anchos que existen para un original de ``original_width`` px (todos o los de ``kind``)."""
+    wanted = VARIANT_WIDTHS[kind] if kind else sorted({w for ws in VARIANT_WIDTHS.values() for w in ws})
+    return sorted({min(w, original_width) for w in wanted})
+
+
+def srcset(digest: str, original_width: int, ext: str, url, kind: str = None) -> str:
+    """``"url 320w, url 640w"``; ``url`` convierte un nombre de storage en URL."""
+    return ", ".join(f"{url(variant_name(digest, w, ext))} {w}w" for w in widths_for(original_width, kind))
+
+
+def srcsets(digest: str, original_width: int, url, kind: str = None):
+    """``{"webp": srcset, "jpeg": srcset}`` o ``None`` si los derivados todavía no existen."""
+    if not digest or not original_width:
+        return None
+    return {ext: srcset(digest, original_width, ext, url, kind) for ext in FORMATS}
+
+
+def load(fileobj):
+    """Abre la imagen ya rotada según EXIF y en RGB/RGBA."""
+    img = Image.open(fileobj)
+    img.load()
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or "A" in img.getbands() else "RGB")
+    return img
+
+
+def resize(img, width: int):
+    if width >= img.width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.LANCZOS)
+
+
+def encode(img, ext: str) -> bytes:
+    fmt, options = FORMATS[ext]
+    if fmt == "JPEG" and img.mode != "RGB":
+        # JPEG no tiene alfa: fondo blanco en vez del negro que deja convert()
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A") if "A" in img.getbands() else None)
+        img = background
+    out = BytesIO()
+    img.save(out, fmt, **options)
+    return out.getvalue()
+
+
+def build_variants(pk: int) -> bool:
+    """
+    Genera (si hace falta) los derivados de la imagen actual del producto y
+    marca ``imagen_hash``/``imagen_ancho``. Devuelve False si no había nada que hacer.
+    """
+    from . import cards
+    from .cache import bump_catalog_version
+    from .models import Product
+
+    product = Product.objects.filter(pk=pk).only("imagen").first()
+    if product is None or not product.imagen:
+        return False
+    field = product.imagen
+    storage = field.storage
+    with field.open("rb") as fh:
+        digest = content_hash(fh)
+        fh.seek(0)
+        img = load(fh)
+
+    for width in widths_for(img.width):
+        resized = None
+        for ext in FORMATS:
+            name = variant_name(digest, width, ext)
+            if storage.exists(name):
+                continue  # mismo contenido ya procesado (otro producto o una corrida anterior)
+            if resized is None:
+                resized = resize(img, width)
+            storage.save(name, ContentFile(encode(resized, ext)))
+
+    # sólo si la imagen no cambió mientras tanto
+    updated = Product.objects.filter(pk=pk, imagen=field.name).update(imagen_hash=digest, imagen_ancho=img.width)
+    if updated:
+        cards.refresh([pk])
+        bump_catalog_version()
+    return bool(updated)
+
+
+def _run(pk: int) -> None:
+    try:
+        build_variants(pk)
+    except Exception:
+        logger.exception("No se pudieron generar los derivados de la imagen del producto %s", pk)
+    finally:
+        connection.close()  # conexión propia del thread
+
+
+def schedule(pk: int):
+    """Programa la generación fuera del request (o la corre en línea si IMAGE_VARIANTS_ASYNC=False)."""
+    global _executor
+    if not getattr(settings, "IMAGE_VARIANTS_ASYNC", True):
+        build_variants(pk)
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_VARIANTS_WORKERS", 2), thread_name_prefix="product-images"
+        )
+    return _executor.submit(_run, pk)
@@ -0,0 +1,144 @@
+# products/importer.py
+"""
+Carga masiva de productos (catálogos de proveedores, seeds).
+
+Todo trabaja sobre iteradores: las filas se leen de a una, se validan y se
+agrupan en lotes que se escriben con un solo ``bulk_create`` (upsert por ``id``
+cuando la fila lo trae), así la memoria no depende del tamaño del archivo.
+
+``bulk_create`` no dispara señales: cada lote reindexa a mano su búsqueda y sus
+trigramas, y ``finish_import()`` hace el resto (versión del catálogo,
+autocompletado, secuencias de PostgreSQL) una sola vez al final.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from . import autocomplete, cards, dashboard, search, typo
+from .cache import bump_catalog_version
+from .models import Product
+
+# columnas aceptadas (además de "id", opcional)
+FIELDS = ("nombre", "precio", "descripcion", "stock", "image_url", "activo")
+REQUIRED = ("nombre", "precio")
+# lo que pisa un upsert; el dueño y creado_en se conservan
+UPDATE_FIELDS = [*FIELDS, "actualizado_en"]
+
+_TRUE = {"1", "true", "t", "si", "sí", "yes", "y"}
+_FALSE = {"0", "false", "f", "no", "n"}
+
+
+def read_csv(stream):
+    """Filas de un CSV con encabezado, como dicts."""
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    """Un objeto JSON por línea (las líneas vacías se ignoran)."""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = ValidationError(f"JSON inválido: {e}")
+        yield row if isinstance(row, (dict, ValidationError)) else ValidationError("Se esperaba un objeto JSON.")
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def chunks(iterable, size: int):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    s = str(value).strip().lower()
+    if s in _TRUE:
+        return True
+    if s in _FALSE:
+        return False
+    raise ValidationError(f"“{value}” no es un booleano válido.")
+
+
+def clean_row(raw: dict, owner=None) -> Product:
+    """
+    Convierte una fila en un ``Product`` sin guardar, validando con los mismos
+    campos del modelo (largo, dígitos del precio, URL...). Las columnas ausentes
+    toman el default del modelo. Lanza ``ValidationError`` con el detalle por campo.
+    """
+    if isinstance(raw, ValidationError):
+        raise raw
+    errors, data = {}, {}
+    for name in REQUIRED:
+        if _blank(raw.get(name)):
+            errors[name] = "Campo obligatorio."
+
+    if not _blank(raw.get("id")):
+        try:
+            data["id"] = int(raw["id"])
+        except (TypeError, ValueError):
+            errors["id"] = "Debe ser un entero."
+
+    for name in FIELDS:
+        value = raw.get(name)
+        if name in errors or _blank(value):
+            continue
+        field = Product._meta.get_field(name)
+        try:
+            if name == "activo":
+                data[name] = _bool(value)
+            else:
+                data[name] = field.clean(value.strip() if isinstance(value, str) else value, None)
+        except ValidationError as e:
+            errors[name] = " ".join(e.messages)
+
+    if errors:
+        raise ValidationError(errors)
+    return Product(user=owner, **data)
+
+
+def upsert_products(products, using: str = "default") -> list:
+    """
+    Escribe un lote en una transacción: los productos con ``id`` existente se
+    actualizan, el resto se crea. Reindexa búsqueda, trigramas y cards del lote.
+    """
+    with transaction.atomic(using=using):
+        products = Product.objects.using(using).bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=UPDATE_FIELDS,
+        )
+        search.index_products(products, using=using)
+        typo.index_products(products, using=using)
+        # se releen de la base: en los upserts el creado_en de la instancia no es el guardado
+        cards.refresh([p.pk for p in products], using=using)
+        dashboard.forget_products([p.pk for p in products], using=using)
+    return products
+
+
+def finish_import(using: str = "default") -> None:
+    """Lo que las señales harían por producto, una sola vez tras la carga."""
+    connection = connections[using]
+    # ids explícitos no avanzan la secuencia en PostgreSQL
+    sql = connection.ops.sequence_reset_sql(no_style(), [Product])
+    if sql:
+        with connection.cursor() as cur:
+            for statement in sql:
+                cur.execute(statement)
+    bump_catalog_version()
+    autocomplete.rebuild()
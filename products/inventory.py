@@ -0,0 +1,131 @@
+# products/inventory.py
+"""
+Reservas de stock para el checkout.
+
+``reserve()`` descuenta con un UPDATE condicional por producto
+(``SET stock = stock - n WHERE id = ... AND stock >= n``): la base decide de
+forma atómica, sin SELECT FOR UPDATE ni locks de aplicación, y dos compradores
+nunca pueden llevarse la última unidad. Si alguna línea no alcanza se revierte
+la transacción entera.
+
+Cada reserva tiene vencimiento (``STOCK_RESERVATION_TTL``): si el pago falla se
+libera con ``release()``, si se aprueba se confirma con ``commit()`` y las que
+nadie resolvió las devuelve ``release_expired()``; ``extend()`` corre el
+vencimiento mientras el pago siga pendiente. Liberar/confirmar es un
+UPDATE condicional sobre el estado, así que es idempotente aunque lleguen a la
+vez el retorno del pago y el barrido de vencidas.
+
+Todas las transacciones de este módulo empiezan con una escritura, así que en
+SQLite esperan el lock (``timeout``) como con BEGIN IMMEDIATE sin cambiar el
+modo de transacción del resto del proyecto.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cards, dashboard
+from .cache import bump_catalog_version
+from .models import Product, StockReservation
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id: int, requested: int):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Sin stock suficiente para el producto {product_id} (pedido: {requested})")
+
+
+def reservation_ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60))
+
+
+def _bump_on_commit(using):
+    # el stock se ve en listados/facetas y update() no dispara señales
+    transaction.on_commit(bump_catalog_version, using=using)
+
+
+def reserve(reference: str, lines, ttl: timedelta = None, using: str = "default") -> list:
+    """
+    Reserva ``lines`` (pares ``(product_id, qty)``; ids repetidos se suman) bajo
+    ``reference``. Lanza ``OutOfStock`` sin tocar nada si alguna no alcanza.
+    """
+    wanted = Counter()
+    for pid, qty in lines:
+        if qty > 0:
+            wanted[int(pid)] += int(qty)
+    expires_at = timezone.now() + (ttl or reservation_ttl())
+
+    with transaction.atomic(using=using):
+        # siempre en el mismo orden: dos checkouts cruzados no se bloquean mutuamente
+        for pid in sorted(wanted):
+            qty = wanted[pid]
+            updated = Product.objects.using(using).filter(pk=pid, activo=True, stock__gte=qty).update(
+                stock=F("stock") - qty, actualizado_en=timezone.now()
+            )
+            if not updated:
+                raise OutOfStock(pid, qty)
+        cards.refresh(wanted, using=using)
+        dashboard.forget_products(wanted, using=using)
+        reservations = StockReservation.objects.using(using).bulk_create([
+            StockReservation(reference=reference, product_id=pid, qty=qty, expires_at=expires_at)
+            for pid, qty in sorted(wanted.items())
+        ])
+        _bump_on_commit(using)
+    return reservations
+
+
+def _release(reservations, using) -> int:
+    released = []
+    for pk, pid, qty in reservations:
+        # sólo quien pasa la reserva de HELD a RELEASED devuelve el stock
+        if StockReservation.objects.using(using).filter(pk=pk, status=StockReservation.HELD).update(
+            status=StockReservation.RELEASED
+        ):
+            Product.objects.using(using).filter(pk=pid).update(stock=F("stock") + qty, actualizado_en=timezone.now())
+            released.append(pid)
+    if released:
+        cards.refresh(released, using=using)
+        dashboard.forget_products(released, using=using)
+        _bump_on_commit(using)
+    return len(released)
+
+
+def _release_atomically(reservations, using) -> int:
+    # la lectura va antes de la transacción (cada paso vuelve a chequear HELD): así
+    # la transacción empieza escribiendo y en SQLite espera el lock en vez de fallar
+    # con "database is locked" al pasar de lectura a escritura
+    if not reservations:
+        return 0
+    with transaction.atomic(using=using):
+        return _release(reservations, using)
+
+
+def release(reference: str, using: str = "default") -> int:
+    """Devuelve al stock lo reservado bajo ``reference`` (pago fallido/cancelado)."""
+    held = StockReservation.objects.using(using).filter(reference=reference, status=StockReservation.HELD)
+    return _release_atomically(list(held.values_list("id", "product_id", "qty")), using)
+
+
+def commit(reference: str, using: str = "default") -> int:
+    """Pago aprobado: la reserva queda firme y ya no vence."""
+    return StockReservation.objects.using(using).filter(reference=reference, status=StockReservation.HELD).update(
+        status=StockReservation.COMMITTED
+    )
+
+
+def extend(reference: str, until, using: str = "default") -> int:
+    """Pago pendiente (p. ej. en efectivo): la reserva no vence antes de ``until``."""
+    return StockReservation.objects.using(using).filter(
+        reference=reference, status=StockReservation.HELD, expires_at__lt=until
+    ).update(expires_at=until)
+
+
+def release_expired(now=None, using: str = "default") -> int:
+    """Libera todas las reservas vencidas; pensado para cron y como barrido oportunista."""
+    now = now or timezone.now()
+    expired = StockReservation.objects.using(using).filter(status=StockReservation.HELD, expires_at__lte=now)
+    return _release_atomically(list(expired.values_list("id", "product_id", "qty")), using)
@@ -0,0 +1,70 @@
+# products/management/commands/bench_product_cards.py
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import cards
+from products.filters import filter_products, parse_filters
+from products.models import Product, ProductCard
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide filas/segundo del listado: consulta actual sobre Product (fila completa +\n"
+        "JOIN a user) vs. la tabla de cards. Recorre todas las páginas de 12 con el\n"
+        "orden por defecto y con precio ascendente. Crea los datos dentro de una\n"
+        "transacción que se revierte al final.\n"
+        "Uso: python manage.py bench_product_cards [--count 5000] [--desc-size 2000] [--repeat 3]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=5000, help="Productos a generar (default 5000).")
+        parser.add_argument("--desc-size", type=int, default=2000, help="Largo de la descripción (default 2000).")
+        parser.add_argument("--repeat", type=int, default=3, help="Corridas por variante (default 3).")
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            self._seed(opts["count"], opts["desc_size"])
+            variants = [
+                ("Product + select_related(user)", lambda: Product.objects.filter(activo=True).select_related("user")),
+                ("ProductCard", lambda: ProductCard.objects.all()),
+            ]
+            for order in ("", "price_asc"):
+                f = parse_filters({"order": order})
+                for label, base in variants:
+                    qs = filter_products(base(), f)
+                    rows = self._scan(qs)  # warm-up
+                    t0 = time.perf_counter()
+                    for _ in range(opts["repeat"]):
+                        self._scan(qs)
+                    elapsed = (time.perf_counter() - t0) / opts["repeat"]
+                    self.stdout.write(f"{order or 'newest':<10} {label:<32} {rows / elapsed:12,.0f} filas/s")
+            transaction.set_rollback(True)
+
+    def _scan(self, qs, size=12):
+        """Lee todas las páginas (OFFSET/LIMIT como el Paginator) instanciando los modelos."""
+        rows = 0
+        for start in range(0, qs.count(), size):
+            page = list(qs[start:start + size])
+            rows += len(page)
+        return rows
+
+    def _seed(self, count, desc_size):
+        User = get_user_model()
+        owners = [User.objects.create(username=f"bench-cards-{i}") for i in range(10)]
+        desc = ("Descripción larga de producto para benchmark. " * (desc_size // 47 + 1))[:desc_size]
+        products = Product.objects.bulk_create([
+            Product(
+                user=owners[i % len(owners)],
+                nombre=f"bench Producto {i}",
+                precio=Decimal(1000 + (i * 37) % 5000),
+                descripcion=desc,
+                stock=i % 7,
+                image_url=f"https://img.example.com/{i}.jpg",
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        cards.refresh([p.pk for p in products])
@@ -0,0 +1,65 @@
+# products/management/commands/bench_product_serializer.py
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from products.api.serializers import ProductSerializer, ProductReadSerializer
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo de serialización (consulta incluida) por cada 100 productos:\n"
+        "ModelSerializer con y sin select_related vs. ProductReadSerializer (values()).\n"
+        "Crea los datos dentro de una transacción que se revierte al final.\n"
+        "Uso: python manage.py bench_product_serializer [--count 100] [--repeat 30]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100, help="Productos por corrida (default 100).")
+        parser.add_argument("--repeat", type=int, default=30, help="Corridas por variante (default 30).")
+
+    def handle(self, *args, **opts):
+        count, repeat = opts["count"], opts["repeat"]
+        with transaction.atomic():
+            self._seed(count)
+            host = next((h for h in settings.ALLOWED_HOSTS if h and not h.startswith((".", "*"))), "localhost")
+            ctx = {"request": Request(APIRequestFactory().get("/api/products/", HTTP_HOST=host))}
+            base = Product.objects.filter(Q(nombre__startswith="bench Producto ")).order_by("-creado_en", "-id")
+
+            variants = [
+                ("ModelSerializer (N+1 user)", lambda: ProductSerializer(base, many=True, context=ctx).data),
+                ("ModelSerializer + select_related", lambda: ProductSerializer(base.select_related("user"), many=True, context=ctx).data),
+                ("ProductReadSerializer (values)", lambda: ProductReadSerializer(ProductReadSerializer.rows(base), many=True, context=ctx).data),
+            ]
+            for label, fn in variants:
+                fn()  # warm-up
+                t0 = time.perf_counter()
+                for _ in range(repeat):
+                    fn()
+                per_100 = (time.perf_counter() - t0) / repeat * (100 / count) * 1000
+                self.stdout.write(f"{label:<36} {per_100:8.2f} ms / 100 productos")
+            transaction.set_rollback(True)
+
+    def _seed(self, count):
+        User = get_user_model()
+        owners = [User.objects.create(username=f"bench-{i}") for i in range(10)]
+        Product.objects.bulk_create([
+            Product(
+                user=owners[i % len(owners)],
+                nombre=f"bench Producto {i}",
+                precio=Decimal(1000 + i),
+                descripcion="Producto de prueba para benchmark.",
+                stock=i % 7,
+                imagen=f"products/bench-{i}.jpg" if i % 2 else "",
+            )
+            for i in range(count)
+        ])
+
@@ -0,0 +1,29 @@
+# products/management/commands/build_image_variants.py
+from django.core.management.base import BaseCommand
+
+from products import images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera los derivados (card/detalle, WebP/JPEG) de las imágenes que todavía no los tienen.\n"
+        "Útil para productos previos al pipeline o si un worker se cayó a mitad de camino.\n"
+        "Uso: python manage.py build_image_variants [--all]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Vuelve a procesar también los que ya tienen derivados (sólo crea los archivos que falten).")
+
+    def handle(self, *args, **opts):
+        qs = Product.objects.exclude(imagen="").exclude(imagen__isnull=True)
+        if not opts["all"]:
+            qs = qs.filter(imagen_hash="")
+        hechos = fallidos = 0
+        for pk in qs.values_list("id", flat=True).iterator(chunk_size=500):
+            try:
+                hechos += images.build_variants(pk)
+            except Exception as e:
+                fallidos += 1
+                self.stderr.write(f"Producto {pk}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"🖼️ Derivados listos: {hechos} productos ({fallidos} con error)"))
@@ -0,0 +1,23 @@
+# products/management/commands/build_related_products.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import related
+
+
+class Command(BaseCommand):
+    help = (
+        "Precalcula los productos relacionados (TF-IDF de nombre/descripción + compras en común).\n"
+        "Por defecto es incremental: sólo lo que cambió desde la corrida anterior.\n"
+        "Uso: python manage.py build_related_products [--full] [--top-k 8]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recalcula todo el catálogo.")
+        parser.add_argument("--top-k", type=int, default=related.DEFAULT_TOP_K, help=f"Relacionados por producto (default {related.DEFAULT_TOP_K}).")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        n = related.build(full=opts["full"], top_k=max(1, opts["top_k"]))
+        self.stdout.write(self.style.SUCCESS(f"🔗 Relacionados actualizados: {n} productos en {time.perf_counter() - t0:.1f}s"))
@@ -0,0 +1,114 @@
+# products/management/commands/import_products.py
+import io
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from products import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde un CSV o NDJSON (archivo o stdin) por lotes, con upsert por id.\n"
+        "Columnas: id (opcional), nombre, precio, descripcion, stock, image_url, activo.\n"
+        "Uso: python manage.py import_products catalogo.csv [--format csv|ndjson] [--batch-size 1000]\n"
+        "     [--owner usuario] [--max-errors 100] [--dry-run]\n"
+        "     cat catalogo.ndjson | python manage.py import_products - --format ndjson"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Archivo a importar, o '-' para leer de stdin.")
+        parser.add_argument("--format", choices=sorted(importer.READERS), help="Default: según la extensión (csv si no se puede inferir).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Filas por lote/transacción (default 1000).")
+        parser.add_argument("--owner", help="Username del dueño de los productos nuevos (default: sin dueño).")
+        parser.add_argument("--max-errors", type=int, default=100, help="Corta la importación al superar esta cantidad de filas inválidas (default 100).")
+        parser.add_argument("--dry-run", action="store_true", help="Sólo valida, no escribe nada.")
+        parser.add_argument("--database", default="default", help="Alias de la base (default: default).")
+
+    def handle(self, *args, **opts):
+        path, using = opts["path"], opts["database"]
+        self.verbosity = opts["verbosity"]
+        fmt = opts["format"] or self._guess_format(path)
+        batch_size = max(1, opts["batch_size"])
+        owner = self._owner(opts["owner"])
+
+        self.written = 0
+        stream = self._open(path)
+        try:
+            rows = importer.READERS[fmt](stream)
+            self._run(rows, owner, batch_size, opts["max_errors"], opts["dry_run"], using)
+        finally:
+            if path != "-":
+                stream.close()
+            elif stream is not sys.stdin:
+                stream.detach()  # sin cerrar el stdin real
+            # los lotes ya confirmados quedan aunque se haya cortado por errores
+            if self.written:
+                importer.finish_import(using)
+
+    def _run(self, rows, owner, batch_size, max_errors, dry_run, using):
+        ok = failed = line = 0
+        t0 = time.perf_counter()
+        for raw_batch in importer.chunks(rows, batch_size):
+            valid = []
+            for raw in raw_batch:
+                line += 1
+                try:
+                    valid.append(importer.clean_row(raw, owner))
+                except ValidationError as e:
+                    failed += 1
+                    self.stderr.write(f"Fila {line}: {self._describe(e)}")
+                    if failed > max_errors:
+                        raise CommandError(f"Demasiadas filas inválidas ({failed}); se importaron {ok} antes de cortar.")
+            if valid and not dry_run:
+                importer.upsert_products(valid, using=using)
+                self.written += len(valid)
+            ok += len(valid)
+            if self.verbosity >= 2:
+                self.stdout.write(f"… {ok} filas ({self._rate(ok, t0)} filas/s)")
+
+        elapsed = time.perf_counter() - t0
+        verb = "validadas" if dry_run else "importadas"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {ok} filas {verb}, {failed} con errores, en {elapsed:.1f}s ({self._rate(ok, t0)} filas/s)"
+        ))
+
+    @staticmethod
+    def _rate(n, t0):
+        return int(n / max(time.perf_counter() - t0, 1e-9))
+
+    @staticmethod
+    def _describe(error):
+        if hasattr(error, "message_dict"):
+            return "; ".join(f"{k}: {' '.join(v)}" for k, v in error.message_dict.items())
+        return " ".join(error.messages)
+
+    @staticmethod
+    def _guess_format(path):
+        ext = os.path.splitext(path)[1].lower()
+        return "ndjson" if ext in (".ndjson", ".jsonl") else "csv"
+
+    @staticmethod
+    def _open(path):
+        if path == "-":
+            # newline="" para que el módulo csv maneje los saltos dentro de comillas
+            buffer = getattr(sys.stdin, "buffer", None)
+            return io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="") if buffer else sys.stdin
+        try:
+            return open(path, encoding="utf-8-sig", newline="")
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {path}: {e}")
+
+    @staticmethod
+    def _owner(username):
+        if not username:
+            return None
+        User = get_user_model()
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"No existe el usuario '{username}'.")
@@ -0,0 +1,18 @@
+# products/management/commands/rebuild_product_cards.py
+from django.core.management.base import BaseCommand
+
+from products import cards
+from products.cache import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera la tabla de lectura del listado (ProductCard) desde Product.\n"
+        "Normalmente no hace falta: la mantienen las señales y el importador.\n"
+        "Uso: python manage.py rebuild_product_cards"
+    )
+
+    def handle(self, *args, **opts):
+        written = cards.rebuild()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"✅ {written} cards regeneradas."))
@@ -0,0 +1,30 @@
+# products/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from products import search, typo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice full-text y los trigramas de productos (útil tras cargas masivas o updates que no disparan señales).\n"
+        "Uso: python manage.py rebuild_search_index [--database default]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Alias de la base (default: default).")
+
+    def handle(self, *args, **opts):
+        using = opts["database"]
+        connection = connections[using]
+        if search.is_supported(connection):
+            with transaction.atomic(using=using):
+                search.create_index(connection)
+                n = search.rebuild(connection)
+            self.stdout.write(self.style.SUCCESS(f"🔎 Índice full-text reconstruido. Productos indexados: {n}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"⚠️ El motor '{connection.vendor}' no tiene índice full-text; se usa icontains."))
+
+        with transaction.atomic(using=using):
+            n = typo.rebuild(using)
+        self.stdout.write(self.style.SUCCESS(f"🔤 Trigramas reconstruidos. Productos: {n}"))
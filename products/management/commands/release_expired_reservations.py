@@ -0,0 +1,16 @@
+# products/management/commands/release_expired_reservations.py
+from django.core.management.base import BaseCommand
+
+from products import inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Devuelve al stock las reservas de checkout vencidas (pagos abandonados).\n"
+        "Pensado para cron cada pocos minutos; también se barre al iniciar cada checkout.\n"
+        "Uso: python manage.py release_expired_reservations"
+    )
+
+    def handle(self, *args, **opts):
+        n = inventory.release_expired()
+        self.stdout.write(self.style.SUCCESS(f"📦 Reservas vencidas liberadas: {n}"))
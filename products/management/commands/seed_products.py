@@ -5,18 +5,10 @@ from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 from django.db import transaction
 
-from products.models import Category, Product
+from products import importer
+from products.models import Product
 
-CATEGORIAS = [
-    "Remeras",
-    "Pantalones",
-    "Camperas",
-    "Zapatillas",
-    "Accesorios",
-    "Vestidos",
-]
-
-# Palabras base para generar nombres distintos, con repetidos por categoría
+# Palabras base para generar nombres distintos (con repetidos, útil para comparar)
 ADJETIVOS = ["Clásica", "Premium", "Urban", "Básica", "Slim", "Oversize", "Deportiva", "Casual"]
 COLORES   = ["Negra", "Blanca", "Azul", "Roja", "Verde", "Beige", "Gris", "Marrón"]
 PIEZAS    = ["Remera", "Pantalón", "Campera", "Zapatilla", "Cinturón", "Bufanda", "Vestido", "Short"]
@@ -35,17 +27,24 @@ def stock_random():
 
 def pick_image_url(seed: str) -> str:
     """
-    Deja una imagen remota genérica (NO fakestore). 
+    Deja una imagen remota genérica (NO fakestore).
     picsum.photos genera imágenes reproducibles por seed.
     """
     s = slugify(seed) or "gaon"
     # 600x600 cuadrada para cards
     return f"https://picsum.photos/seed/{s}/600/600"
 
+def nombre_random() -> str:
+    nombre = f"{random.choice(PIEZAS)} {random.choice(ADJETIVOS)} {random.choice(COLORES)}"
+    # Para evitar muchos duplicados exactos, agregamos un nro a veces
+    if random.random() < 0.35:
+        nombre += f" #{random.randint(1, 99)}"
+    return nombre
+
 class Command(BaseCommand):
     help = (
-        "Genera categorías y N productos aleatorios, borrando previamente los existentes si se indica.\n"
-        "Uso: python manage.py seed_products [--clear] [--count 24]"
+        "Genera N productos aleatorios, borrando previamente los existentes si se indica.\n"
+        "Uso: python manage.py seed_products [--clear] [--count 24] [--batch-size 1000]"
     )
 
     def add_arguments(self, parser):
@@ -60,6 +59,12 @@ class Command(BaseCommand):
             default=24,
             help="Cantidad total de productos a crear (default 24).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Productos por bulk_create (default 1000).",
+        )
 
     @transaction.atomic
     def handle(self, *args, **opts):
@@ -71,61 +76,23 @@ class Command(BaseCommand):
             Product.objects.all().delete()
             self.stdout.write(self.style.WARNING(f"🧹 Productos eliminados: {n}"))
 
-        # Asegurar categorías locales
-        cat_objs = []
-        for nombre in CATEGORIAS:
-            slug = slugify(nombre)
-            cat, _ = Category.objects.get_or_create(slug=slug, defaults={"nombre": nombre})
-            # Si el nombre cambió, actualizamos (por si el modelo lo soporta)
-            if cat.nombre != nombre:
-                cat.nombre = nombre
-                cat.save(update_fields=["nombre"])
-            cat_objs.append(cat)
-
-        self.stdout.write(self.style.SUCCESS(f"📁 Categorías listas: {', '.join(c.nombre for c in cat_objs)}"))
+        def generar():
+            for idx in range(1, count + 1):
+                nombre = nombre_random()
+                yield Product(
+                    user=None,                 # opcional/nullable en tu modelo
+                    nombre=nombre,
+                    precio=precio_random(),
+                    descripcion=DESCRIPCION_BASE,
+                    stock=stock_random(),
+                    image_url=pick_image_url(f"{idx}-{nombre}"),  # URL remota genérica (no fakestore)
+                    activo=True,
+                )
 
         creados = 0
-        # Garantizamos que haya múltiples productos por categoría (útil para comparar)
-        base_por_cat = max(2, count // max(1, len(cat_objs)))  # al menos 2 por categoría
-        pool = []
-
-        for cat in cat_objs:
-            for _ in range(base_por_cat):
-                pool.append(cat)
-
-        # Si faltan para llegar a 'count', completamos al azar
-        while len(pool) < count:
-            pool.append(random.choice(cat_objs))
-        # Si sobran, recortamos
-        pool = pool[:count]
-
-        for idx, categoria in enumerate(pool, start=1):
-            # Armamos un nombre verosímil
-            pieza = random.choice(PIEZAS)
-            adj = random.choice(ADJETIVOS)
-            color = random.choice(COLORES)
-            nombre = f"{pieza} {adj} {color}"
-
-            # Para evitar muchos duplicados exactos, agregamos un nro a veces
-            if random.random() < 0.35:
-                nombre += f" #{random.randint(1, 99)}"
-
-            precio = precio_random()
-            stock  = stock_random()
-            desc   = DESCRIPCION_BASE
-            image_url = pick_image_url(f"{categoria.slug}-{nombre}")
-
-            p = Product(
-                user=None,                 # opcional/nullable en tu modelo
-                category=categoria,
-                nombre=nombre,
-                precio=precio,
-                descripcion=desc,
-                stock=stock,
-                image_url=image_url,       # usamos URL remota genérica (no fakestore)
-                activo=True,
-            )
-            p.save()
-            creados += 1
+        for lote in importer.chunks(generar(), max(1, opts["batch_size"])):
+            creados += len(importer.upsert_products(lote))
+        # el autocompletado y la versión del catálogo se publican al confirmar
+        transaction.on_commit(importer.finish_import)
 
         self.stdout.write(self.style.SUCCESS(f"✅ Seed listo. Productos creados: {creados}"))
@@ -0,0 +1,27 @@
+# Índice full-text del catálogo (FTS5 en SQLite, tsvector + GIN en PostgreSQL)
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from products import search
+
+    search.create_index(schema_editor.connection)
+    search.rebuild(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from products import search
+
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_remove_product_category_delete_category"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
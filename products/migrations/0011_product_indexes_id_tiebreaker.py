@@ -0,0 +1,63 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_catalog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_activo_creado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_activo_precio_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_activo_precio_desc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_activo_nombre_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_instock_creado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_instock_precio_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['-creado_en', '-id'], name='product_activo_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['precio', '-creado_en', '-id'], name='product_activo_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['-precio', '-creado_en', '-id'], name='product_activo_precio_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['nombre', '-creado_en', '-id'], name='product_activo_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__gt', 0)), fields=['-creado_en', '-id'], name='product_instock_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('activo', True), ('stock__gt', 0)), fields=['precio', '-creado_en', '-id'], name='product_instock_precio_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_trigrams(apps, schema_editor):
+    from products.typo import trigrams
+
+    Product = apps.get_model("products", "Product")
+    ProductTrigram = apps.get_model("products", "ProductTrigram")
+    batch = []
+    for pid, nombre in Product.objects.values_list("id", "nombre").iterator(chunk_size=2000):
+        batch.extend(ProductTrigram(product_id=pid, trigram=t) for t in trigrams(nombre))
+        if len(batch) >= 5000:
+            ProductTrigram.objects.bulk_create(batch)
+            batch = []
+    ProductTrigram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_indexes_id_tiebreaker'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['trigram', 'product'], name='product_trigram_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'trigram'), name='product_trigram_unique')],
+            },
+        ),
+        migrations.RunPython(populate_trigrams, migrations.RunPython.noop),
+    ]
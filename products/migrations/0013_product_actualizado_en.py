@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:30
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_actualizado_en(apps, schema_editor):
+    # las filas existentes no tienen historia: las tomamos como modificadas al crearse
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(actualizado_en=F("creado_en"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_actualizado_en, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_product_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='imagen_ancho',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='imagen_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_remote_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(db_index=True, max_length=100)),
+                ('qty', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('held', 'Reservado'), ('committed', 'Confirmado'), ('released', 'Liberado')], default='held', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'held')), fields=['expires_at'], name='reservation_held_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:51
+
+import django.db.models.deletion
+import products.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_cards(apps, schema_editor):
+    from products.cards import CARD_FIELDS, card_values
+
+    Product = apps.get_model("products", "Product")
+    ProductCard = apps.get_model("products", "ProductCard")
+    rows = Product.objects.filter(activo=True).values_list("id", *CARD_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=2000):
+        batch.append(ProductCard(id=row[0], **card_values(row)))
+        if len(batch) >= 2000:
+            ProductCard.objects.bulk_create(batch)
+            batch = []
+    ProductCard.objects.bulk_create(batch)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_related_product'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=100)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.IntegerField(default=0)),
+                ('imagen', models.ImageField(blank=True, null=True, upload_to=products.models.product_upload_to)),
+                ('image_url', models.URLField(blank=True)),
+                ('imagen_hash', models.CharField(blank=True, default='', max_length=32)),
+                ('imagen_ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField()),
+                ('actualizado_en', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['-creado_en', '-id'], name='card_creado_idx'), models.Index(fields=['precio', '-creado_en', '-id'], name='card_precio_idx'), models.Index(fields=['-precio', '-creado_en', '-id'], name='card_precio_desc_idx'), models.Index(fields=['nombre', '-creado_en', '-id'], name='card_nombre_idx'), models.Index(condition=models.Q(('stock__gt', 0)), fields=['-creado_en', '-id'], name='card_instock_creado_idx'), models.Index(condition=models.Q(('stock__gt', 0)), fields=['precio', '-creado_en', '-id'], name='card_instock_precio_idx'), models.Index(fields=['user', '-creado_en', '-id'], name='card_user_creado_idx')],
+            },
+        ),
+        migrations.RunPython(populate_cards, migrations.RunPython.noop),
+    ]
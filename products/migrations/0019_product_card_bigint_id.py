@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_product_card'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productcard',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.conf import settings
 import os
 from uuid import uuid4
 
+# rango de Product.id (BigAutoField): fuera de eso la base no acepta el parámetro
+MAX_PK = 2 ** 63 - 1
+
 def product_upload_to(instance, filename):
     name, ext = os.path.splitext(filename)
     ext = (ext or "").lower() or ".jpg"
@@ -27,12 +30,158 @@ class Product(models.Model):
     # Imagen local (opcional) + URL remota (FakeStore)
     imagen = models.ImageField(upload_to=product_upload_to, blank=True, null=True)
     image_url = models.URLField(blank=True)  # ⬅️ clave para usar imágenes reales de FakeStore
+    # derivados de `imagen` (ver products/images.py): vacío = todavía no existen, se usa el original
+    imagen_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+    imagen_ancho = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     activo = models.BooleanField(default=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        # Un índice por forma real de consulta del catálogo (ver products/filters.py).
+        # Son parciales (WHERE activo) porque el listado siempre filtra activo=True y
+        # Django lo emite como `WHERE "activo"`, que SQLite no usa como prefijo de un
+        # índice compuesto pero sí para elegir un índice parcial.
+        indexes = [
+            models.Index(fields=["-creado_en", "-id"], name="product_activo_creado_idx", condition=models.Q(activo=True)),
+            models.Index(fields=["precio", "-creado_en", "-id"], name="product_activo_precio_idx", condition=models.Q(activo=True)),
+            models.Index(fields=["-precio", "-creado_en", "-id"], name="product_activo_precio_desc_idx", condition=models.Q(activo=True)),
+            models.Index(fields=["nombre", "-creado_en", "-id"], name="product_activo_nombre_idx", condition=models.Q(activo=True)),
+            # filtro "Con stock" (in_stock=true), el más usado desde el listado
+            models.Index(fields=["-creado_en", "-id"], name="product_instock_creado_idx", condition=models.Q(activo=True, stock__gt=0)),
+            models.Index(fields=["precio", "-creado_en", "-id"], name="product_instock_precio_idx", condition=models.Q(activo=True, stock__gt=0)),
+        ]
+
+    def __str__(self):
+        return self.nombre
+
+
+class ProductCard(models.Model):
+    """
+    Modelo de lectura del listado (ver products/cards.py): una fila angosta por
+    producto *activo* con sólo lo que muestran las cards (sin ``descripcion``).
+    ``id`` es el mismo que el de Product, así los filtros, la búsqueda y el
+    cursor del catálogo funcionan igual sobre las dos tablas. No se escribe a
+    mano: la mantienen las señales de Product, el importador y los ``update()``
+    de stock/imágenes.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # sin FK real: es una copia, la borra el post_delete de Product
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    nombre = models.CharField(max_length=100)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.IntegerField(default=0)
+    imagen = models.ImageField(upload_to=product_upload_to, blank=True, null=True)
+    image_url = models.URLField(blank=True)
+    imagen_hash = models.CharField(max_length=32, blank=True, default="")
+    imagen_ancho = models.PositiveIntegerField(null=True, blank=True)
+    creado_en = models.DateTimeField()
+    actualizado_en = models.DateTimeField()
+
+    # columnas del listado de la API que esta tabla no guarda (ver cards.complete_rows)
+    MISSING_COLUMNS = ("descripcion", "activo")
 
     class Meta:
         ordering = ["-creado_en"]
+        # los mismos órdenes que Product, sin la condición activo (acá son todos activos)
+        indexes = [
+            models.Index(fields=["-creado_en", "-id"], name="card_creado_idx"),
+            models.Index(fields=["precio", "-creado_en", "-id"], name="card_precio_idx"),
+            models.Index(fields=["-precio", "-creado_en", "-id"], name="card_precio_desc_idx"),
+            models.Index(fields=["nombre", "-creado_en", "-id"], name="card_nombre_idx"),
+            models.Index(fields=["-creado_en", "-id"], name="card_instock_creado_idx", condition=models.Q(stock__gt=0)),
+            models.Index(fields=["precio", "-creado_en", "-id"], name="card_instock_precio_idx", condition=models.Q(stock__gt=0)),
+            models.Index(fields=["user", "-creado_en", "-id"], name="card_user_creado_idx"),
+        ]
 
     def __str__(self):
         return self.nombre
+
+
+class ProductTrigram(models.Model):
+    """
+    Trigramas del nombre (sin acentos) de cada producto. Alimenta la búsqueda
+    tolerante a errores ("¿quisiste decir...?") en cualquier motor de base.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="trigrams")
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [models.Index(fields=["trigram", "product"], name="product_trigram_idx")]
+        constraints = [models.UniqueConstraint(fields=["product", "trigram"], name="product_trigram_unique")]
+
+    def __str__(self):
+        return f"{self.trigram!r} → {self.product_id}"
+
+
+class RemoteImage(models.Model):
+    """
+    Copia local (achicada) de una ``image_url`` remota, servida por el proxy de
+    imágenes (products/image_proxy.py). ``last_access`` alimenta el desalojo LRU.
+    """
+    key = models.CharField(max_length=40, unique=True)  # sha1(url + ancho)
+    source_url = models.URLField(max_length=1000)
+    name = models.CharField(max_length=255)  # nombre en el storage de media
+    size = models.PositiveIntegerField()
+    etag = models.CharField(max_length=64)
+    fetched_at = models.DateTimeField(auto_now_add=True)
+    last_access = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.source_url
+
+
+class StockReservation(models.Model):
+    """
+    Stock apartado para un checkout (ver products/inventory.py). El stock ya se
+    descontó de ``Product.stock`` al reservar; si la reserva se libera (pago
+    fallido o vencida) vuelve al producto.
+    """
+    HELD = "held"
+    COMMITTED = "committed"
+    RELEASED = "released"
+    STATUS_CHOICES = [(HELD, "Reservado"), (COMMITTED, "Confirmado"), (RELEASED, "Liberado")]
+
+    reference = models.CharField(max_length=100, db_index=True)  # external_reference del pago
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    qty = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # el barrido de vencidas sólo mira las que siguen reservadas
+            models.Index(fields=["expires_at"], name="reservation_held_expiry_idx", condition=models.Q(status="held")),
+        ]
+
+    def __str__(self):
+        return f"{self.reference}: {self.qty} × {self.product_id} ({self.status})"
+
+
+class RelatedProduct(models.Model):
+    """
+    Top-K de productos relacionados de cada producto, precalculado por
+    ``build_related_products`` (ver products/related.py). Se lee por
+    (product, rank) con una sola consulta indexada.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="related_links")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="related_of")
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["product", "rank"], name="related_product_rank_unique")]
+
+    def __str__(self):
+        return f"{self.product_id} → {self.related_id} (#{self.rank}, {self.score:.3f})"
@@ -0,0 +1,95 @@
+# products/pagination.py
+"""
+Paginación por cursor (keyset) para el catálogo.
+
+En vez de ``COUNT(*)`` + ``OFFSET``, el cursor guarda los valores de orden de la
+última fila entregada y la página siguiente se pide con un ``WHERE`` sobre esas
+columnas, así que ir a la "página 400" cuesta lo mismo que ir a la primera.
+El orden del queryset tiene que terminar en ``id``/``-id`` para ser total
+(ver ``ORDERINGS`` en products/filters.py).
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _ordering(qs):
+    order_by = [str(o) for o in qs.query.order_by]
+    if not order_by or order_by[-1].lstrip("-") not in ("id", "pk"):
+        raise InvalidCursor("La paginación por cursor necesita un orden que termine en id.")
+    return [(o.lstrip("-"), o.startswith("-")) for o in order_by]
+
+
+def _dump(val):
+    if isinstance(val, (int, float, str)) or val is None:
+        return val
+    if isinstance(val, Decimal):
+        return str(val)
+    return val.isoformat()
+
+
+def _load(qs, name, raw):
+    if raw is None:
+        # ninguna columna de orden es nula: un None es un cursor adulterado
+        raise InvalidCursor(f"Cursor inválido: {name} vacío.")
+    try:
+        field = qs.model._meta.get_field(name)
+    except Exception:
+        field = None  # anotaciones (p. ej. search_rank)
+    try:
+        return float(raw) if field is None else field.to_python(raw)
+    except Exception as e:
+        raise InvalidCursor(str(e))
+
+
+def encode_cursor(obj, ordering) -> str:
+    # obj puede ser una instancia o una fila de values()
+    payload = {
+        "o": [("-" if desc else "") + name for name, desc in ordering],
+        "v": [_dump(obj[name] if isinstance(obj, dict) else getattr(obj, name)) for name, _ in ordering],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(qs, token: str, ordering):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        names, values = payload["o"], payload["v"]
+    except Exception:
+        raise InvalidCursor("Cursor inválido.")
+    if names != [("-" if desc else "") + name for name, desc in ordering] or len(values) != len(names):
+        raise InvalidCursor("El cursor no corresponde a este orden.")
+    return [_load(qs, name, v) for (name, _), v in zip(ordering, values)]
+
+
+def _after(ordering, values) -> Q:
+    """(a, b, id) > (va, vb, vid) respetando la dirección de cada columna."""
+    cond = Q()
+    for i, (name, desc) in enumerate(ordering):
+        step = Q(**{f"{name}__{'lt' if desc else 'gt'}": values[i]})
+        for j in range(i):
+            step &= Q(**{ordering[j][0]: values[j]})
+        cond |= step
+    return cond
+
+
+def keyset_page(qs, cursor: str, size: int):
+    """
+    Devuelve ``(items, next_cursor)``. ``cursor`` vacío = primera página.
+    Trae ``size + 1`` filas para saber si hay siguiente; nunca cuenta.
+    """
+    ordering = _ordering(qs)
+    if cursor:
+        qs = qs.filter(_after(ordering, decode_cursor(qs, cursor, ordering)))
+    rows = list(qs[: size + 1])
+    items = rows[:size]
+    next_cursor = encode_cursor(items[-1], ordering) if len(rows) > size else None
+    return items, next_cursor
@@ -0,0 +1,207 @@
+# products/related.py
+"""
+"Productos relacionados" precalculados fuera de línea (``build_related_products``).
+
+Para cada producto se guarda su top-K en ``RelatedProduct`` combinando:
+
+- similitud de texto: coseno TF-IDF sobre nombre (peso doble) y descripción,
+  con los mismos términos normalizados que la búsqueda. La matriz se arma con
+  NumPy en formato disperso (postings por término) y cada fila de similitudes
+  es un producto matriz-dispersa × vector resuelto con ``bincount``;
+- co-ocurrencia: cuántas veces se compraron juntos en un mismo checkout
+  (``StockReservation`` confirmadas, agrupadas por referencia; las liberadas
+  son pagos rechazados o carritos abandonados y no dicen nada).
+
+Es incremental: sólo recalcula los productos modificados (o comprados) desde la
+corrida anterior, los que los tenían en su lista y sus nuevos vecinos. El IDF
+cambia de a poco con el catálogo, así que conviene un ``--full`` de vez en cuando.
+"""
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Product, RelatedProduct, StockReservation
+from .search import normalize_terms
+
+DEFAULT_TOP_K = 8
+NAME_WEIGHT = 2  # el nombre pesa el doble que la descripción
+CO_WEIGHT = 0.5  # peso de "se compran juntos" frente al texto, cuando hay datos
+MIN_SCORE = 0.05
+MAX_BASKET = 50  # checkouts más grandes (mayoristas) no dicen mucho de afinidad
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los",
+    "para", "por", "que", "se", "sin", "su", "tu", "un", "una", "y", "o",
+}
+
+
+def _terms(text: str) -> list:
+    return [t for t in normalize_terms(text) if t not in STOPWORDS and len(t) > 1]
+
+
+class Corpus:
+    """TF-IDF (tf sublineal, filas normalizadas) de los productos activos."""
+
+    def __init__(self, rows):
+        ids, doc, term, tf = [], [], [], []
+        vocab = {}
+        for i, (pid, nombre, descripcion) in enumerate(rows):
+            ids.append(pid)
+            counts = Counter()
+            for t in _terms(nombre):
+                counts[t] += NAME_WEIGHT
+            for t in _terms(descripcion):
+                counts[t] += 1
+            for t, c in counts.items():
+                doc.append(i)
+                term.append(vocab.setdefault(t, len(vocab)))
+                tf.append(c)
+
+        n, v = len(ids), len(vocab)
+        self.ids = ids
+        self.pos = {pid: i for i, pid in enumerate(ids)}
+        doc = np.asarray(doc, dtype=np.int64)
+        term = np.asarray(term, dtype=np.int64)
+        tf = np.asarray(tf, dtype=np.float64)
+
+        idf = np.log((1 + n) / (1 + np.bincount(term, minlength=v))) + 1
+        w = (1 + np.log(tf)) * idf[term] if len(tf) else tf
+        norms = np.sqrt(np.bincount(doc, weights=w * w, minlength=n))
+        if len(w):
+            w /= norms[doc]
+
+        # por documento (CSR): doc ya viene ordenado
+        self.doc_ptr = np.concatenate(([0], np.cumsum(np.bincount(doc, minlength=n))))
+        self.doc_terms, self.doc_w = term, w
+        # por término (CSC): los postings de cada término
+        order = np.argsort(term, kind="stable")
+        self.post_docs, self.post_w = doc[order], w[order]
+        self.term_ptr = np.concatenate(([0], np.cumsum(np.bincount(term, minlength=v))))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def similarities(self, i: int):
+        """Coseno del documento ``i`` contra todos (0 contra sí mismo)."""
+        lo, hi = self.doc_ptr[i], self.doc_ptr[i + 1]
+        terms, weights = self.doc_terms[lo:hi], self.doc_w[lo:hi]
+        starts = self.term_ptr[terms]
+        lens = self.term_ptr[terms + 1] - starts
+        total = int(lens.sum())
+        sims = np.zeros(len(self.ids))
+        if total:
+            # índices de todos los postings de los términos del documento, sin loop
+            idx = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+            sims = np.bincount(self.post_docs[idx], weights=self.post_w[idx] * np.repeat(weights, lens), minlength=len(self.ids))
+        sims[i] = 0
+        return sims
+
+
+def load_corpus() -> Corpus:
+    rows = Product.objects.filter(activo=True).values_list("id", "nombre", "descripcion").order_by("id")
+    return Corpus(rows.iterator(chunk_size=2000))
+
+
+def cooccurrence(product_ids=None) -> dict:
+    """``{pid: Counter({otro_pid: checkouts pagados en común})}`` (de ``product_ids`` o de todos)."""
+    rows = StockReservation.objects.filter(status=StockReservation.COMMITTED)
+    if product_ids is not None:
+        refs = rows.filter(product_id__in=product_ids).values("reference")
+        rows = rows.filter(reference__in=refs)
+    baskets = defaultdict(set)
+    for ref, pid in rows.values_list("reference", "product_id").iterator(chunk_size=5000):
+        baskets[ref].add(pid)
+    out = defaultdict(Counter)
+    for items in baskets.values():
+        if len(items) < 2 or len(items) > MAX_BASKET:
+            continue
+        for pid in items:
+            if product_ids is None or pid in product_ids:
+                out[pid].update(items - {pid})
+    return out
+
+
+def top_related(corpus: Corpus, pid: int, co: Counter = None, top_k: int = DEFAULT_TOP_K) -> list:
+    """``[(related_id, score), ...]`` de mayor a menor."""
+    i = corpus.pos[pid]
+    scores = corpus.similarities(i)
+    if co:
+        pos = [(corpus.pos[o], c) for o, c in co.items() if o in corpus.pos]
+        if pos:
+            idx, counts = map(np.asarray, zip(*pos))
+            scores = scores * (1 - CO_WEIGHT)
+            scores[idx] += CO_WEIGHT * counts / counts.max()
+    candidates = np.flatnonzero(scores >= MIN_SCORE)
+    if len(candidates) > top_k:
+        candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+    # desempate estable por id para que corridas iguales den filas iguales
+    best = sorted(candidates.tolist(), key=lambda j: (-scores[j], corpus.ids[j]))
+    return [(corpus.ids[j], float(scores[j])) for j in best]
+
+
+def _dirty_since(last_run, chunk_size: int = 500) -> set:
+    changed = Product.objects.filter(activo=True, actualizado_en__gt=last_run).values_list("id", flat=True)
+    bought = StockReservation.objects.filter(creado_en__gt=last_run).values_list("product_id", flat=True)
+    dirty = set(changed) | set(bought)
+    # los que listaban a un producto que cambió (su puntaje ya no es el mismo)
+    ids = sorted(dirty)
+    listing = set()
+    for start in range(0, len(ids), chunk_size):
+        listing.update(
+            RelatedProduct.objects.filter(related_id__in=ids[start:start + chunk_size]).values_list("product_id", flat=True)
+        )
+    return dirty | listing
+
+
+def _write(results: dict, computed_at) -> None:
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product_id__in=list(results)).delete()
+        RelatedProduct.objects.bulk_create(
+            [
+                RelatedProduct(product_id=pid, related_id=rid, rank=rank, score=score, computed_at=computed_at)
+                for pid, related in results.items()
+                for rank, (rid, score) in enumerate(related, 1)
+            ],
+            batch_size=1000,
+        )
+
+
+def build(full: bool = False, top_k: int = DEFAULT_TOP_K, chunk_size: int = 500) -> int:
+    """Recalcula los relacionados (todos o sólo lo que cambió). Devuelve cuántos productos tocó."""
+    started = timezone.now()
+    last_run = None if full else RelatedProduct.objects.aggregate(t=Max("computed_at"))["t"]
+    corpus = load_corpus()
+    if last_run is None:
+        pending = set(corpus.ids)
+        RelatedProduct.objects.filter(product__activo=False).delete()
+    else:
+        pending = _dirty_since(last_run) & set(corpus.pos)
+
+    # corrida completa: todas las canastas en una pasada; incremental: sólo las de cada lote
+    co_all = cooccurrence() if last_run is None else None
+    done, neighbors = set(), set()
+    for expand in (True, False):
+        todo = sorted(pending - done)
+        for start in range(0, len(todo), chunk_size):
+            chunk = todo[start:start + chunk_size]
+            co = co_all if co_all is not None else cooccurrence(set(chunk))
+            results = {pid: top_related(corpus, pid, co.get(pid), top_k) for pid in chunk}
+            _write(results, started)
+            if expand and last_run is not None:
+                # sus nuevos vecinos probablemente también los tengan en su top-K
+                neighbors.update(rid for related in results.values() for rid, _ in related)
+        done.update(todo)
+        pending = neighbors
+
+    if done:
+        bump_catalog_version()
+    return len(done)
+
+
+def related_products(pk: int, limit: int = DEFAULT_TOP_K):
+    """Relacionados activos de ``pk``, en orden: una consulta por el índice (product, rank)."""
+    return Product.objects.filter(activo=True, related_of__product_id=pk).order_by("related_of__rank")[:limit]
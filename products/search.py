@@ -0,0 +1,198 @@
+# products/search.py
+"""
+Índice de búsqueda full-text del catálogo.
+
+- SQLite: tabla virtual FTS5 ``products_search`` (rowid = Product.id).
+- PostgreSQL: tabla ``products_search`` con un ``tsvector`` + índice GIN.
+- Otros motores: cae al ``icontains`` de siempre.
+
+Los términos se normalizan en Python (minúsculas, sin acentos y stemming
+liviano en castellano) tanto al indexar como al consultar, así "zapatilla"
+encuentra "Zapatillas" y "pantalon" encuentra "Pantalón" en los dos motores.
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+TABLE = "products_search"
+
+# Peso del nombre frente a la descripción al rankear.
+NAME_WEIGHT = 10.0
+DESC_WEIGHT = 1.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_VOWELS = "aeiou"
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos ("Pantalón" -> "pantalon")."""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _stem(word: str) -> str:
+    """
+    Stemming mínimo para castellano: saca el plural y la vocal final de género
+    ("zapatillas" -> "zapatill", "pantalones" -> "pantalon", "negra" -> "negr").
+    """
+    if len(word) > 4 and word.endswith("es") and word[-3] not in _VOWELS:
+        word = word[:-2]
+    elif len(word) > 4 and word.endswith("s"):
+        word = word[:-1]
+    if len(word) > 4 and word[-1] in "aoe":
+        word = word[:-1]
+    return word
+
+
+def normalize_terms(text: str) -> list:
+    return [_stem(w) for w in _WORD_RE.findall(fold(text))]
+
+
+def _doc(text: str) -> str:
+    return " ".join(normalize_terms(text))
+
+
+# Backend ---------------------------------------------------------------------
+
+def is_supported(connection) -> bool:
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def create_index(connection) -> None:
+    with connection.cursor() as cur:
+        if connection.vendor == "sqlite":
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+                f"USING fts5(nombre, descripcion, tokenize='unicode61')"
+            )
+        elif connection.vendor == "postgresql":
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                f" product_id bigint PRIMARY KEY REFERENCES products_product(id) ON DELETE CASCADE,"
+                f" document tsvector NOT NULL)"
+            )
+            cur.execute(
+                f"CREATE INDEX IF NOT EXISTS {TABLE}_document_gin ON {TABLE} USING GIN (document)"
+            )
+
+
+def drop_index(connection) -> None:
+    if is_supported(connection):
+        with connection.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _upsert(cur, vendor: str, rows) -> None:
+    rows = [(pid, _doc(nombre), _doc(desc)) for pid, nombre, desc in rows]
+    if not rows:
+        return
+    if vendor == "sqlite":
+        cur.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+        cur.executemany(f"INSERT INTO {TABLE} (rowid, nombre, descripcion) VALUES (%s, %s, %s)", rows)
+    else:
+        cur.executemany(
+            f"INSERT INTO {TABLE} (product_id, document) VALUES "
+            f"(%s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B')) "
+            f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            rows,
+        )
+
+
+def index_products(products, using: str = "default") -> None:
+    """Indexa (o reindexa) los productos dados. Acepta instancias de Product."""
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cur:
+        _upsert(cur, connection.vendor, [(p.pk, p.nombre, p.descripcion) for p in products])
+
+
+def remove_products(ids, using: str = "default") -> None:
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    column = "rowid" if connection.vendor == "sqlite" else "product_id"
+    with connection.cursor() as cur:
+        cur.executemany(f"DELETE FROM {TABLE} WHERE {column} = %s", [(pk,) for pk in ids])
+
+
+def rebuild(connection, chunk_size: int = 2000) -> int:
+    """Reconstruye el índice completo leyendo products_product por lotes."""
+    if not is_supported(connection):
+        return 0
+    total = 0
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM {TABLE}")
+        last_id = 0
+        while True:
+            cur.execute(
+                "SELECT id, nombre, descripcion FROM products_product WHERE id > %s ORDER BY id LIMIT %s",
+                [last_id, chunk_size],
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            _upsert(cur, connection.vendor, rows)
+            total += len(rows)
+            last_id = rows[-1][0]
+    return total
+
+
+# Consultas -------------------------------------------------------------------
+
+def _match_expr(vendor: str, terms) -> str:
+    if vendor == "sqlite":
+        return " ".join(f'"{t}"*' for t in terms)
+    return " & ".join(f"{t}:*" for t in terms)
+
+
+def search_queryset(qs, q: str, rank: bool = False):
+    """
+    Filtra ``qs`` por la búsqueda ``q`` usando el índice full-text.
+    Con ``rank=True`` anota ``search_rank`` (menor = más relevante) para
+    ordenar por relevancia con ``order_by("search_rank", ...)``.
+    """
+    terms = normalize_terms(q)
+    if not terms:
+        return qs.annotate(search_rank=RawSQL("0", ())) if rank else qs
+    connection = connections[qs.db]
+    table = qs.model._meta.db_table
+
+    if connection.vendor == "sqlite":
+        match = _match_expr("sqlite", terms)
+        qs = qs.filter(id__in=RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", (match,)))
+        if rank:
+            qs = qs.annotate(search_rank=RawSQL(
+                f"SELECT bm25({TABLE}, {NAME_WEIGHT}, {DESC_WEIGHT}) FROM {TABLE} "
+                f"WHERE {TABLE} MATCH %s AND rowid = {table}.id",
+                (match,),
+            ))
+        return qs
+
+    if connection.vendor == "postgresql":
+        match = _match_expr("postgresql", terms)
+        qs = qs.filter(id__in=RawSQL(
+            f"SELECT product_id FROM {TABLE} WHERE document @@ to_tsquery('simple', %s)", (match,)
+        ))
+        if rank:
+            qs = qs.annotate(search_rank=RawSQL(
+                f"SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {TABLE} "
+                f"WHERE product_id = {table}.id",
+                (match,),
+            ))
+        return qs
+
+    match = Q(nombre__icontains=q) | Q(descripcion__icontains=q)
+    if qs.model is Product:
+        qs = qs.filter(match)
+    else:
+        # ProductCard no tiene la descripción: se busca en Product por id
+        qs = qs.filter(id__in=Product.objects.filter(match).values("id"))
+    if rank:
+        qs = qs.annotate(search_rank=RawSQL("0", ()))
+    return qs
@@ -0,0 +1,144 @@
+# products/signals.py
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from . import autocomplete, cards, dashboard, images, search, typo
+from .cache import bump_catalog_version
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, using, raw=False, **kwargs):
+    # raw=True viene de loaddata: el índice se reconstruye aparte
+    if raw:
+        return
+    search.index_products([instance], using=using)
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or "nombre" in update_fields:
+        typo.index_products([instance], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, using, **kwargs):
+    search.remove_products([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version_on_change(sender, **kwargs):
+    bump_catalog_version()
+
+
+# El snapshot de autocompletado vive en el cache (fuera de la transacción):
+# sólo se publica si el cambio se confirma.
+def _autocomplete_fields(instance):
+    # __dict__ para no disparar consultas: si vino diferido no se sabe y se publica
+    values = instance.__dict__
+    return (values.get("nombre"), values.get("activo")) if "nombre" in values and "activo" in values else None
+
+
+@receiver(post_init, sender=Product)
+def remember_autocomplete_fields(sender, instance, **kwargs):
+    instance._autocomplete_original = _autocomplete_fields(instance)
+
+
+@receiver(post_save, sender=Product)
+def refresh_autocomplete_on_save(sender, instance, using, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not {"nombre", "activo"} & set(update_fields):
+        return
+    current = _autocomplete_fields(instance)
+    # guardados de stock/precio/imagen: el autocompletado no cambia
+    if not created and current is not None and current == instance._autocomplete_original:
+        return
+    instance._autocomplete_original = current
+    pid, nombre, activo = instance.pk, instance.nombre, instance.activo
+    transaction.on_commit(lambda: autocomplete.update_product(pid, nombre, activo), using=using)
+
+
+@receiver(post_delete, sender=Product)
+def refresh_autocomplete_on_delete(sender, instance, using, **kwargs):
+    pid = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_product(pid), using=using)
+
+
+# Derivados de la imagen: se recuerda el archivo con el que se cargó la instancia
+# y, si al guardar cambió, se invalidan los derivados y se programan los nuevos.
+def _imagen_name(instance) -> str:
+    # __dict__ para no disparar una consulta si el campo vino diferido (.only())
+    value = instance.__dict__.get("imagen")
+    return getattr(value, "name", value) or ""
+
+
+@receiver(post_init, sender=Product)
+def remember_imagen(sender, instance, **kwargs):
+    instance._imagen_original = _imagen_name(instance)
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    current = _imagen_name(instance)
+    if current == getattr(instance, "_imagen_original", ""):
+        return
+    instance._imagen_original = current
+    if instance.imagen_hash:
+        # hasta que estén los nuevos derivados se vuelve al original
+        instance.imagen_hash, instance.imagen_ancho = "", None
+        Product.objects.using(using).filter(pk=instance.pk).update(imagen_hash="", imagen_ancho=None)
+    if current:
+        pid = instance.pk
+        transaction.on_commit(lambda: images.schedule(pid), using=using)
+
+
+# Card del listado: va al final para copiar también lo que los receivers de
+# arriba hayan tocado con update() (p. ej. imagen_hash al cambiar la imagen).
+@receiver(post_save, sender=Product)
+def refresh_card_on_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    cards.refresh([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_card_on_delete(sender, instance, using, **kwargs):
+    cards.remove([instance.pk], using=using)
+
+
+# Resumen del panel del vendedor: se ajusta por diferencia entre cómo estaba el
+# producto al cargarse y cómo quedó (ver products/dashboard.py).
+@receiver(post_init, sender=Product)
+def remember_dashboard_snapshot(sender, instance, **kwargs):
+    instance._dashboard_snapshot = dashboard.snapshot(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_seller_summary_on_save(sender, instance, using, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    snap = dashboard.snapshot(instance)
+    new = dashboard.contribution(snap)
+    old = (new[0], {}) if created and new else dashboard.contribution(getattr(instance, "_dashboard_snapshot", None))
+    dashboard.apply_change(old, new, using=using)
+    instance._dashboard_snapshot = snap
+
+
+@receiver(post_delete, sender=Product)
+def update_seller_summary_on_delete(sender, instance, using, **kwargs):
+    old = dashboard.contribution(dashboard.snapshot(instance))
+    dashboard.apply_change(old, (old[0], {}) if old else None, using=using)
+
+
+@receiver(post_save, sender="foro.Comentario")
+def count_comment_on_save(sender, instance, using, created=False, raw=False, **kwargs):
+    if created and not raw:
+        dashboard.comment_changed(instance.producto_id, 1, using=using)
+
+
+@receiver(post_delete, sender="foro.Comentario")
+def count_comment_on_delete(sender, instance, using, **kwargs):
+    dashboard.comment_changed(instance.producto_id, -1, using=using)
@@ -0,0 +1,41 @@
+from django import template
+from django.urls import reverse
+
+from products import image_proxy, images
+
+register = template.Library()
+
+# ancho con el que se muestra la imagen en cada lugar (atributo sizes del <img>)
+SIZES = {
+    "card": "(max-width: 640px) 50vw, 320px",
+    "detail": "(max-width: 600px) 100vw, 560px",
+}
+
+
+@register.inclusion_tag("products/_picture.html")
+def product_picture(p, kind="card"):
+    """
+    ``<picture>`` con WebP/JPEG en los anchos de ``kind`` si ya existen los
+    derivados; si no, el ``<img>`` de siempre con el original.
+    """
+    storage = p.imagen.storage
+    srcsets = images.srcsets(p.imagen_hash, p.imagen_ancho, storage.url, kind)
+    if srcsets:
+        # el JPEG más grande del tamaño pedido, para navegadores sin srcset
+        largest = images.widths_for(p.imagen_ancho, kind)[-1]
+        fallback = storage.url(images.variant_name(p.imagen_hash, largest, "jpeg"))
+    else:
+        fallback = p.imagen.url
+    return {"p": p, "kind": kind, "srcsets": srcsets, "fallback": fallback, "sizes": SIZES.get(kind, "100vw")}
+
+
+@register.simple_tag
+def proxied_image_url(p):
+    """
+    URL versionada del proxy para la ``image_url`` de ``p``, o "" si el proxy
+    está apagado (el template sigue enlazando directo al host remoto).
+    """
+    if not p.image_url or not image_proxy.enabled():
+        return ""
+    version = image_proxy.cache_key(image_proxy.normalize(p.image_url))[:12]
+    return f"{reverse('product-image', args=[p.pk])}?v={version}"
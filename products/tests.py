@@ -1,3 +1,1099 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .cache import get_catalog_version
+from . import autocomplete, bulk_edit, cards, dashboard, export, images, inventory, related, typo
+from .facets import catalog_price_bounds
+from .filters import ORDERINGS, parse_filters, filter_products
+from .models import Product, ProductCard, RelatedProduct, RemoteImage, StockReservation
+from .search import normalize_terms, search_queryset
+from .typo import did_you_mean
+from .api.serializers import ProductSerializer, ProductReadSerializer
+
+
+def _product(nombre, precio="1000", **kw):
+    kw.setdefault("descripcion", "")
+    return Product.objects.create(nombre=nombre, precio=Decimal(precio), **kw)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.zapas = _product("Zapatillas Urban Negras", stock=3)
+        self.pantalon = _product("Pantalón Slim", descripcion="Combina con zapatillas blancas")
+        self.remera = _product("Remera Básica")
+
+    def _ids(self, q, rank=False):
+        qs = search_queryset(Product.objects.all(), q, rank=rank)
+        if rank:
+            qs = qs.order_by("search_rank", "-creado_en")
+        return [p.id for p in qs]
+
+    def test_normalize_folds_accents_and_plurals(self):
+        self.assertEqual(normalize_terms("Pantalón"), normalize_terms("pantalones"))
+        self.assertEqual(normalize_terms("Zapatillas"), normalize_terms("zapatilla"))
+
+    def test_query_without_terms_is_ignored(self):
+        self.assertEqual(len(self._ids("!!", rank=True)), 3)
+        for url, q in (("/api/products/", "!!"), ("/products/", "-"), ("/api/products/", "?")):
+            with self.subTest(url=url, q=q):
+                self.assertEqual(self.client.get(url, {"q": q}).status_code, 200)
+        self.assertEqual(self.client.get("/api/products/", {"q": "!!"}).json()["count"], 3)
+
+    def test_stemming_and_accents_match(self):
+        self.assertIn(self.zapas.id, self._ids("zapatilla"))
+        self.assertEqual(self._ids("pantalon"), [self.pantalon.id])
+        self.assertEqual(self._ids("BASICA"), [self.remera.id])
+
+    def test_name_matches_rank_before_description(self):
+        self.assertEqual(self._ids("zapatillas", rank=True), [self.zapas.id, self.pantalon.id])
+
+    def test_index_follows_save_and_delete(self):
+        self.remera.nombre = "Campera Oversize"
+        self.remera.save()
+        self.assertEqual(self._ids("remera"), [])
+        self.assertEqual(self._ids("camperas"), [self.remera.id])
+        self.remera.delete()
+        self.assertEqual(self._ids("campera"), [])
+
+    def test_api_and_html_use_index(self):
+        r = self.client.get("/api/products/", {"q": "zapatilla"})
+        self.assertEqual([p["id"] for p in r.json()["results"]], [self.zapas.id, self.pantalon.id])
+        r = self.client.get("/products/", {"q": "zapatilla"})
+        self.assertEqual([p.id for p in r.context["page_obj"]], [self.zapas.id, self.pantalon.id])
+
+
+class CatalogIndexPlanTests(TestCase):
+    """
+    Cada combinación orden/filtro del catálogo tiene que resolverse con un
+    índice: falla si el plan cae en un full scan de products_product.
+    """
+
+    FILTERS = [
+        {},
+        {"in_stock": "true"},
+        {"in_stock": "false"},
+        {"min_price": "100", "max_price": "5000"},
+        {"in_stock": "true", "min_price": "100"},
+    ]
+
+    def setUp(self):
+        for i in range(30):
+            _product(f"Producto {i}", precio=str(100 * i), stock=i % 3)
+
+    def _full_scans(self, plan):
+        if connection.vendor == "sqlite":
+            return [l for l in plan.splitlines()
+                    if "SCAN products_product" in l and "USING" not in l]
+        return [l for l in plan.splitlines() if "Seq Scan on products_product" in l]
+
+    def test_every_listing_shape_uses_an_index(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cur:
+                cur.execute("SET enable_seqscan = off")
+        for order in ORDERINGS:
+            for params in self.FILTERS:
+                with self.subTest(order=order, **params):
+                    qs = filter_products(Product.objects.filter(activo=True), parse_filters({"order": order, **params}))
+                    plan = qs.explain()
+                    self.assertEqual(self._full_scans(plan), [], plan)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # precios repetidos para forzar el desempate por creado_en/id
+        self.products = [_product(f"P{i:02d}", precio=str(100 * (i % 4)), stock=1) for i in range(25)]
+
+    def _walk_api(self, **params):
+        seen, url, params = [], "/api/products/", {"cursor": "", "page_size": 7, **params}
+        while url:
+            r = self.client.get(url, params)
+            self.assertEqual(r.status_code, 200)
+            body = r.json()
+            self.assertNotIn("count", body)
+            seen += [p["id"] for p in body["results"]]
+            url, params = body["next"], {}
+        return seen
+
+    def test_cursor_walk_matches_page_ordering_for_every_order(self):
+        for order in ORDERINGS:
+            with self.subTest(order=order):
+                expected = [p.id for p in filter_products(Product.objects.filter(activo=True), parse_filters({"order": order}))]
+                self.assertEqual(self._walk_api(order=order), expected)
+
+    def test_cursor_mode_does_not_count(self):
+        with self.assertNumQueries(2):  # página de cards + descripciones por pk
+            self.client.get("/api/products/", {"cursor": "", "order": "price_asc"})
+
+    def test_invalid_cursor(self):
+        r = self.client.get("/api/products/", {"cursor": "nope"})
+        self.assertEqual(r.status_code, 404)
+        token = self.client.get("/api/products/", {"cursor": "", "order": "name"}).json()["next"].split("cursor=")[1]
+        r = self.client.get("/api/products/", {"cursor": token, "order": "price_asc"})
+        self.assertEqual(r.status_code, 404)
+
+    def test_tampered_search_rank_in_cursor(self):
+        for i in range(3):
+            _product(f"Gorra {i}", stock=1)
+        token = self.client.get("/api/products/", {"cursor": "", "q": "gorra", "page_size": 1}).json()["next"]
+        token = token.split("cursor=")[1].split("&")[0]
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        rank = [o.lstrip("-") for o in payload["o"]].index("search_rank")
+        for bad in ("x", None):
+            with self.subTest(rank=bad):
+                payload["v"][rank] = bad
+                tampered = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+                r = self.client.get("/api/products/", {"cursor": tampered, "q": "gorra", "page_size": 1})
+                self.assertEqual(r.status_code, 404)
+                r = self.client.get("/products/", {"cursor": tampered, "q": "gorra"})
+                self.assertEqual(r.status_code, 200)  # vuelve a la primera página
+                self.assertEqual(len(r.context["page_obj"]), 3)
+
+    def test_html_infinite_scroll_pages(self):
+        r = self.client.get("/products/", {"cursor": "", "order": "oldest"})
+        self.assertTrue(r.context["cursor_mode"])
+        first = [p.id for p in r.context["page_obj"]]
+        r = self.client.get("/products/" + r.context["next_url"])
+        second = [p.id for p in r.context["page_obj"]]
+        self.assertEqual(first + second, [p.id for p in self.products[:24]])
+
+
+class ListingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.p = _product("Mochila Urban", stock=2)
+
+    def test_anonymous_listing_is_served_from_cache(self):
+        for url in ("/products/", "/api/products/"):
+            with self.subTest(url=url):
+                first = self.client.get(url, {"q": "mochila", "order": "name"})
+                with self.assertNumQueries(0):
+                    second = self.client.get(url, {"order": "name", "q": " mochila "})
+                self.assertEqual(first.content, second.content)
+
+    def test_drf_search_and_ordering_are_part_of_the_key(self):
+        _product("Zapatilla", stock=1)
+        self.assertEqual(self.client.get("/api/products/", {"search": "nadacoincide"}).json()["count"], 0)
+        self.assertEqual(self.client.get("/api/products/").json()["count"], 2)
+        names = [p["nombre"] for p in self.client.get("/api/products/", {"ordering": "nombre"}).json()["results"]]
+        self.assertEqual(names, ["Mochila Urban", "Zapatilla"])
+        names = [p["nombre"] for p in self.client.get("/api/products/", {"ordering": "-nombre"}).json()["results"]]
+        self.assertEqual(names, ["Zapatilla", "Mochila Urban"])
+
+    def test_product_change_bumps_version(self):
+        version = get_catalog_version()
+        self.client.get("/api/products/")
+        self.p.nombre = "Mochila Premium"
+        self.p.save()
+        self.assertGreater(get_catalog_version(), version)
+        r = self.client.get("/api/products/")
+        self.assertEqual(r.json()["results"][0]["nombre"], "Mochila Premium")
+        self.p.delete()
+        self.assertEqual(self.client.get("/api/products/").json()["results"], [])
+
+    def test_authenticated_users_bypass_cache(self):
+        user = get_user_model().objects.create_user("vendedor", password="x")
+        self.client.force_login(user)
+        self.client.get("/products/")
+        self.assertEqual(self.client.get("/products/").context["page_obj"][0].id, self.p.id)
+
+
+class FacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _product("Zapatilla Urban", precio="100", stock=0)
+        _product("Zapatilla Running", precio="500", stock=4)
+        _product("Zapatilla Trail", precio="1000", stock=1)
+        _product("Remera Básica", precio="300", stock=9)
+
+    def test_counts_histogram_and_bounds_in_one_query(self):
+        catalog_price_bounds(Product.objects.filter(activo=True))  # bordes ya cacheados
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/products/facets/", {"q": "zapatillas", "buckets": 3}).json()
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(data["stock"], {"in_stock": 2, "out_of_stock": 1})
+        self.assertEqual((data["price"]["min"], data["price"]["max"]), (100, 1000))
+        self.assertEqual([b["count"] for b in data["histogram"]], [1, 1, 1])
+
+    def test_each_facet_ignores_its_own_filter(self):
+        data = self.client.get("/api/products/facets/", {"in_stock": "true", "max_price": "600"}).json()
+        self.assertEqual(data["count"], 2)
+        # conteos de stock: respetan el precio, no in_stock
+        self.assertEqual(data["stock"], {"in_stock": 2, "out_of_stock": 1})
+        # histograma/rango: respetan in_stock, no el precio
+        self.assertEqual(data["price"]["max"], 1000)
+        self.assertEqual(sum(b["count"] for b in data["histogram"]), 3)
+
+    def test_response_is_cached_per_query(self):
+        self.client.get("/api/products/facets/", {"q": "remera"})
+        with self.assertNumQueries(0):
+            self.client.get("/api/products/facets/", {"q": "remera"})
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zapas = _product("Zapatilla Urban Negra")
+            self.zapato = _product("Zapato Clásico")
+            self.campera = _product("Campera Ártica", activo=False)
+
+    def _names(self, q):
+        return [s["nombre"] for s in autocomplete.suggest(q)]
+
+    def test_prefix_on_name_and_words_with_accent_folding(self):
+        self.assertEqual(self._names("zapa"), ["Zapatilla Urban Negra", "Zapato Clásico"])
+        self.assertEqual(self._names("CLAS"), ["Zapato Clásico"])
+        self.assertEqual(self._names("urban ne"), ["Zapatilla Urban Negra"])
+        self.assertEqual(self._names("artica"), [])  # inactivo
+
+    def test_incremental_updates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zapato.nombre = "Mocasín Clásico"
+            self.zapato.save()
+            self.campera.activo = True
+            self.campera.save()
+            self.zapas.delete()
+        self.assertEqual(self._names("zapa"), [])
+        self.assertEqual(self._names("moca"), ["Mocasín Clásico"])
+        self.assertEqual(self._names("art"), ["Campera Ártica"])
+
+    def test_other_workers_reload_published_snapshot(self):
+        self._names("zapa")  # el primer worker publica la base
+        autocomplete._forget_local()
+        with self.assertNumQueries(0):
+            r = self.client.get("/api/products/autocomplete/", {"q": "zapat", "limit": 1})
+        self.assertEqual(r.json(), [{"id": self.zapas.id, "nombre": "Zapatilla Urban Negra"}])
+
+    def test_cold_cache_rebuilds_from_db(self):
+        cache.clear()
+        self.assertEqual(self._names("zapato"), ["Zapato Clásico"])
+
+    def test_saves_publish_small_deltas_and_skip_unrelated_fields(self):
+        self._names("zapa")
+        seq = cache.get(autocomplete.SEQ_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zapas.stock = 9
+            self.zapas.save()
+        self.assertEqual(cache.get(autocomplete.SEQ_KEY), seq)  # sólo stock: nada que publicar
+
+        # dos "workers" publican a la vez sin pisarse: cada uno es un delta
+        autocomplete.update_product(self.zapato.pk, "Zapato Oxford")
+        autocomplete.update_product(self.campera.pk, "Campera Ártica")
+        self.assertEqual(cache.get(autocomplete.SEQ_KEY), seq + 2)
+        self.assertEqual(self._names("oxf"), ["Zapato Oxford"])
+        self.assertEqual(self._names("art"), ["Campera Ártica"])
+        autocomplete._forget_local()
+        self.assertEqual(self._names("oxf"), ["Zapato Oxford"])  # base + deltas
+
+    def test_compaction_publishes_a_new_base(self):
+        self._names("zapa")
+        with mock.patch.object(autocomplete, "COMPACT_EVERY", 3):
+            for i in range(3):
+                autocomplete.update_product(self.zapato.pk, f"Zapato {i}")
+            self.assertEqual(self._names("zapato"), ["Zapato 2"])
+        base_seq, _ = cache.get(autocomplete.BASE_KEY)
+        self.assertEqual(base_seq, cache.get(autocomplete.SEQ_KEY))
+        self.assertIsNone(cache.get(autocomplete._delta_key(base_seq)))
+        autocomplete._forget_local()
+        self.assertEqual(self._names("zapato"), ["Zapato 2"])
+
+    def test_missing_delta_falls_back_to_the_database(self):
+        self._names("zapa")
+        autocomplete.update_product(self.zapato.pk, "Zapato Oxford")
+        cache.delete(autocomplete._delta_key(cache.get(autocomplete.SEQ_KEY)))  # desalojado
+        with mock.patch.object(autocomplete, "GAP_GRACE", 0):
+            self._names("zapa")
+            self.assertEqual(self._names("zapato"), ["Zapato Clásico"])  # lo que dice la base de datos
+
+
+class TypoFallbackTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.zapas = _product("Zapatilla Urban Negra")
+        _product("Campera Oversize")
+
+    def test_trigrams_follow_product_changes(self):
+        self.assertIn("zap", set(self.zapas.trigrams.values_list("trigram", flat=True)))
+        self.zapas.nombre = "Mochila"
+        self.zapas.save()
+        self.assertNotIn("zap", set(self.zapas.trigrams.values_list("trigram", flat=True)))
+
+    def test_did_you_mean(self):
+        self.assertEqual(did_you_mean("zapatila"), "zapatilla")
+        self.assertEqual(did_you_mean("campra oversise"), "campera oversize")
+        self.assertIsNone(did_you_mean("heladera"))
+        self.assertEqual(did_you_mean("zpatilla"), "zapatilla")
+        self.assertIsNone(did_you_mean("zapatila", budget_ms=0))
+
+    def test_candidate_query_is_cut_at_the_deadline(self):
+        # el presupuesto se hace cumplir dentro de la consulta, no recién al terminarla
+        # el deadline y el tiempo restante en 0; el reloj se pasa sólo mientras corre la
+        # consulta y después vuelve: si no se cortara en la base, habría sugerencia
+        ticks = iter([0.0, 0.0, 10.0])
+        with mock.patch.object(typo, "SQLITE_PROGRESS_STEPS", 1), \
+                mock.patch.object(typo.time, "monotonic", lambda: next(ticks, 0.0)):
+            self.assertIsNone(did_you_mean("zapatila", budget_ms=50))
+        self.assertEqual(did_you_mean("zapatila"), "zapatilla")  # el handler no queda puesto
+
+    def test_long_queries_use_a_bounded_number_of_trigrams(self):
+        words = " ".join(f"palabra{i}" for i in range(30))
+        self.assertEqual(len(typo._query_trigrams(words.split())), typo.MAX_QUERY_TRIGRAMS)
+        self.assertEqual(set(typo._query_trigrams(["zapatila"])), typo.trigrams("zapatila"))
+
+    def test_api_and_html_fall_back_only_on_zero_results(self):
+        data = self.client.get("/api/products/", {"q": "zpatilla"}).json()
+        self.assertEqual(data["did_you_mean"], "zapatilla")
+        self.assertEqual([p["id"] for p in data["results"]], [self.zapas.id])
+        self.assertNotIn("did_you_mean", self.client.get("/api/products/", {"q": "zapatilla"}).json())
+
+        r = self.client.get("/products/", {"q": "zpatilla"})
+        self.assertEqual(r.context["did_you_mean"], "zapatilla")
+        self.assertEqual([p.id for p in r.context["page_obj"]], [self.zapas.id])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.p = _product("Gorra Gaon", stock=5)
+
+    def test_detail_answers_304_without_rendering(self):
+        for url in (f"/api/products/{self.p.id}/", f"/products/{self.p.id}/"):
+            with self.subTest(url=url):
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                self.assertFalse(r["ETag"].startswith("W/"))
+                self.assertIn("Last-Modified", r)
+                with self.assertNumQueries(1):
+                    again = self.client.get(url, HTTP_IF_NONE_MATCH=r["ETag"])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b"")
+
+    def test_etag_changes_with_product(self):
+        etag = self.client.get(f"/api/products/{self.p.id}/")["ETag"]
+        self.p.stock = 4
+        self.p.save()
+        r = self.client.get(f"/api/products/{self.p.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertEqual(r.json()["stock"], 4)
+
+    def test_detail_with_invalid_id_is_404(self):
+        for pk in ("abc", "1.5", str(10 ** 30)):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.get(f"/api/products/{pk}/").status_code, 404)
+
+    def test_list_etag(self):
+        r = self.client.get("/api/products/", {"order": "name"})
+        with self.assertNumQueries(0):
+            again = self.client.get("/api/products/", {"order": "name"}, HTTP_IF_NONE_MATCH=r["ETag"])
+        self.assertEqual(again.status_code, 304)
+        _product("Otra")
+        self.assertEqual(self.client.get("/api/products/", {"order": "name"}, HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 200)
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.a = _product("A", stock=1)
+        self.b = _product("B", stock=2)
+        self.c = _product("C", activo=False)
+
+    def test_get_preserves_order_and_reports_missing(self):
+        with self.assertNumQueries(1):
+            r = self.client.get("/api/products/batch/", {"ids": f"{self.b.id},999,{self.a.id},{self.b.id},{self.c.id}"})
+        data = r.json()
+        self.assertEqual([p["id"] for p in data["results"]], [self.b.id, self.a.id])
+        self.assertEqual(data["missing"], [999, self.c.id])
+        self.assertNotIn("imagen_url", data["results"][0])
+
+    def test_sparse_fields_and_post(self):
+        r = self.client.post(
+            "/api/products/batch/",
+            {"ids": [self.a.id, self.b.id], "fields": ["id", "stock", "imagen_url"]},
+            content_type="application/json",
+        )
+        self.assertEqual(r.json()["results"], [
+            {"id": self.a.id, "stock": 1, "imagen_url": None},
+            {"id": self.b.id, "stock": 2, "imagen_url": None},
+        ])
+
+    def test_validation(self):
+        r = self.client.get("/api/products/batch/", {"ids": f"{self.a.id}", "fields": "stock"})
+        self.assertEqual(r.json()["results"], [{"stock": 1}])
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": "1,x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": "99999999999999999999"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": str(2 ** 63 - 1)}).json()["missing"], [2 ** 63 - 1])
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": "1", "fields": "nope"}).status_code, 400)
+        too_many = ",".join(str(i) for i in range(600))
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": too_many}).status_code, 400)
+
+
+class ReadSerializerTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user("tienda", password="x")
+        _product("Con dueño", user=user, imagen="products/1/buzo-gaon.jpg", stock=2)
+        _product("Sin dueño", precio="1234.5")
+
+    def test_read_path_matches_model_serializer(self):
+        request = APIRequestFactory().get("/api/products/")
+        ctx = {"request": Request(request)}
+        qs = Product.objects.order_by("id")
+        fields = ProductReadSerializer.output_fields() + ["imagen_url"]
+        expected = ProductSerializer(qs.select_related("user"), many=True, fields=fields, context=ctx).data
+        got = ProductReadSerializer(ProductReadSerializer.rows(qs, fields), many=True, fields=fields, context=ctx).data
+        self.assertEqual(json.loads(json.dumps(got)), json.loads(json.dumps(expected)))
+        self.assertTrue(got[0]["imagen"].startswith("http://testserver/media/"))
+
+    def test_list_runs_one_query_with_user_join(self):
+        cache.clear()
+        with self.assertNumQueries(3):  # COUNT + página de cards + descripciones por pk
+            r = self.client.get("/api/products/", {"order": "oldest"})
+        self.assertEqual([p["user"] for p in r.json()["results"]], ["tienda", None])
+
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = get_user_model().objects.create_user("tienda", password="x")
+        self.p = _product("Mochila Urbana", "25000", user=self.owner, stock=2, descripcion="Impermeable, 20 litros")
+
+    def _card(self, pk):
+        return ProductCard.objects.filter(pk=pk).first()
+
+    def test_signals_keep_cards_in_sync(self):
+        card = self._card(self.p.pk)
+        self.assertEqual((card.nombre, card.precio, card.stock, card.user_id), ("Mochila Urbana", Decimal("25000"), 2, self.owner.pk))
+        self.assertEqual(card.creado_en, self.p.creado_en)
+
+        self.p.precio = Decimal("19999.90")
+        self.p.save()
+        self.assertEqual(self._card(self.p.pk).precio, Decimal("19999.90"))
+
+        self.p.activo = False
+        self.p.save()
+        self.assertIsNone(self._card(self.p.pk))
+        self.p.activo = True
+        self.p.save()
+        self.assertIsNotNone(self._card(self.p.pk))
+
+        self.p.delete()
+        self.assertFalse(ProductCard.objects.exists())
+
+    def test_bulk_paths_refresh_cards(self):
+        inventory.reserve("ref-1", [(self.p.pk, 2)])
+        self.assertEqual(self._card(self.p.pk).stock, 0)
+        inventory.release("ref-1")
+        self.assertEqual(self._card(self.p.pk).stock, 2)
+
+        from .importer import upsert_products
+        upsert_products([Product(id=self.p.pk, nombre="Mochila Urbana 2", precio=Decimal("1"), stock=9, user=self.owner)])
+        card = self._card(self.p.pk)
+        self.assertEqual((card.nombre, card.stock), ("Mochila Urbana 2", 9))
+        self.assertEqual(card.creado_en, self.p.creado_en)  # el upsert no pisa creado_en
+
+    def test_rebuild(self):
+        ProductCard.objects.all().delete()
+        _product("Inactivo", activo=False)
+        self.assertEqual(cards.rebuild(), 1)
+        self.assertEqual(list(ProductCard.objects.values_list("id", flat=True)), [self.p.pk])
+
+    def test_listings_read_cards_with_same_output(self):
+        r = self.client.get("/api/products/", {"q": "mochila"})
+        item = r.json()["results"][0]
+        self.assertEqual(item["descripcion"], "Impermeable, 20 litros")
+        self.assertEqual((item["id"], item["user"], item["activo"], item["precio"]), (self.p.pk, "tienda", True, "25000.00"))
+        self.assertEqual(set(item), set(ProductReadSerializer.output_fields()))
+
+        r = self.client.get("/products/", {"q": "mochila"})
+        self.assertIsInstance(r.context["page_obj"][0], ProductCard)
+        self.assertContains(r, "Mochila Urbana")
+
+
+class SellerDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user("tienda", password="x")
+        self.other = User.objects.create_user("cliente", password="x")
+        self.a = _product("Remera", "1000", user=self.owner, stock=10)
+        self.b = _product("Short", "2500.50", user=self.owner, stock=2)
+        self.c = _product("Gorra", "500", user=self.owner, stock=0)
+
+    def _comment(self, p):
+        from foro.models import Comentario
+        with self.captureOnCommitCallbacks(execute=True):
+            return Comentario.objects.create(producto=p, autor=self.other, texto="¿Hay talle M?")
+
+    def test_manage_list_annotates_in_one_query(self):
+        from foro.models import Post
+        self._comment(self.a)
+        self._comment(self.a)
+        Post.objects.create(titulo="Review", contenido="...", autor=self.other, producto=self.a)
+        self.client.force_login(self.owner)
+        self.client.get("/products/manage/mine/")  # calienta el resumen
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get("/products/manage/mine/")
+        # COUNT + página (con las subconsultas); nada por producto
+        catalog = [q["sql"] for q in ctx.captured_queries if "products_product" in q["sql"] or "foro_" in q["sql"]]
+        self.assertEqual(len(catalog), 2)
+        rows = {p.pk: (p.comentarios_count, p.posts_count, p.stock_alerta) for p in r.context["page_obj"]}
+        self.assertEqual(rows, {self.a.pk: (2, 1, ""), self.b.pk: (0, 0, "bajo"), self.c.pk: (0, 0, "agotado")})
+
+    def test_summary_is_cached_and_updated_incrementally(self):
+        summary = dashboard.seller_summary(self.owner.pk)
+        self.assertEqual(summary["stock_value"], Decimal("15001.00"))
+        self.assertEqual((summary["productos"], summary["low_stock"], summary["out_of_stock"]), (3, 1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.c.stock = 4
+            self.c.save()
+            self.b.activo = False
+            self.b.save()
+        self._comment(self.a)
+        with self.assertNumQueries(0):
+            summary = dashboard.seller_summary(self.owner.pk)
+        self.assertEqual(summary["stock_value"], Decimal("12000.00"))
+        self.assertEqual((summary["productos"], summary["low_stock"], summary["out_of_stock"], summary["comentarios"]), (2, 0, 0, 1))
+        self.assertEqual({k: summary[k] for k in dashboard.METRICS}, dashboard._compute(self.owner.pk))
+
+    def test_bulk_paths_invalidate_summary(self):
+        dashboard.seller_summary(self.owner.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve("ref-1", [(self.a.pk, 9)])
+        summary = dashboard.seller_summary(self.owner.pk)
+        self.assertEqual((summary["stock_value"], summary["low_stock"]), (Decimal("6001.00"), 2))
+
+
+class BulkUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner = User.objects.create_user("tienda", password="x")
+        self.other = User.objects.create_user("otra", password="x")
+        self.products = [_product(f"Producto {i}", "1000", user=self.owner, stock=5) for i in range(30)]
+        self.ajeno = _product("Ajeno", "10", user=self.other)
+        self.client.force_login(self.owner)
+
+    def _post(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/products/bulk-update/", {"items": items}, content_type="application/json")
+
+    def test_applies_patches_in_batches(self):
+        items = [{"id": p.pk, "precio_pct": "8.5"} for p in self.products]
+        items[0] = {"id": self.products[0].pk, "precio": "1500", "stock": 0, "activo": False}
+        version = get_catalog_version()
+        with mock.patch.object(bulk_edit, "BATCH_SIZE", 10), CaptureQueriesContext(connection) as ctx:
+            r = self._post(items)
+        self.assertEqual(r.status_code, 200, r.content)
+        sql = [q["sql"] for q in ctx.captured_queries]
+        # dueños en una consulta, 3 lotes de UPDATE y 3 de cards, sin importar las filas
+        self.assertEqual(sum(s.startswith('UPDATE "products_product"') for s in sql), 3)
+        self.assertEqual(sum(s.startswith('INSERT INTO "products_productcard"') for s in sql), 3)
+        self.assertEqual(sum(s.startswith('SELECT') and '"products_product"' in s.split("FROM")[1] for s in sql), 1 + 3 + 1)  # + autocompletado
+        self.assertEqual(r.json()["updated"], 30)
+        self.assertEqual(r.json()["results"][1], {"id": self.products[1].pk, "precio": "1085.00", "stock": 5, "activo": True})
+
+        first = Product.objects.get(pk=self.products[0].pk)
+        self.assertEqual((first.precio, first.stock, first.activo), (Decimal("1500"), 0, False))
+        self.assertFalse(ProductCard.objects.filter(pk=first.pk).exists())
+        self.assertEqual(ProductCard.objects.get(pk=self.products[2].pk).precio, Decimal("1085.00"))
+        self.assertEqual(get_catalog_version(), version + 1)  # una sola vez
+        self.assertNotIn(first.pk, [s["id"] for s in autocomplete.suggest("producto", 50)])
+
+    def test_all_or_nothing(self):
+        r = self._post([{"id": self.products[0].pk, "precio": "1"}, {"id": self.ajeno.pk, "stock": 1}])
+        self.assertEqual(r.status_code, 403)
+        self.assertEqual(r.json()["forbidden"], [self.ajeno.pk])
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).precio, Decimal("1000"))
+
+        r = self._post([{"id": self.products[0].pk, "precio": "1", "precio_pct": 3}, {"id": 999999, "stock": -1}, {"id": "x"}])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.json()["errors"]), {"0", "1", "2"})
+
+        r = self._post([{"id": self.products[0].pk, "stock": 1}, {"id": 999999, "stock": 1}])
+        self.assertEqual((r.status_code, r.json()["missing"]), (400, [999999]))
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 5)
+
+
+class ImportProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _file(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        return path
+
+    def _import(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_products", *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_validates_rows_and_indexes_batches(self):
+        path = self._file("catalogo.csv", (
+            "nombre,precio,stock,activo\n"
+            "Zapatilla Runner,15000,3,si\n"
+            ",1000,1,si\n"
+            "Campera Inflable,abc,1,si\n"
+            "Gorra Trucker,4500.50,0,no\n"
+        ))
+        version = get_catalog_version()
+        out, err = self._import(path, "--batch-size", "2")
+
+        self.assertIn("2 filas importadas, 2 con errores", out)
+        self.assertIn("Fila 2: nombre", err)
+        self.assertIn("Fila 3: precio", err)
+        gorra = Product.objects.get(nombre="Gorra Trucker")
+        self.assertEqual(gorra.precio, Decimal("4500.50"))
+        self.assertFalse(gorra.activo)
+        # sin señales: el importador reindexa y publica por su cuenta
+        self.assertEqual(list(search_queryset(Product.objects.all(), "runner")), [Product.objects.get(nombre="Zapatilla Runner")])
+        self.assertEqual(did_you_mean("zapatila runer"), "zapatilla runner")
+        self.assertEqual([s["nombre"] for s in autocomplete.suggest("zapa")], ["Zapatilla Runner"])
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_ndjson_upserts_by_id(self):
+        owner = get_user_model().objects.create(username="prov")
+        existing = _product("Remera Vieja", precio="100", user=owner)
+        path = self._file("catalogo.ndjson", "\n".join([
+            json.dumps({"id": existing.pk, "nombre": "Remera Nueva", "precio": "250", "stock": 9}),
+            json.dumps({"nombre": "Short Playero", "precio": 3000}),
+            "",
+        ]))
+        self._import(path)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.nombre, existing.precio, existing.stock), ("Remera Nueva", Decimal("250"), 9))
+        self.assertEqual(existing.user, owner)  # el upsert no pisa al dueño
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_dry_run_writes_nothing(self):
+        path = self._file("catalogo.csv", "nombre,precio\nBufanda,100\n")
+        out, _ = self._import(path, "--dry-run")
+        self.assertIn("1 filas validadas", out)
+        self.assertFalse(Product.objects.exists())
+
+    def test_aborts_after_max_errors(self):
+        path = self._file("catalogo.csv", "nombre,precio\n,1\n,2\nBufanda,100\n")
+        with self.assertRaises(CommandError):
+            self._import(path, "--max-errors", "1")
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="staff")
+        self.client.force_login(self.user)
+        _product("Zapatilla Runner", precio="15000", stock=3, user=self.user)
+        _product("Zapatilla Urbana", precio="9000", stock=0)
+        _product("Remera Básica", precio="5000", stock=2)
+        _product("Oculto", activo=False)
+
+    def _get(self, **params):
+        resp = self.client.get("/api/products/export/", params)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        return b"".join(resp.streaming_content).decode()
+
+    def test_csv_honors_listing_filters(self):
+        body = self._get(format="csv", q="zapatilla", in_stock="true")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([r["nombre"] for r in rows], ["Zapatilla Runner"])
+        self.assertEqual((rows[0]["precio"], rows[0]["user"]), ("15000.00", "staff"))
+
+    def test_ndjson_streams_in_chunks(self):
+        with mock.patch.object(export, "DEFAULT_CHUNK_SIZE", 2):
+            resp = self.client.get("/api/products/export/", {"format": "ndjson", "order": "price_asc"})
+            chunks = list(resp.streaming_content)
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual([r["nombre"] for r in rows], ["Remera Básica", "Zapatilla Urbana", "Zapatilla Runner"])
+
+    def test_export_round_trips_through_import(self):
+        body = self._get(format="csv")
+        Product.objects.update(precio=Decimal("1"))
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as fh:
+            fh.write(body)
+        self.addCleanup(os.remove, fh.name)
+        call_command("import_products", fh.name, stdout=io.StringIO())
+        self.assertEqual(Product.objects.get(nombre="Zapatilla Runner").precio, Decimal("15000"))
+
+    def test_requires_login(self):
+        self.client.logout()
+        resp = self.client.get("/api/products/export/", {"format": "csv"})
+        self.assertIn(resp.status_code, (401, 403))
+
+
+def _png(size=(1000, 500), color="red"):
+    buf = io.BytesIO()
+    Image.new("RGBA", size, color).save(buf, "PNG")
+    return SimpleUploadedFile("foto.png", buf.getvalue(), content_type="image/png")
+
+
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media = tmp.name
+        overrides = self.settings(MEDIA_ROOT=tmp.name, IMAGE_VARIANTS_ASYNC=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _derived_files(self):
+        root = os.path.join(self.media, images.DERIVED_DIR)
+        return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, fs in os.walk(root) for f in fs)
+
+    def test_falls_back_to_original_until_variants_exist(self):
+        p = _product("Campera", imagen=_png())
+        self.assertEqual(p.imagen_hash, "")
+        html = self.client.get(f"/products/{p.pk}/").content.decode()
+        self.assertIn(f'src="{p.imagen.url}"', html)
+        self.assertNotIn("<picture>", html)
+
+    def test_builds_webp_and_jpeg_by_content_hash(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            p = _product("Campera", imagen=_png())
+        p.refresh_from_db()
+        self.assertEqual(len(p.imagen_hash), 32)
+        self.assertEqual(p.imagen_ancho, 1000)
+        # nunca se agranda: 1600 queda en el ancho original
+        self.assertEqual(
+            [f.split("/")[-1] for f in self._derived_files()],
+            ["1000.jpeg", "1000.webp", "320.jpeg", "320.webp", "640.jpeg", "640.webp", "800.jpeg", "800.webp"],
+        )
+        with Image.open(os.path.join(self.media, images.variant_name(p.imagen_hash, 320, "webp"))) as im:
+            self.assertEqual((im.format, im.size), ("WEBP", (320, 160)))
+
+        # misma foto en otro producto: comparte derivados
+        with self.captureOnCommitCallbacks(execute=True):
+            otro = _product("Campera 2", imagen=_png())
+        otro.refresh_from_db()
+        self.assertEqual(otro.imagen_hash, p.imagen_hash)
+        self.assertEqual(len(self._derived_files()), 8)
+
+        html = self.client.get(f"/products/{p.pk}/").content.decode()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f"{images.variant_name(p.imagen_hash, 800, 'webp')} 800w", html)
+
+        data = self.client.get(f"/api/products/{p.pk}/").json()
+        self.assertIn(" 320w", data["imagen_srcset"]["jpeg"])
+        self.assertTrue(data["imagen_srcset"]["webp"].startswith("http://testserver/media/"))
+        listed = self.client.get("/api/products/").json()["results"]
+        self.assertEqual({r["id"]: r["imagen_srcset"] for r in listed}[p.pk], data["imagen_srcset"])
+
+    def test_new_image_resets_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            p = _product("Campera", imagen=_png())
+        p.refresh_from_db()
+        old_hash = p.imagen_hash
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            p.imagen = _png(color="blue")
+            p.save()
+        self.assertEqual(Product.objects.get(pk=p.pk).imagen_hash, "")
+        for callback in callbacks:
+            callback()
+        p.refresh_from_db()
+        self.assertNotIn(p.imagen_hash, ("", old_hash))
+
+
+class _StubImageHandler(BaseHTTPRequestHandler):
+    """Host remoto de mentira: /img.png, /slow.png (tarda) y /redirect (a /img.png)."""
+    hits = []
+
+    def do_GET(self):
+        type(self).hits.append(self.path)
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/img.png")
+            self.end_headers()
+            return
+        if self.path == "/slow.png":
+            time.sleep(0.5)
+        buf = io.BytesIO()
+        Image.new("RGB", (1200, 600), "orange").save(buf, "PNG")
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(buf.getvalue())))
+        self.end_headers()
+        self.wfile.write(buf.getvalue())
+
+    def log_message(self, *args):
+        pass
+
+
+class ImageProxyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubImageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        _StubImageHandler.hits = []
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overrides = self.settings(
+            MEDIA_ROOT=tmp.name,
+            IMAGE_PROXY_ENABLED=True,
+            IMAGE_PROXY_ALLOWED_HOSTS=["127.0.0.1"],
+            IMAGE_PROXY_HOST_TIMEOUTS={"127.0.0.1": 0.2},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _get(self, p, **extra):
+        return self.client.get(f"/products/{p.pk}/image/", **extra)
+
+    def test_fetches_once_and_serves_local_copy(self):
+        p = _product("Remera", image_url=f"{self.base}/img.png")
+        first = self._get(p)
+        self.assertEqual(first.status_code, 200)
+        with Image.open(io.BytesIO(b"".join(first.streaming_content))) as im:
+            self.assertEqual((im.format, im.size), ("JPEG", (640, 320)))
+
+        again = self._get(p, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(_StubImageHandler.hits, ["/img.png"])
+
+    def test_versioned_url_is_immutable(self):
+        p = _product("Remera", image_url=f"{self.base}/img.png")
+        html = self.client.get("/products/").content.decode()
+        src = re.search(rf'src="(/products/{p.pk}/image/\?v=\w+)"', html).group(1)
+        resp = self.client.get(src)
+        self.assertIn("immutable", resp["Cache-Control"])
+        self.assertNotIn("immutable", self._get(p)["Cache-Control"])
+
+    def test_follows_redirects(self):
+        p = _product("Remera", image_url=f"{self.base}/redirect")
+        self.assertEqual(self._get(p).status_code, 200)
+        self.assertEqual(_StubImageHandler.hits, ["/redirect", "/img.png"])
+
+    def test_timeout_falls_back_to_original(self):
+        p = _product("Remera", image_url=f"{self.base}/slow.png")
+        resp = self._get(p)
+        self.assertRedirects(resp, f"{self.base}/slow.png", fetch_redirect_response=False)
+        self.assertFalse(RemoteImage.objects.exists())
+
+    def test_rejects_private_hosts_unless_allowed(self):
+        p = _product("Remera", image_url=f"{self.base}/img.png")
+        with self.settings(IMAGE_PROXY_ALLOWED_HOSTS=[]):
+            self.assertEqual(self._get(p).status_code, 302)
+        self.assertEqual(_StubImageHandler.hits, [])
+
+    def test_evicts_least_recently_used(self):
+        a = _product("A", image_url=f"{self.base}/img.png?a")
+        b = _product("B", image_url=f"{self.base}/img.png?b")
+        self._get(a)
+        size = RemoteImage.objects.get().size
+        RemoteImage.objects.update(last_access=timezone.now() - timedelta(hours=1))
+        with self.settings(IMAGE_PROXY_MAX_BYTES=size + size // 2):
+            self._get(b)
+        self.assertEqual(list(RemoteImage.objects.values_list("source_url", flat=True)), [f"{self.base}/img.png?b"])
+
+    def test_disabled_by_default(self):
+        p = _product("Remera", image_url=f"{self.base}/img.png")
+        with self.settings(IMAGE_PROXY_ENABLED=False):
+            self.assertEqual(self._get(p).status_code, 404)
+            self.assertNotIn("/image/", self.client.get("/products/").content.decode())
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        self.a = _product("Remera", stock=5)
+        self.b = _product("Short", stock=1)
+
+    def _stock(self, p):
+        return Product.objects.values_list("stock", flat=True).get(pk=p.pk)
+
+    def test_reserve_decrements_and_release_restores(self):
+        inventory.reserve("ref-1", [(self.a.pk, 2), (self.b.pk, 1), (self.a.pk, 1)])
+        self.assertEqual((self._stock(self.a), self._stock(self.b)), (2, 0))
+        self.assertEqual(inventory.release("ref-1"), 2)
+        self.assertEqual(inventory.release("ref-1"), 0)  # idempotente
+        self.assertEqual((self._stock(self.a), self._stock(self.b)), (5, 1))
+
+    def test_out_of_stock_rolls_back_every_line(self):
+        with self.assertRaises(inventory.OutOfStock) as ctx:
+            inventory.reserve("ref-1", [(self.a.pk, 2), (self.b.pk, 2)])
+        self.assertEqual(ctx.exception.product_id, self.b.pk)
+        self.assertEqual((self._stock(self.a), self._stock(self.b)), (5, 1))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservations_are_released_but_committed_ones_stay(self):
+        inventory.reserve("vieja", [(self.a.pk, 2)], ttl=timedelta(minutes=-1))
+        inventory.reserve("pagada", [(self.a.pk, 1)], ttl=timedelta(minutes=-1))
+        inventory.commit("pagada")
+        self.assertEqual(inventory.release_expired(), 1)
+        self.assertEqual(self._stock(self.a), 4)
+        self.assertEqual(inventory.release("pagada"), 0)
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    """Muchos compradores a la vez sobre el mismo producto: ni sobreventa ni esperas largas."""
+    BUYERS = 24
+    STOCK = 10
+
+    def test_no_oversell_under_contention(self):
+        p = _product("Última zapatilla", stock=self.STOCK)
+        barrier = threading.Barrier(self.BUYERS)
+        results, timings = [], []
+
+        def buyer(i):
+            try:
+                barrier.wait()
+                t0 = time.perf_counter()
+                try:
+                    inventory.reserve(f"ref-{i}", [(p.pk, 1)])
+                    results.append("ok")
+                except inventory.OutOfStock:
+                    results.append("agotado")
+                timings.append(time.perf_counter() - t0)
+            except Exception as e:  # cualquier otra cosa (p. ej. "database is locked") es un fallo
+                results.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer, args=(i,)) for i in range(self.BUYERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(set(results)), ["agotado", "ok"], results)
+        self.assertEqual(results.count("ok"), self.STOCK)
+        self.assertEqual(Product.objects.get(pk=p.pk).stock, 0)
+        self.assertEqual(StockReservation.objects.count(), self.STOCK)
+        # sin locks de aplicación: ninguna reserva queda esperando a las demás
+        self.assertLess(max(timings), 2.0)
+
+    def test_concurrent_releases_return_stock_once(self):
+        p = _product("Gorra agotada", stock=self.STOCK)
+        for i in range(self.STOCK):
+            inventory.reserve(f"ref-{i}", [(p.pk, 1)])
+        barrier = threading.Barrier(self.BUYERS)
+        errors = []
+
+        def worker(i):
+            try:
+                barrier.wait()
+                # pagos rechazados y barridos de vencidas a la vez sobre las mismas reservas
+                if i % 2:
+                    inventory.release(f"ref-{i % self.STOCK}")
+                else:
+                    inventory.release_expired(now=timezone.now() + timedelta(days=1))
+            except Exception as e:
+                errors.append(repr(e))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.BUYERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Product.objects.get(pk=p.pk).stock, self.STOCK)
+        self.assertFalse(StockReservation.objects.filter(status=StockReservation.HELD).exists())
+
+
+class RelatedProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.runner = _product("Zapatillas Running Azul", descripcion="Zapatillas livianas para correr")
+        self.trail = _product("Zapatillas Trail", descripcion="Para correr en montaña")
+        self.medias = _product("Medias deportivas", descripcion="Medias para correr")
+        self.taza = _product("Taza de cerámica", descripcion="Taza blanca")
+        self.mate = _product("Mate de cerámica", descripcion="Mate con bombilla")
+
+    def _related(self, p):
+        return list(RelatedProduct.objects.filter(product=p).order_by("rank").values_list("related_id", flat=True))
+
+    def test_text_similarity_ranks_closest_first(self):
+        self.assertEqual(related.build(full=True), 5)
+        self.assertEqual(self._related(self.runner)[:2], [self.trail.pk, self.medias.pk])
+        self.assertEqual(self._related(self.taza), [self.mate.pk])
+
+    def test_bought_together_boosts(self):
+        Product.objects.update(stock=10)
+        for i in range(3):
+            inventory.reserve(f"ref-{i}", [(self.runner.pk, 1), (self.mate.pk, 1)])
+            inventory.commit(f"ref-{i}")
+        related.build(full=True)
+        self.assertEqual(self._related(self.runner)[0], self.mate.pk)
+
+    def test_only_paid_checkouts_count_as_bought_together(self):
+        Product.objects.update(stock=10)
+        for i in range(3):
+            # pagos rechazados / carritos abandonados, y uno todavía sin pagar
+            inventory.reserve(f"rel-{i}", [(self.runner.pk, 1), (self.taza.pk, 1)])
+            inventory.release(f"rel-{i}")
+        inventory.reserve("held", [(self.runner.pk, 1), (self.taza.pk, 1)])
+        self.assertEqual(related.cooccurrence(), {})
+        self.assertEqual(related.cooccurrence({self.runner.pk}), {})
+        related.build(full=True)
+        self.assertNotIn(self.taza.pk, self._related(self.runner))
+        self.assertNotIn(self.runner.pk, self._related(self.taza))
+
+    def test_incremental_only_touches_changed_products(self):
+        related.build(full=True)
+        before = dict(RelatedProduct.objects.filter(product=self.taza).values_list("related_id", "computed_at"))
+        self.medias.nombre = "Medias running"
+        self.medias.save()
+        touched = related.build()
+        self.assertLess(touched, 5)
+        self.assertEqual(dict(RelatedProduct.objects.filter(product=self.taza).values_list("related_id", "computed_at")), before)
+        self.assertIn(self.runner.pk, self._related(self.medias))
+
+    def test_detail_and_api_read_in_one_query(self):
+        related.build(full=True)
+        with self.assertNumQueries(1):  # relacionados + usuario en un JOIN
+            data = self.client.get(f"/api/products/{self.runner.pk}/related/").json()
+        self.assertEqual(data[0]["id"], self.trail.pk)
+        self.mate.activo = False
+        self.mate.save()
+        self.assertEqual(self.client.get(f"/api/products/{self.taza.pk}/related/").json(), [])
+        html = self.client.get(f"/products/{self.runner.pk}/").content.decode()
+        self.assertIn("También te puede interesar", html)
+        self.assertIn(f'href="/products/{self.trail.pk}/"', html)
+
+    def test_api_with_invalid_id_is_404(self):
+        self.assertEqual(self.client.get("/api/products/abc/related/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/products/{10 ** 30}/related/").status_code, 404)
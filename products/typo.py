@@ -0,0 +1,183 @@
+# products/typo.py
+"""
+Búsqueda tolerante a errores de tipeo ("zapatila" -> "zapatilla").
+
+Sólo se usa cuando la búsqueda normal no devolvió nada: con los trigramas de la
+consulta se buscan candidatos en la tabla ``ProductTrigram`` (una consulta
+indexada, igual en SQLite y PostgreSQL) y después se corrige palabra por
+palabra con distancia de edición contra el vocabulario de esos candidatos.
+Todo el proceso respeta un presupuesto de tiempo (``SEARCH_FALLBACK_BUDGET_MS``)
+para no castigar a nadie más que a quien ya no encontró nada. La consulta de
+candidatos (el paso caro) también: usa como mucho ``MAX_QUERY_TRIGRAMS``
+trigramas y corre con un límite en la base (``statement_timeout`` en
+PostgreSQL, un progress handler que la interrumpe en SQLite).
+"""
+import re
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models import Count
+
+from .models import Product, ProductTrigram
+from .search import fold
+
+MAX_CANDIDATES = 50
+# una consulta larga trae muchos trigramas; con éstos alcanza para encontrar candidatos
+MAX_QUERY_TRIGRAMS = 24
+# instrucciones de SQLite entre chequeos del reloj
+SQLITE_PROGRESS_STEPS = 1000
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> list:
+    return _WORD_RE.findall(fold(text))
+
+
+def trigrams(text: str) -> set:
+    """Trigramas por palabra, con relleno al estilo pg_trgm ("  zap", " za", ...)."""
+    out = set()
+    for w in _words(text):
+        padded = f"  {w} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+def index_products(products, using: str = "default") -> None:
+    """Reemplaza los trigramas de los productos dados (instancias de Product)."""
+    products = list(products)
+    ProductTrigram.objects.using(using).filter(product__in=[p.pk for p in products]).delete()
+    ProductTrigram.objects.using(using).bulk_create(
+        [ProductTrigram(product_id=p.pk, trigram=t) for p in products for t in trigrams(p.nombre)],
+        batch_size=1000,
+    )
+
+
+def rebuild(using: str = "default", chunk_size: int = 2000) -> int:
+    """Regenera la tabla completa leyendo sólo id/nombre por lotes."""
+    ProductTrigram.objects.using(using).all().delete()
+    total, batch = 0, []
+    rows = Product.objects.using(using).values_list("id", "nombre").iterator(chunk_size=chunk_size)
+    for pid, nombre in rows:
+        batch.extend(ProductTrigram(product_id=pid, trigram=t) for t in trigrams(nombre))
+        total += 1
+        if len(batch) >= chunk_size:
+            ProductTrigram.objects.using(using).bulk_create(batch)
+            batch = []
+    ProductTrigram.objects.using(using).bulk_create(batch)
+    return total
+
+
+def _distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein acotado: devuelve ``limit + 1`` apenas se pasa del límite."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _query_trigrams(words) -> list:
+    """Hasta ``MAX_QUERY_TRIGRAMS`` trigramas, repartidos entre las palabras."""
+    per_word = [sorted(trigrams(w)) for w in words]
+    out = []
+    for i in range(max(map(len, per_word), default=0)):
+        for grams in per_word:
+            if i < len(grams) and grams[i] not in out:
+                out.append(grams[i])
+    return out[:MAX_QUERY_TRIGRAMS]
+
+
+@contextmanager
+def _deadline(using: str, deadline: float):
+    """Corta en la base cualquier consulta que se pase de ``deadline`` (OperationalError)."""
+    connection = connections[using]
+    remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+    if connection.vendor == "postgresql":
+        with transaction.atomic(using=using):
+            with connection.cursor() as cur:
+                cur.execute(f"SET LOCAL statement_timeout = {remaining_ms}")  # SET no acepta parámetros
+            yield
+    elif connection.vendor == "sqlite":
+        connection.ensure_connection()
+        raw = connection.connection
+        fired = []
+
+        def interrupt():
+            # una sola vez: con DEBUG, Django hace otra consulta para loguear la cortada
+            if not fired and time.monotonic() > deadline:
+                fired.append(True)
+                return 1
+            return 0
+
+        raw.set_progress_handler(interrupt, SQLITE_PROGRESS_STEPS)
+        try:
+            yield
+        finally:
+            raw.set_progress_handler(None, 0)
+    else:
+        yield
+
+
+def _max_edits(word: str) -> int:
+    return 1 if len(word) <= 4 else 2
+
+
+def did_you_mean(q: str, budget_ms: float = None):
+    """
+    Devuelve la consulta corregida o ``None`` si no hay una mejor (o si se agotó
+    el presupuesto de tiempo).
+    """
+    if budget_ms is None:
+        budget_ms = getattr(settings, "SEARCH_FALLBACK_BUDGET_MS", 50)
+    deadline = time.monotonic() + budget_ms / 1000
+    words = _words(q)
+    grams = _query_trigrams(words)
+    if not words or not grams:
+        return None
+
+    candidates = (
+        ProductTrigram.objects.filter(trigram__in=grams, product__activo=True)
+        .values("product_id", "product__nombre")
+        .annotate(hits=Count("id"))
+        .order_by("-hits")[:MAX_CANDIDATES]
+    )
+    try:
+        with _deadline(candidates.db, deadline):
+            rows = list(candidates)
+    except OperationalError:
+        return None  # se pasó del presupuesto dentro de la base
+    vocab = set()
+    for row in rows:
+        vocab.update(_words(row["product__nombre"]))
+    if not vocab or time.monotonic() > deadline:
+        return None
+
+    fixed, changed = [], False
+    for w in words:
+        if w in vocab or w.isdigit():
+            fixed.append(w)
+            continue
+        limit = _max_edits(w)
+        best, best_d = None, limit + 1
+        for v in vocab:
+            d = _distance(w, v, limit)
+            # a igual distancia, la palabra más parecida en largo
+            if d < best_d or (d == best_d and best is not None and abs(len(v) - len(w)) < abs(len(best) - len(w))):
+                best, best_d = v, d
+            if time.monotonic() > deadline:
+                return None
+        if best is not None and best_d <= limit:
+            fixed.append(best)
+            changed = True
+        else:
+            fixed.append(w)
+    return " ".join(fixed) if changed else None
@@ -5,6 +5,7 @@ urlpatterns = [
     # públicas (tienda)
     path("", web_views.product_list, name="product-list"),
     path("<int:pk>/", web_views.product_detail, name="product-detail"),
+    path("<int:pk>/image/", web_views.product_image, name="product-image"),
 
     # alta simple / crear producto (usa la misma vista para /create/ y /manage/new/)
     path("create/", web_views.ProductCreateView.as_view(), name="product-create-simple"),
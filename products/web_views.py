@@ -1,15 +1,25 @@
 # products/web_views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.contrib import messages
-from django.http import HttpResponseForbidden
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect
 from django.template import TemplateDoesNotExist
 from django.template.loader import select_template
 from django.views.generic import CreateView, ListView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from .models import Product
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_safe
+from cart.context_processors import without_cart_count
+from .models import Product, ProductCard
 from .forms import ProductForm
+from .filters import parse_filters, filter_products
+from .pagination import InvalidCursor, keyset_page
+from .cache import listing_cache_key, listing_timeout, product_etag
+from .typo import did_you_mean
+from . import dashboard, image_proxy
+from .related import related_products
 
 
 # Helpers
@@ -19,75 +29,86 @@ def _toast(request, txt: str) -> None:
 def _is_staff(user) -> bool:
     return bool(user.is_staff or user.is_superuser)
 
-def _safe_float(val: str):
-    if val is None:
-        return None
-    s = str(val).strip().replace(",", ".")
-    try:
-        return float(s)
-    except Exception:
-        return None
-
 
 # TIENDA PÚBLICA
+@without_cart_count
 def product_list(request):
     """
     Listado de productos con filtros. Intenta usar 'products/_card.html'
     y si no existe, cae a 'products/list.html' (evita 500 por template faltante).
     """
-    q = (request.GET.get("q") or "").strip()
+    f = parse_filters(request.GET)
     min_price_raw = (request.GET.get("min_price") or "").strip()
     max_price_raw = (request.GET.get("max_price") or "").strip()
-    in_stock = (request.GET.get("in_stock") or "").strip().lower()
-    order = (request.GET.get("order") or "").strip().lower()
-
-    min_price = _safe_float(min_price_raw) if min_price_raw else None
-    max_price = _safe_float(max_price_raw) if max_price_raw else None
-
-    # ❗ Quitamos `.only(...)` para no depender de que exista image_url u otros campos
-    # select_related debe recibir nombres de relaciones (foreign keys). Seleccionamos
-    # el usuario para evitar consultas extra al renderizar el listado.
-    qs = Product.objects.filter(activo=True).select_related("user")
-
-    if q:
-        qs = qs.filter(Q(nombre__icontains=q) | Q(descripcion__icontains=q))
-
-    if min_price is not None:
-        qs = qs.filter(precio__gte=min_price)
-    if max_price is not None:
-        qs = qs.filter(precio__lte=max_price)
-
-    if in_stock == "true":
-        qs = qs.filter(stock__gt=0)
-    elif in_stock == "false":
-        qs = qs.filter(stock__lte=0)
-
-    if order == "oldest":
-        qs = qs.order_by("creado_en")
-    elif order == "price_asc":
-        qs = qs.order_by("precio", "-creado_en")
-    elif order == "price_desc":
-        qs = qs.order_by("-precio", "-creado_en")
-    elif order == "name":
-        qs = qs.order_by("nombre", "-creado_en")
-    else:
-        qs = qs.order_by("-creado_en")
-
-    paginator = Paginator(qs, 12)
-    page_obj = paginator.get_page(request.GET.get("page"))
+
+    # Para anónimos la página es la misma con la misma query: cache por filtros
+    # normalizados + versión del catálogo (ver products/cache.py). Los valores
+    # crudos de precio van en la clave porque se re-muestran en el formulario.
+    cache_key = None
+    if not request.user.is_authenticated:
+        cache_key = listing_cache_key(
+            "html", f,
+            page=request.GET.get("page") or "1",
+            cursor=request.GET.get("cursor"),
+            min_price_raw=min_price_raw,
+            max_price_raw=max_price_raw,
+        )
+        html = cache.get(cache_key)
+        if html is not None:
+            return HttpResponse(html)
+
+    # Las cards salen de la tabla de lectura (products/cards.py): sólo activos y
+    # sólo las columnas que muestra el template (el dueño va como user_id).
+    qs = filter_products(ProductCard.objects.all(), f)
+
+    # ?cursor= activa el scroll infinito: keyset sin COUNT ni OFFSET
+    cursor_mode = "cursor" in request.GET
+
+    def _page(qs, q):
+        if not cursor_mode:
+            return Paginator(qs, 12).get_page(request.GET.get("page")), ""
+        try:
+            items, next_cursor = keyset_page(qs, request.GET.get("cursor"), 12)
+        except InvalidCursor:
+            items, next_cursor = keyset_page(qs, "", 12)
+        if not next_cursor:
+            return items, ""
+        params = request.GET.copy()
+        params.pop("page", None)
+        params["q"] = q
+        params["cursor"] = next_cursor
+        return items, "?" + params.urlencode()
+
+    page_obj, next_url = _page(qs, f["q"])
+
+    # Búsqueda sin resultados: reintento con corrección de tipeo ("¿quisiste decir...?").
+    # Sólo en este caso se paga el costo extra.
+    did_you_mean_q = ""
+    first_page = not request.GET.get("page") and not request.GET.get("cursor")
+    if f["q"] and first_page and not len(page_obj):
+        did_you_mean_q = did_you_mean(f["q"]) or ""
+        if did_you_mean_q:
+            qs = filter_products(ProductCard.objects.all(), {**f, "q": did_you_mean_q})
+            page_obj, next_url = _page(qs, did_you_mean_q)
 
     ctx = {
         "page_obj": page_obj,
-        "q": q,
+        "cursor_mode": cursor_mode,
+        "did_you_mean": did_you_mean_q,
+        "next_url": next_url,
+        "q": f["q"],
         "min_price": min_price_raw,
         "max_price": max_price_raw,
-        "order": order,
-        "in_stock": in_stock,
+        "order": f["order"],
+        "in_stock": f["in_stock"],
     }
 
     try:
         tpl = select_template(["products/_card.html", "products/list.html"])
-        return render(request, tpl.template.name, ctx)
+        response = render(request, tpl.template.name, ctx)
+        if cache_key:
+            cache.set(cache_key, response.content, listing_timeout())
+        return response
     except TemplateDoesNotExist as e:
         messages.error(request, f"No se encontró template de productos: {e}")
         return render(request, "base.html", {"content": f"Falta template: {e}", **ctx}, status=500)
@@ -96,9 +117,54 @@ def product_list(request):
         messages.error(request, f"Error al renderizar productos: {e}")
         return render(request, "base.html", {"content": f"Error: {e}", **ctx}, status=500)
 
+def _detail_stamp(request, pk):
+    # una sola consulta liviana, compartida por etag_func y last_modified_func
+    if not hasattr(request, "_product_stamp"):
+        request._product_stamp = (
+            Product.objects.filter(pk=pk, activo=True).values_list("actualizado_en", flat=True).first()
+        )
+    return request._product_stamp
+
+def _detail_etag(request, pk):
+    stamp = _detail_stamp(request, pk)
+    # la página cambia según el usuario (botón Editar, navbar): va en el ETag
+    return product_etag(pk, stamp, request.user.pk or "") if stamp else None
+
+def _detail_last_modified(request, pk):
+    return _detail_stamp(request, pk)
+
+@without_cart_count
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
 def product_detail(request, pk: int):
     p = get_object_or_404(Product.objects.select_related("user"), pk=pk, activo=True)
-    return render(request, "products/detail.html", {"p": p})
+    # precalculados por build_related_products; una consulta indexada
+    return render(request, "products/detail.html", {"p": p, "related": related_products(pk)})
+
+# una copia versionada (?v=) no cambia nunca: cache "para siempre"
+IMAGE_PROXY_IMMUTABLE = "public, max-age=31536000, immutable"
+IMAGE_PROXY_SHORT = "public, max-age=3600"
+
+@require_safe
+def product_image(request, pk: int):
+    """Imagen remota (image_url) servida desde la copia local del proxy; si falla, redirige al original."""
+    if not image_proxy.enabled():
+        raise Http404
+    url = Product.objects.filter(pk=pk, activo=True).values_list("image_url", flat=True).first()
+    if not url:
+        raise Http404
+    url = image_proxy.normalize(url)
+    try:
+        entry = image_proxy.get(url)
+        etag = quote_etag(entry.etag)
+        not_modified = get_conditional_response(request, etag=etag)
+        response = not_modified or FileResponse(image_proxy.open_copy(entry), content_type="image/jpeg")
+    except image_proxy.ProxyError:
+        return HttpResponseRedirect(url)
+    response["ETag"] = etag
+    # el versionado (?v=) cambia si cambia la image_url del producto
+    versioned = request.GET.get("v") == image_proxy.cache_key(url)[:12]
+    response["Cache-Control"] = IMAGE_PROXY_IMMUTABLE if versioned else IMAGE_PROXY_SHORT
+    return response
 
 
 # CREAR PRODUCTO (HTML) – requiere login
@@ -141,7 +207,8 @@ class ProductManageListView(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Product.objects.all().order_by("-creado_en")
+        # comentarios/posts/alerta de stock anotados en la misma consulta de la página
+        return dashboard.annotate(Product.objects.all()).order_by("-creado_en", "-id")
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -158,11 +225,13 @@ class MyProductsListView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user).order_by("-creado_en")
+        return dashboard.annotate(Product.objects.filter(user=self.request.user)).order_by("-creado_en", "-id")
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx["mode"] = "mine"
+        ctx["summary"] = dashboard.seller_summary(self.request.user.pk)
+        ctx["low_stock_threshold"] = dashboard.low_stock_threshold()
         return ctx
 
 class ProductUpdateView(UpdateView):